@@ -21,7 +21,7 @@ Below is the structure of the summarized JSON returned on a successful call:
     path = f'/client/{clientId}/reports'
     return request.get(base_url, headers, root+path, name)
 
-def get_report(base_url, headers, clientId, reportId, payload):
+def get_report(base_url, headers, clientId, reportId):
     """
     This request **retrieves** a specific report for a client and provides robust information about the report.
 
@@ -32,7 +32,7 @@ A successful call returns the JSON object of the report stored in the DB. See [R
     name = "Get Report"
     root = "/api/v1"
     path = f'/client/{clientId}/report/{reportId}'
-    return request.get(base_url, headers, root+path, name, payload)
+    return request.get(base_url, headers, root+path, name)
 
 def create_report(base_url, headers, clientId, payload):
     """
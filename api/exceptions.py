@@ -3,6 +3,9 @@ from requests.exceptions import RequestException, InvalidJSONError, HTTPError
 class PTWrapperLibraryException(RequestException):
     pass
 
+class PTWrapperLibraryCircuitOpen(PTWrapperLibraryException):
+    pass
+
 class PTWrapperLibraryJSONResponse(InvalidJSONError):
     pass
 
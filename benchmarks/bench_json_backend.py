@@ -0,0 +1,95 @@
+import argparse
+import os
+import sys
+import timeit
+from tabulate import tabulate
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import settings
+import utils.json_utils as json_utils
+
+
+# Compares the "json" and "orjson" values of `json_backend` in settings.py, decoding and encoding payloads shaped like
+# the responses this script reads and the requests it sends. Run from the repo root with
+# `pipenv run python benchmarks/bench_json_backend.py`
+
+def make_findings_page(num_findings: int) -> dict:
+    """
+    Page of findings, like the response from the get findings by report endpoint
+    """
+    return {
+        "status": "success",
+        "data": [{
+            "flaw_id": 1000+i,
+            "client_id": 1,
+            "report_id": 500,
+            "title": f'Finding {i}',
+            "severity": "High",
+            "status": "Open",
+            "description": "<p>" + "The application responds to login submissions with a link containing the user's password. " * 20 + "</p>",
+            "recommendations": "<p>" + "Do not include sensitive data in URLs. " * 10 + "</p>",
+            "tags": ["scan_2023", "external", f'client_{i % 10}'],
+            "fields": {f'field_{j}': {"label": f'Field {j}', "value": "x" * 50} for j in range(10)}
+        } for i in range(num_findings)],
+        "meta": {"pagination": {"total": num_findings, "offset": 0, "limit": num_findings}}
+    }
+
+def make_writeup_list(num_writeups: int) -> list:
+    """
+    List of writeups, like the response from the list writeups endpoint
+    """
+    return [{
+        "doc_id": i,
+        "id": f'template_{i}',
+        "title": f'Writeup {i}',
+        "description": "<p>" + "Writeup description. " * 30 + "</p>",
+        "tags": ["library", f'category_{i % 20}']
+    } for i in range(num_writeups)]
+
+def make_bulk_payload(num_findings: int) -> dict:
+    """
+    Payload sent to the bulk update findings endpoint
+    """
+    return {"findings": [{"flaw_id": 1000+i, "tags": ["scan_2023", "external", f'client_{i % 10}', "needs_review"]} for i in range(num_findings)]}
+
+
+def time_ms(fn, repeat: int) -> float:
+    """
+    Returns the fastest time to call `fn` in milliseconds, out of `repeat` runs
+    """
+    number = 5
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number * 1000
+
+
+def run_benchmarks(repeat: int) -> None:
+    payloads = {
+        "decode page of 100 findings": ("loads", json_utils.dumps(make_findings_page(100))),
+        "decode list of 10k writeups": ("loads", json_utils.dumps(make_writeup_list(10000))),
+        "encode bulk update of 100 findings": ("dumps", make_bulk_payload(100)),
+        "encode full finding for update": ("dumps", make_findings_page(1)["data"][0])
+    }
+    backends = ["json"] + (["orjson"] if json_utils.orjson is not None else [])
+    if json_utils.orjson is None:
+        print("orjson is not installed, only the standard library json module is benchmarked")
+
+    rows = []
+    for name, (operation, payload) in payloads.items():
+        times = []
+        for backend in backends:
+            settings.json_backend = backend
+            fn = getattr(json_utils, operation)
+            times.append(time_ms(lambda: fn(payload), repeat))
+        size = len(payload) if operation == "loads" else len(json_utils.dumps(payload))
+        row = [name, f'{round(size / 1024)} KiB'] + [round(t, 3) for t in times]
+        if len(times) > 1:
+            row.append(f'{round(times[0] / times[1], 1)}x')
+        rows.append(row)
+
+    headers = ["payload", "size"] + [f'{backend} (ms)' for backend in backends] + (["orjson speedup"] if len(backends) > 1 else [])
+    print(tabulate(rows, headers=headers))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the JSON backends in utils.json_utils")
+    parser.add_argument("--repeat", type=int, default=5, help=f'number of timed runs of each payload, the fastest is reported')
+    run_benchmarks(parser.parse_args().repeat)
@@ -0,0 +1,92 @@
+import argparse
+import os
+import random
+import sys
+import time
+from tabulate import tabulate
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.tag_utils import TagRuleSet, TagTransform
+
+
+# Times the TagTransform applying 10k-entry mappings to the tags on objects, compared with the list based functions it
+# replaced. Run from the repo root with `pipenv run python benchmarks/bench_tag_transform.py`
+
+def make_objects(num_objects: int, num_tags: int, vocabulary: int, distinct: bool, seed: int = 1) -> list:
+    """
+    Lists of tags on objects. Every list is different if `distinct`, otherwise objects share 50 lists of tags, like
+    objects on a real instance
+    """
+    rng = random.Random(seed)
+    lists = [[f'tag_{rng.randrange(vocabulary)}' for _ in range(num_tags)] for _ in range(num_objects if distinct else 50)]
+    return lists if distinct else [lists[i % len(lists)] for i in range(num_objects)]
+
+
+# list based versions of refactor, remove, and add from before TagTransform, searching the list of tags to find for
+# every tag on every object
+def list_refactor(obj_tags: list, tags_to_find: list, tags_to_act: list) -> None:
+    for i, tag in enumerate(obj_tags):
+        if tag in tags_to_find:
+            obj_tags[i] = tags_to_act[tags_to_find.index(tag)]
+
+def list_remove(obj_tags: list, tags_to_find: list, tags_to_act: list) -> None:
+    for tag in list(obj_tags):
+        if tag in tags_to_find:
+            obj_tags.remove(tag)
+
+def list_add(obj_tags: list, tags_to_find: list, tags_to_act: list) -> None:
+    for tag in list(obj_tags):
+        if tag in tags_to_find:
+            obj_tags.append(tags_to_act[tags_to_find.index(tag)])
+
+
+def time_us_per_object(fn, objects: list, repeat: int) -> float:
+    """
+    Returns the fastest time to call `fn` on every object in microseconds per object, out of `repeat` runs
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for obj_tags in objects:
+            fn(obj_tags)
+        times.append(time.perf_counter() - start)
+    return min(times) / len(objects) * 1_000_000
+
+
+def run_benchmarks(num_rules: int, num_objects: int, repeat: int) -> None:
+    vocabulary = num_rules * 2 # half the tags on objects are acted on
+    tags_to_find = [f'tag_{i}' for i in range(0, vocabulary, 2)]
+    tags_to_act = [f'new_{i}' for i in range(0, vocabulary, 2)]
+    modes = {
+        "refactor": (lambda: TagRuleSet.refactor(tags_to_find, tags_to_act), list_refactor),
+        "remove": (lambda: TagRuleSet.remove(tags_to_find), list_remove),
+        "add": (lambda: TagRuleSet.add(tags_to_find, tags_to_act), list_add)
+    }
+    distinct_objects = make_objects(num_objects, 8, vocabulary, True)
+    shared_objects = make_objects(num_objects, 8, vocabulary, False)
+    # the list based functions take seconds per run with 10k rules, so they're timed on fewer objects
+    list_objects = distinct_objects[:max(1, num_objects // 20)]
+
+    rows = []
+    for mode, (build, list_fn) in modes.items():
+        start = time.perf_counter()
+        build()
+        build_ms = (time.perf_counter() - start) * 1000
+        # a new transform each run, so every distinct list of tags is transformed instead of read from the cache
+        distinct_us = min(time_us_per_object(TagTransform([build()]).apply, distinct_objects, 1) for _ in range(repeat))
+        shared_transform = TagTransform([build()])
+        shared_us = time_us_per_object(shared_transform.apply, shared_objects, repeat)
+        list_us = time_us_per_object(lambda obj_tags: list_fn(list(obj_tags), tags_to_find, tags_to_act), list_objects, repeat)
+        rows.append([mode, round(build_ms, 1), round(distinct_us, 2), round(shared_us, 2), round(list_us, 2), f'{round(list_us / distinct_us)}x'])
+
+    print(f'{num_rules} rules, {num_objects} objects with 8 tags each')
+    print(tabulate(rows, headers=["mode", "build (ms)", "distinct tags (us/object)", "shared tags (us/object)", "list based (us/object)", "speedup"]))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark TagTransform in utils.tag_utils")
+    parser.add_argument("--rules", type=int, default=10000, help=f'number of tags being acted on')
+    parser.add_argument("--objects", type=int, default=20000, help=f'number of objects to apply the changes to')
+    parser.add_argument("--repeat", type=int, default=3, help=f'number of timed runs of each mode, the fastest is reported')
+    args = parser.parse_args()
+    run_benchmarks(args.rules, args.objects, args.repeat)
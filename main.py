@@ -1,7 +1,12 @@
 import yaml
 from tabulate import tabulate
-from copy import deepcopy
-from typing import TypedDict, List, Callable
+from typing import List, Callable, Tuple
+import argparse
+import json
+import os
+import sys
+import threading
+import time
 
 import settings
 import utils.log_handler as logger
@@ -9,7 +14,20 @@ log = logger.log
 from utils.auth_handler import Auth
 import utils.input_utils as input
 import utils.general_utils as utils
+import utils.request_handler as request_handler
+import utils.rate_limit_handler as rate_limit_handler
+import utils.retry_handler as retry_handler
+import utils.circuit_breaker_handler as circuit_breaker_handler
+import utils.hedge_handler as hedge_handler
 from utils.log_handler import IterationMetrics
+from utils.circuit_breaker_handler import run_deferring_open_circuits, defer_failed_items, deferred_queue
+from utils.pagination_utils import PagedObjects, StreamedObjects
+from utils.bulk_utils import BulkTagWriter, get_added_tags
+from utils.concurrency_utils import run_concurrently
+from utils.record_utils import TagRecord, ClientRecord, AssetRecord, ReportRecord, FindingRecord, WriteupRecord
+from utils.mapping_utils import load_tag_rules, build_tag_rules, parse_structured_rules
+from utils.tag_utils import TagRuleSet, TagTransform, is_tag_pattern, compile_tag_pattern, tag_dictionary
+from utils.tag_index_utils import tag_index
 import api
 from api.exceptions import PTWrapperLibraryFailed
 
@@ -97,6 +115,15 @@ def get_tag_from_user(msg:str="Please enter a tag", sanitize:bool=True) -> str:
     
     if sanitize == False:
         return tag
+
+    # patterns aren't valid tags, they're checked for errors instead
+    if is_tag_pattern(tag):
+        try:
+            compile_tag_pattern(tag)
+            return tag
+        except ValueError as e:
+            log.error(e)
+            return get_tag_from_user(msg, sanitize)
     
     clean_tag = utils.format_tag(tag)
     if tag == clean_tag:
@@ -108,23 +135,24 @@ def get_tag_from_user(msg:str="Please enter a tag", sanitize:bool=True) -> str:
         return get_tag_from_user()
         
 
-def get_page_of_clients(page: int = 0, clients: list = [], total_clients: int = -1) -> None:
-    """
-    Handles traversing pagination results to create a list of all items.
-
-    :param page: page to start on, for all results use 0, defaults to 0
-    :type page: int, optional
-    :param clients: the list passed in will be added to, acts as return, defaults to []
-    :type clients: list, optional
-    :param total_clients: used for recursion to know when all pages have been gathered, defaults to -1
-    :type total_clients: int, optional
-    """
-    payload = {
+def request_page_payload(offset: int, limit: int) -> dict:
+    return {
         "pagination": {
-            "offset": page*100,
-            "limit": 100
+            "offset": offset,
+            "limit": limit
         }
     }
+
+
+def get_clients() -> PagedObjects:
+    """
+    Gets all clients from tenant. Pages of clients are requested as the returned object is iterated over, and each
+    client is converted to a ClientRecord
+
+    :raises Exception: could not retrieve the first page of clients
+    :return: iterable of all clients in the tenant
+    :rtype: PagedObjects
+    """
     # client data from response is shaped like
     # {
     #     "client_id": 4155,
@@ -134,37 +162,24 @@ def get_page_of_clients(page: int = 0, clients: list = [], total_clients: int =
     #         "test"
     #     ]
     # }
-    response = api._v2.clients.list_clients(auth.base_url, auth.get_auth_headers(), payload)
-    if response.json['status'] != "success":
-        log.critical(f'Could not retrieve clients from instance. Exiting...')
-        exit()
-    total_clients = int(response.json['meta']['pagination']['total'])
-    if len(response.json['data']) > 0:
-        clients += deepcopy(response.json['data'])
+    def request_page(offset: int, limit: int) -> dict:
+        return api._v2.clients.list_clients(auth.base_url, auth.get_auth_headers(), request_page_payload(offset, limit)).json
 
-    if len(clients) < total_clients:
-        return get_page_of_clients(page+1, clients, total_clients)
-    
-    return None
+    clients = PagedObjects(request_page, 100, 'data', settings.page_concurrency, ClientRecord.from_json)
+    if clients.failed:
+        raise Exception(f'Could not retrieve clients from instance.')
+    return clients
 
 
-def get_page_of_assets(page: int = 0, assets: list = [], total_assets: int = -1) -> None:
+def get_assets() -> PagedObjects:
     """
-    Handles traversing pagination results to create a list of all items.
+    Gets all client assets from tenant. Pages of assets are requested as the returned object is iterated over, and each
+    asset is converted to an AssetRecord
 
-    :param page: page to start on, for all results use 0, defaults to 0
-    :type page: int, optional
-    :param assets: the list passed in will be added to, acts as return, defaults to []
-    :type assets: list, optional
-    :param total_assets: used for recursion to know when all pages have been gathered, defaults to -1
-    :type total_assets: int, optional
+    :raises Exception: could not retrieve the first page of assets
+    :return: iterable of all assets in the tenant
+    :rtype: PagedObjects
     """
-    payload = {
-        "pagination": {
-            "offset": page*1000,
-            "limit": 1000
-        }
-    }
     # asset data from response is shaped like
     # {
         # "asset": "testing asset",
@@ -180,37 +195,24 @@ def get_page_of_assets(page: int = 0, assets: list = [], total_assets: int = -1)
         # "parent_asset": null,
         # "updatedAt": 1652363091087
     # }
-    response = api._v2.assets.get_tenant_assets(auth.base_url, auth.get_auth_headers(), payload)
-    if response.json['status'] != "success":
-        log.critical(f'Could not retrieve assets from instance. Exiting...')
-        exit()
-    total_assets = int(response.json['meta']['pagination']['total'])
-    if len(response.json['assets']) > 0:
-        assets += deepcopy(response.json['assets'])
+    def request_page(offset: int, limit: int) -> dict:
+        return api._v2.assets.get_tenant_assets(auth.base_url, auth.get_auth_headers(), request_page_payload(offset, limit)).json
 
-    if len(assets) < total_assets:
-        return get_page_of_assets(page+1, assets, total_assets)
-    
-    return None
+    assets = PagedObjects(request_page, 1000, 'assets', settings.page_concurrency, AssetRecord.from_json)
+    if assets.failed:
+        raise Exception(f'Could not retrieve assets from instance.')
+    return assets
 
 
-def get_page_of_reports(page: int, reports: list = [], total_reports: int = -1) -> None:
+def get_reports() -> PagedObjects:
     """
-    Handles traversing pagination results to create a list of all items.
+    Gets all reports from tenant. Pages of reports are requested as the returned object is iterated over, and each
+    report is converted to a ReportRecord
 
-    :param page: page to start on, for all results use 0, defaults to 0
-    :type page: int, optional
-    :param reports: the list passed in will be added to, acts as return, defaults to []
-    :type reports: list, optional
-    :param total_reports: used for recursion to know when all pages have been gathered, defaults to -1
-    :type total_reports: int, optional
+    :raises Exception: could not retrieve the first page of reports
+    :return: iterable of all reports in the tenant
+    :rtype: PagedObjects
     """
-    payload = {
-        "pagination": {
-            "offset": page*1000,
-            "limit": 1000
-        }
-    }
     # report data from response is shaped like
     # {
         # "client_id": 4155,
@@ -219,43 +221,27 @@ def get_page_of_reports(page: int, reports: list = [], total_reports: int = -1)
         # "status": "Draft",
         # "findings": 1
     # }
-    response = api._v2.reports.get_report_list(auth.base_url, auth.get_auth_headers(), payload)
-    if response.json['status'] != "success":
-        log.critical(f'Could not retrieve reports from instance. Exiting...')
-        exit()
-    total_reports = int(response.json['meta']['pagination']['total'])
-    if len(response.json['data']) > 0:
-        reports += deepcopy(response.json['data'])
+    def request_page(offset: int, limit: int) -> dict:
+        return api._v2.reports.get_report_list(auth.base_url, auth.get_auth_headers(), request_page_payload(offset, limit)).json
 
-    if len(reports) < total_reports:
-        return get_page_of_reports(page+1, reports, total_reports)
-    
-    return None
+    reports = PagedObjects(request_page, 1000, 'data', settings.page_concurrency, ReportRecord.from_json)
+    if reports.failed:
+        raise Exception(f'Could not retrieve reports from instance.')
+    return reports
 
 
-def get_page_of_findings(client_id: int, report_id: int, page: int = 0, findings: list = [], total_findings: int = -1) -> bool:
+def get_findings(client_id: int, report_id: int) -> PagedObjects | None:
     """
-    Handles traversing pagination results to create a list of all items.
+    Gets all findings from a report. Pages of findings are requested as the returned object is iterated over, and each
+    finding is converted to a FindingRecord
 
     :param client_id: id of client
     :type client_id: int
     :param report_id: id of report
     :type report_id: int
-    :param page: page to start on, for all results use 0, defaults to 0
-    :type page: int, optional
-    :param findings: the list passed in will be added to, acts as return, defaults to []
-    :type findings: list, optional
-    :param total_findings: used for recursion to know when all pages have been gathered, defaults to -1
-    :type total_findings: int, optional
-    :return: boolean if all page requests were successful
-    :rtype: bool
+    :return: iterable of all findings in the report, or None if the findings could not be retrieved
+    :rtype: PagedObjects | None
     """
-    payload = {
-        "pagination": {
-            "offset": page*100,
-            "limit": 100
-        }
-    }
     # finding data from response is shaped like
     # {
     #   "affected_assets": {},
@@ -285,27 +271,117 @@ def get_page_of_findings(client_id: int, report_id: int, page: int = 0, findings
     #   "visibility": "draft",
     #   "timeToNearestSLA": ""
     # }
-    response = api._v2.findings.get_findings_by_report(auth.base_url, auth.get_auth_headers(), client_id, report_id, payload)
-    if response.json['status'] != "success":
+    def request_page(offset: int, limit: int) -> dict:
+        return api._v2.findings.get_findings_by_report(auth.base_url, auth.get_auth_headers(), client_id, report_id, request_page_payload(offset, limit)).json
+
+    try:
+        findings = PagedObjects(request_page, 100, 'data', settings.page_concurrency, FindingRecord.from_json)
+    except Exception as e:
         log.exception(f'Could not retrieve findings from report. Skipping...')
-        return False
-    total_findings = int(response.json['meta']['pagination']['total'])
-    if len(response.json['data']) > 0:
-        findings += deepcopy(response.json['data'])
+        return None
+    if findings.failed:
+        log.error(f'Could not retrieve findings from report. Skipping...')
+        return None
+    return findings
 
-    if len(findings) < total_findings:
-        return get_page_of_findings(client_id, report_id, page+1, findings, total_findings)
-    
-    return True
+
+def load_paged_objects(objs: PagedObjects, obj_type: str) -> PagedObjects | list:
+    """
+    When streaming objects is enabled in settings.py, returns the PagedObjects as is so each page is requested as the
+    objects are updated. Otherwise loads all pages into a list before any object is updated.
+
+    :param objs: iterable of objects from a paginated endpoint
+    :type objs: PagedObjects
+    :param obj_type: name of the type of objects, used in log messages
+    :type obj_type: str
+    :raises Exception: could not retrieve all objects, when not streaming
+    :return: the PagedObjects, or the list of all loaded objects
+    :rtype: PagedObjects | list
+    """
+    if settings.stream_objects:
+        return objs
+    loaded_objs = list(objs)
+    if objs.failed:
+        raise Exception(f'Could not retrieve {obj_type} from instance.')
+    return loaded_objs
+
+
+def count_unloaded_objects(objs: PagedObjects | StreamedObjects | list, obj_type: str) -> int:
+    """
+    Returns the number of objects that could not have their tags updated because a page of objects failed to load
+    while streaming. If a streamed response failed the number of objects missed isn't known, and 0 is returned
+
+    :param objs: iterable of objects that was updated
+    :type objs: PagedObjects | StreamedObjects | list
+    :param obj_type: name of the type of objects, used in log messages
+    :type obj_type: str
+    :return: number of objects that were never loaded
+    :rtype: int
+    """
+    if isinstance(objs, StreamedObjects) and objs.failed:
+        log.error(f'Could not load all {obj_type} to update. {objs.num_yielded} {obj_type} were loaded before the response failed')
+        return 0
+    if not isinstance(objs, PagedObjects) or objs.num_missing < 1:
+        return 0
+    log.error(f'Could not load {objs.num_missing} {obj_type} to update. Skipping...')
+    return objs.num_missing
+
+
+def loaded_all_objects(objs: PagedObjects | StreamedObjects | list) -> bool:
+    """
+    Checks if every object was loaded, i.e. no page of objects or streamed response failed while updating
+    """
+    return not getattr(objs, 'failed', False)
 
 
-def get_writeups(writeups: list = []) -> None:
+def index_object(obj_type: str, record: ClientRecord | AssetRecord | ReportRecord | FindingRecord | WriteupRecord, transform: TagTransform, updated: bool | None) -> None:
+    """
+    Adds the tags on an object to the tag index once the object has been processed. If the object was updated, the tags
+    it was updated with are indexed
+
+    :param obj_type: type of object, one of clients, assets, reports, findings, or writeups
+    :type obj_type: str
+    :param record: record of the object
+    :type record: ClientRecord | AssetRecord | ReportRecord | FindingRecord | WriteupRecord
+    :param transform: compiled tag changes
+    :type transform: TagTransform
+    :param updated: whether the object was updated
+    :type updated: bool | None
     """
-    Gets a list of all writeups from tenant
+    if not tag_index.is_open():
+        return
+    tag_index.add(obj_type, record, transform.apply_ids(record.tag_ids)[0] if updated else record.tags)
 
-    :param writeups: the list passed in will be added to, acts as return, defaults to []
-    :type writeups: list, optional
-    :raises Exception: _description_
+
+def index_bulk_results(obj_type: str, results: list, transform: TagTransform) -> int:
+    """
+    Adds the objects sent in a bulk update to the tag index
+
+    :param obj_type: type of object, one of clients, assets, reports, findings, or writeups
+    :type obj_type: str
+    :param results: list of each object sent with its updated tags, and whether it was updated, from a `BulkTagWriter`
+    :type results: list
+    :param transform: compiled tag changes
+    :type transform: TagTransform
+    :return: number of objects that could not be updated
+    :rtype: int
+    """
+    num_failed = 0
+    for (record, _), updated in results:
+        index_object(obj_type, record, transform, updated)
+        num_failed += not updated
+    return num_failed
+
+
+def get_writeups() -> StreamedObjects | list:
+    """
+    Gets all writeups from tenant as WriteupRecords. The endpoint returns every writeup in a single response, so when
+    streaming objects is enabled in settings.py the request is sent when the writeups are iterated over, and writeups
+    are parsed as the response is downloaded. Otherwise the entire response is loaded.
+
+    :raises Exception: could not retrieve writeups, when not streaming
+    :return: iterable of writeups that parses writeups as they are downloaded, or the list of all writeups
+    :rtype: StreamedObjects | list
     """
     # writeup data from response is shaped like
     # {
@@ -329,11 +405,13 @@ def get_writeups(writeups: list = []) -> None:
         # "tenantId": 0,
         # "title": "Sample Writeup"
     # }
+    if settings.stream_objects:
+        return StreamedObjects(lambda: request_handler.call_streaming(api._v1._content_library.writeups.list_writeups, auth.base_url, auth.get_auth_headers()).iter_json_array(), WriteupRecord.from_json)
     try:
         response = api._v1._content_library.writeups.list_writeups(auth.base_url, auth.get_auth_headers())
+        return [WriteupRecord.from_json(writeup) for writeup in response.json]
     except Exception as e:
         raise Exception(f'Could not retrieve writeups from instance.') from e
-    writeups += deepcopy(response.json)
 
 
 def add_tags_to_tenant(tags: list) -> bool:
@@ -388,367 +466,752 @@ def remove_tags_from_tenant(tags: list) -> bool:
     return all_removed_successfully
 
 
-def need_tag_updates(obj_tags: list, tags_to_find: list) -> bool:
+class PartialUpdateSupport():
     """
-    _summary_
+    Tracks whether the update endpoint for a type of object only updates the keys sent in the request, which allows
+    sending only `{"tags": [...]}` instead of fetching and sending back the full object.
 
-    :param tags: _description_
-    :type tags: list
-    :return: _description_
+    Support is unknown until the first object of the type needing an update is probed, see `probe_partial_update`
+    """
+    def __init__(self):
+        self.supported = None
+        self.lock = threading.Lock()
+
+partial_update_support = {
+    "assets": PartialUpdateSupport(),
+    "findings": PartialUpdateSupport()
+}
+
+# keys the platform changes whenever an object is updated, ignored when checking that a partial update didn't change other keys
+PARTIAL_UPDATE_IGNORED_KEYS = ["tags", "updatedAt", "last_update", "lastUpdate", "updated_at"]
+
+
+def probe_partial_update(obj_type: str, get_obj: Callable[[], dict], put_obj: Callable[[dict], None], transform: TagTransform) -> bool:
+    """
+    Checks if the update endpoint for a type of object supports partial updates, by updating an object with a payload
+    of only its updated tags, then fetching the object again to check that the tags were updated and nothing else on the
+    object changed. If anything else changed, or the check failed part way, the full object is sent back with the updated
+    tags to restore it.
+
+    Either way, the tags on the object are updated when this returns.
+
+    :raises Exception: the object could not be fetched, or could not be restored after the check. if it couldn't be restored, the full object from before the check is logged so it can be restored by hand
+
+    :param obj_type: type of object being probed, used in log messages
+    :type obj_type: str
+    :param get_obj: function that fetches the full object
+    :type get_obj: Callable[[], dict]
+    :param put_obj: function that sends an update payload for the object
+    :type put_obj: Callable[[dict], None]
+    :return: whether partial updates are supported
     :rtype: bool
     """
-    if len(obj_tags) < 1:
-        return False
-    needs_update = False
-    for tag in obj_tags:
-        if tag in tags_to_find:
-            needs_update = True
-    if not needs_update:
-        return False
+    original = get_obj()
+    new_tags, _ = transform.apply(original.get('tags', []))
+    supported = False
+    try:
+        put_obj({"tags": new_tags})
+        updated = get_obj()
+        unchanged = all(updated.get(key) == value for key, value in original.items() if key not in PARTIAL_UPDATE_IGNORED_KEYS)
+        supported = updated.get('tags') == new_tags and unchanged
+    except Exception as e:
+        log.exception(f'Could not check if partial updates are supported for {obj_type}')
+    finally:
+        if not supported:
+            log.warning(f'Partial updates are not supported for {obj_type}. Restoring probed object and sending full objects for updates')
+            try:
+                put_obj({**original, "tags": new_tags})
+            except Exception as e:
+                log.critical(f'Could not restore the {obj_type[:-1]} used to check for partial updates. Fields other than tags may have been cleared. Restore it from its content before the check:\n{json.dumps(original)}')
+                raise
+
+    if supported:
+        log.success(f'Verified partial updates are supported for {obj_type}. Only updated tags will be sent')
+    return supported
+
+
+def partial_tag_update(obj_type: str, obj_tag_ids: Tuple[int], get_obj: Callable[[], dict], put_obj: Callable[[dict], None], transform: TagTransform) -> bool | None:
+    """
+    Updates an object by sending only its updated tags, if partial updates are enabled in settings.py and supported for
+    the type of object. The first object of each type to be updated probes whether partial updates are supported.
+    Safe to run concurrently.
+
+    :param obj_type: type of object being updated, a key in `partial_update_support`
+    :type obj_type: str
+    :param obj_tag_ids: IDs of the current tags on the object
+    :type obj_tag_ids: Tuple[int]
+    :param get_obj: function that fetches the full object
+    :type get_obj: Callable[[], dict]
+    :param put_obj: function that sends an update payload for the object
+    :type put_obj: Callable[[dict], None]
+    :raises Exception: exceptions from requests are not caught
+    :return: True if the object was updated, None if partial updates are disabled or not supported and the full object needs to be sent
+    :rtype: bool | None
+    """
+    if not settings.partial_updates:
+        return None
+    support = partial_update_support[obj_type]
+    if support.supported is None:
+        with support.lock:
+            if support.supported is None:
+                support.supported = False # if the check fails, another object isn't used to check again
+                support.supported = probe_partial_update(obj_type, get_obj, put_obj, transform)
+                return True
+    if not support.supported:
+        return None
+
+    new_tags, _ = transform.apply_ids(obj_tag_ids)
+    put_obj({"tags": new_tags})
     return True
 
 
+def update_client_tags(client: ClientRecord, transform: TagTransform) -> bool | None:
+    """
+    Runs the fetch, update tags, and update object pipeline for a single client. Safe to run concurrently.
 
-class client_action_params(TypedDict):
-    obj_tags: List[str]
-    tags_to_find: List[str]
-    tags_to_act: List[str]
+    :return: True if the client was updated, False if the client could not be updated, None if no update was needed
+    :rtype: bool | None
+    """
+    log.info(f'Processing tags in client \'{client.name}\'...')
 
-def refractor_tags(params: client_action_params) -> None:
-    for i, tag in enumerate(params['obj_tags']): # checking each tag to see if it needs to be replaced
-        if tag in params['tags_to_find']:
-            replacement_tag = params['tags_to_act'][params['tags_to_find'].index(tag)]
-            params['obj_tags'].pop(i)
-            params['obj_tags'].insert(i, replacement_tag)
+    # check if the client tags need to be update, the check here saves an api call if not required
+    if not transform.matches(client.tag_ids):
+        log.info(f'Contains no tags to refactor')
+        return None
 
-def remove_tags(params: client_action_params) -> None:
-    for tag in params['obj_tags']: # checking each tag to see if it needs to be removed
-        if tag in params['tags_to_find']:
-            params['obj_tags'].remove(tag)
+    # refactor tags on client
+    new_tags, changed = transform.apply_ids(client.tag_ids)
+    if not changed:
+        log.info(f'Contains no tags to refactor')
+        return None
+    client_update_payload = {"tags": new_tags} # the update endpoint is not a true PUT and works to just update the keys in the request
 
-def add_tags(params: client_action_params) -> None:
-    for i, tag in enumerate(params['obj_tags']): # checking each tag to see if another tag should be added
-        if tag in params['tags_to_find']:
-            additional_tag = params['tags_to_act'][params['tags_to_find'].index(tag)]
-            params['obj_tags'].append(additional_tag)
+    # update client
+    try:
+        response = api._v1.clients.update_client(auth.base_url, auth.get_auth_headers(), client.client_id, client_update_payload)
+    except Exception as e:
+        log.exception(f'Could not update client. Skipping...')
+        return False
 
+    log.success(f'Refactored all tags in {client.name}')
+    return True
 
 
-class action_params(TypedDict):
-    tags_to_find: List[str]
-    tags_to_act: List[str]
+def handle_client_tag_updates(skipped_objects: list, clients: PagedObjects | list, transform: TagTransform) -> None:
+    num_skipped = skipped_objects[0]
+    num_deferred = len(deferred_queue)
+    metrics = IterationMetrics(len(clients))
+    retry = lambda deferred: handle_client_tag_updates(skipped_objects, deferred, transform)
+    for client, updated in run_deferring_open_circuits(clients, lambda client: update_client_tags(client, transform), settings.concurrency, "default", lambda updated: updated == False, retry):
+        if updated == False:
+            skipped_objects[0] += 1
+        index_object("clients", client, transform, updated)
+        log.info(metrics.print_iter_metrics())
+    skipped_objects[0] += count_unloaded_objects(clients, "clients")
+    tag_index.finish_scan("clients", loaded_all_objects(clients) and skipped_objects[0] == num_skipped and len(deferred_queue) == num_deferred)
 
 
-def handle_client_tag_updates(skipped_objects: list, clients: list, action: Callable[[client_action_params], None], params: action_params) -> None:
-    metrics = IterationMetrics(len(clients))
-    for client in clients:
-        log.info(f'Processing tags in client \'{client["name"]}\'...')
+def update_asset_tags(asset: AssetRecord, transform: TagTransform) -> bool | None:
+    """
+    Runs the fetch, update tags, and update object pipeline for a single asset. Safe to run concurrently.
 
-        # check if the client tags need to be update, the check here saves an api call if not required
-        if not need_tag_updates(client.get('tags', []), params['tags_to_find']):
-            log.info(f'Contains no tags to refactor')
-            log.info(metrics.print_iter_metrics())
-            continue
+    :return: True if the asset was updated, False if the asset could not be updated, None if no update was needed
+    :rtype: bool | None
+    """
+    log.info(f'Processing tags in asset \'{asset.asset}\'...')
 
-        # get needed client object
-        client_update_payload = {"tags": client.get('tags', [])} # the update endpoint is not a true PUT and works to just update the keys in the request
+    # check if the asset tags need to be update, the check here saves an api call if not required
+    if not transform.matches(asset.tag_ids):
+        log.info(f'Contains no tags to refactor')
+        return None
 
-        # refactor tags on client
-        client_params = {
-            "obj_tags": client_update_payload.get('tags', []),
-            "tags_to_find": params['tags_to_find'],
-            "tags_to_act": params['tags_to_act']
-        }
-        action(client_params)
+    # only send updated tags if the asset update endpoint supports it, saves fetching the full asset
+    try:
+        if partial_tag_update("assets", asset.tag_ids,
+                              lambda: api._v1.assets.get_asset(auth.base_url, auth.get_auth_headers(), asset.client_id, asset.id).json,
+                              lambda payload: api._v1.assets.update_asset(auth.base_url, auth.get_auth_headers(), asset.client_id, asset.id, payload),
+                              transform):
+            log.success(f'Refactored all tags in {asset.asset}')
+            return True
+    except Exception as e:
+        log.exception(f'Could not update asset. Skipping...')
+        return False
 
-        # update client
-        try:
-            response = api._v1.clients.update_client(auth.base_url, auth.get_auth_headers(), client['client_id'], client_update_payload)
-        except Exception as e:
-            log.exception(f'Could not update client. Skipping...')
-            skipped_objects[0] += 1
-            log.info(metrics.print_iter_metrics())
-            continue
+    # get full asset object
+    try:
+        response = api._v1.assets.get_asset(auth.base_url, auth.get_auth_headers(), asset.client_id, asset.id)
+        asset_update_payload = response.json
+    except Exception as e:
+        log.exception(f'Could not load asset. Skipping...')
+        return False
+    
+    # refactor tags on 
+    asset_update_payload['tags'], _ = transform.apply(asset_update_payload.get('tags', []))
 
-        log.success(f'Refactored all tags in {client["name"]}')
-        log.info(metrics.print_iter_metrics())
+    # update asset
+    try:
+        response = api._v1.assets.update_asset(auth.base_url, auth.get_auth_headers(), asset.client_id, asset.id, asset_update_payload)
+    except Exception as e:
+        log.exception(f'Could not update asset. Skipping...')
+        return False
 
+    log.success(f'Refactored all tags in {asset.asset}')
+    return True
 
-def handle_asset_tag_updates(skipped_objects: list, assets: list, action: Callable[[client_action_params], None], params: action_params) -> None:
+
+def handle_asset_tag_updates(skipped_objects: list, assets: PagedObjects | list, transform: TagTransform) -> None:
+    num_skipped = skipped_objects[1]
+    num_deferred = len(deferred_queue)
     metrics = IterationMetrics(len(assets))
-    for asset in assets:
-        log.info(f'Processing tags in asset \'{asset["asset"]}\'...')
+    retry = lambda deferred: handle_asset_tag_updates(skipped_objects, deferred, transform)
+    for asset, updated in run_deferring_open_circuits(assets, lambda asset: update_asset_tags(asset, transform), settings.concurrency, "assets", lambda updated: updated == False, retry):
+        if updated == False:
+            skipped_objects[1] += 1
+        index_object("assets", asset, transform, updated)
+        log.info(metrics.print_iter_metrics())
+    skipped_objects[1] += count_unloaded_objects(assets, "assets")
+    tag_index.finish_scan("assets", loaded_all_objects(assets) and skipped_objects[1] == num_skipped and len(deferred_queue) == num_deferred)
 
-        # check if the asset tags need to be update, the check here saves an api call if not required
-        if not need_tag_updates(asset.get('tags', []), params['tags_to_find']):
-            log.info(f'Contains no tags to refactor')
-            log.info(metrics.print_iter_metrics())
-            continue
 
-        # get full asset object
-        try:
-            response = api._v1.assets.get_asset(auth.base_url, auth.get_auth_headers(), asset['client_id'], asset['id'])
-            asset_update_payload = response.json
-        except Exception as e:
-            log.exception(f'Could not load asset. Skipping...')
-            skipped_objects[1] += 1
-            log.info(metrics.print_iter_metrics())
-            continue
-        
-        # refactor tags on 
-        asset_params = {
-            "obj_tags": asset_update_payload.get('tags', []),
-            "tags_to_find": params['tags_to_find'],
-            "tags_to_act": params['tags_to_act']
-        }
-        action(asset_params)
+def put_report_tags(report: ReportRecord, tags: List[str]) -> bool:
+    """
+    Updates the tags on a single report
 
-        # update asset
-        try:
-            response = api._v1.assets.update_asset(auth.base_url, auth.get_auth_headers(), asset['client_id'], asset['id'], asset_update_payload)
-        except Exception as e:
-            log.exception(f'Could not update asset. Skipping...')
-            skipped_objects[1] += 1
-            log.info(metrics.print_iter_metrics())
-            continue
+    :return: whether the report was updated
+    :rtype: bool
+    """
+    report_update_payload = {"tags": tags} # the update endpoint is not a true PUT and works to just update the keys in the request
+    try:
+        response = api._v1.reports.update_report(auth.base_url, auth.get_auth_headers(), report.client_id, report.id, report_update_payload)
+    except Exception as e:
+        log.exception(f'Could not update report. Skipping...')
+        return False
+    log.success(f'Refactored all tags in {report.name}')
+    return True
 
-        log.success(f'Refactored all tags in {asset["asset"]}')
-        log.info(metrics.print_iter_metrics())
 
+def send_bulk_report_tags(reports: List[Tuple[ReportRecord, List[str]]], tags_to_add: Tuple[str]) -> None:
+    """
+    Adds tags to a chunk of reports with a single request to the bulk report tags endpoint
 
-def handle_report_tag_updates(skipped_objects: list, reports: list, tl: TagLocations, action: Callable[[client_action_params], None], params: action_params) -> None:
-    metrics = IterationMetrics(len(reports))
-    for report in reports:
-
-        if "reports" in tl.get_selected():
-            log.info(f'Processing tags in report \'{report["name"]}\'...')
-            # check if the report tags need to be update
-            if need_tag_updates(report.get('tags', []), params['tags_to_find']):
-                # get needed report object
-                report_update_payload = {"tags": report.get('tags', [])} # the update endpoint is not a true PUT and works to just update the keys in the request
-
-                # refactor tags on report
-                report_params = {
-                    "obj_tags": report_update_payload.get('tags', []),
-                    "tags_to_find": params['tags_to_find'],
-                    "tags_to_act": params['tags_to_act']
-                }
-                action(report_params)
-
-                # update report
-                try:
-                    response = api._v1.reports.update_report(auth.base_url, auth.get_auth_headers(), report['client_id'], report['id'], report_update_payload)
-                except Exception as e:
-                    log.exception(f'Could not update report. Skipping...')
-                    skipped_objects[2] += 1
-                    log.info(metrics.print_iter_metrics())
-                    continue
-
-                log.success(f'Refactored all tags in {report["name"]}')
-            else:
-                log.info(f'Report contains no tags to refactor')
+    :param reports: list of reports to update, each paired with its updated list of tags
+    :type reports: List[Tuple[ReportRecord, List[str]]]
+    :param tags_to_add: tags to add to each report
+    :type tags_to_add: Tuple[str]
+    """
+    payload = {
+        "reportIds": [report.id for report, tags in reports],
+        "tags": list(tags_to_add)
+    }
+    api._v2.reports.bulk_add_tags_to_report(auth.base_url, auth.get_auth_headers(), payload)
 
-        if "findings" in tl.get_selected():
-            # refactor finding tags
-            if report.get('findings', 0) < 1:
-                continue
-            log.info(f'Loading findings from report...')
-            findings = []
-            if not get_page_of_findings(report['client_id'], report['id'], 0, findings=findings):
-                continue
-            log.debug(f'num of findings founds: {len(findings)}')
 
-            handle_finding_tag_updates(skipped_objects, findings, action, params)
+def verify_bulk_report_tags(report_tags: Tuple[ReportRecord, List[str]]) -> bool:
+    """
+    Re-reads a report sent to the bulk report tags endpoint, and checks that the tags were added
+
+    :param report_tags: report that was sent, paired with its updated list of tags
+    :type report_tags: Tuple[ReportRecord, List[str]]
+    :return: whether the report has the updated tags
+    :rtype: bool
+    """
+    report, tags = report_tags
+    try:
+        response = api._v1.reports.get_report(auth.base_url, auth.get_auth_headers(), report.client_id, report.id)
+    except Exception as e:
+        log.exception(f'Could not load report to check the bulk tag update')
+        return False
+    return set(tags) <= set(response.json.get('tags') or [])
+
+
+def update_report_tags(report: ReportRecord, tl: TagLocations, transform: TagTransform) -> Tuple[bool | None, Tuple[List[str], Tuple[str]] | None, PagedObjects | list | None]:
+    """
+    Runs the update tags pipeline for a single report and loads the findings on the report if finding tags should be
+    updated. Safe to run concurrently.
+
+    If bulk tag updates are enabled in settings.py and the only change to the report is adding tags, the report is not
+    updated here. Instead the updated tags are returned, so the report can be sent to the bulk report tags endpoint with
+    other reports getting the same tags.
+
+    :return: tuple of
+     - whether the report was updated (True if updated, False if it could not be updated, None if no update was needed or it was deferred to a bulk update)
+     - the updated tags and the tags added, if the update was deferred to a bulk update, else None
+     - the findings on the report, or None if findings were not loaded
+    :rtype: Tuple[bool | None, Tuple[List[str], Tuple[str]] | None, PagedObjects | list | None]
+    """
+    updated = None
+    bulk_update = None
+    if "reports" in tl.get_selected():
+        log.info(f'Processing tags in report \'{report.name}\'...')
+        # check if the report tags need to be update
+        # refactor tags on report
+        new_tags, changed = transform.apply_ids(report.tag_ids) if transform.matches(report.tag_ids) else (None, False)
+        if changed:
+            # update report
+            tags_to_add = get_added_tags(report.tags, new_tags)
+            if settings.bulk_tag_updates and tags_to_add is not None:
+                bulk_update = (new_tags, tags_to_add)
+            else:
+                updated = put_report_tags(report, new_tags)
+        else:
+            log.info(f'Report contains no tags to refactor')
+
+    if "findings" in tl.get_selected():
+        # load findings to refactor finding tags
+        if report.num_findings < 1:
+            return updated, bulk_update, None
+        log.info(f'Loading findings from report...')
+        findings = get_findings(report.client_id, report.id)
+        if findings is None:
+            return updated, bulk_update, None
+        log.debug(f'num of findings founds: {len(findings)}')
+        if not settings.stream_objects:
+            findings = list(findings)
+        return updated, bulk_update, findings
+
+    return updated, bulk_update, None
+
+
+def handle_report_tag_updates(skipped_objects: list, reports: PagedObjects | list, tl: TagLocations, transform: TagTransform) -> None:
+    num_skipped_reports = skipped_objects[2]
+    num_skipped_findings = skipped_objects[3]
+    loaded_all_findings = True
+    num_deferred = len(deferred_queue)
+    metrics = IterationMetrics(len(reports))
+    # reports that only need tags added are grouped by the tags to add and sent to the bulk endpoint in chunks
+    bulk_writer = BulkTagWriter(send_bulk_report_tags, lambda report_tags: put_report_tags(*report_tags), settings.bulk_chunk_size, "Bulk Add Tags to Report", verify_bulk_report_tags)
+    retry = lambda deferred: handle_report_tag_updates(skipped_objects, deferred, tl, transform)
+    # findings on reports in a failed bulk update were already processed, so only the reports are retried
+    reports_tl = TagLocations()
+    reports_tl.reports = True
+    retry_bulk = lambda deferred: handle_report_tag_updates(skipped_objects, [report for report, _ in deferred], reports_tl, transform)
+    for report, (updated, bulk_update, findings) in run_deferring_open_circuits(reports, lambda report: update_report_tags(report, tl, transform), settings.concurrency, "reports", lambda result: result[0] == False, retry):
+        if updated == False:
+            skipped_objects[2] += 1
+        if bulk_update is not None:
+            new_tags, tags_to_add = bulk_update
+            skipped_objects[2] += index_bulk_results("reports", defer_failed_items(bulk_writer.add((report, new_tags), tags_to_add), "reports", retry_bulk), transform)
+        else:
+            index_object("reports", report, transform, updated)
+
+        # refactor finding tags
+        if findings is not None:
+            handle_finding_tag_updates(skipped_objects, findings, transform)
+            loaded_all_findings = loaded_all_findings and loaded_all_objects(findings)
+        elif "findings" in tl.get_selected() and report.num_findings > 0:
+            loaded_all_findings = False
 
         # metrics for report tags and findings on report
         log.info(metrics.print_iter_metrics())
+    skipped_objects[2] += index_bulk_results("reports", defer_failed_items(bulk_writer.flush(), "reports", retry_bulk), transform)
+    skipped_objects[2] += count_unloaded_objects(reports, "reports")
+    # objects deferred while an endpoint was unavailable may be skipped when they are retried, so the index is only
+    # complete if nothing was deferred
+    no_deferred = len(deferred_queue) == num_deferred
+    tag_index.finish_scan("reports", loaded_all_objects(reports) and skipped_objects[2] == num_skipped_reports and no_deferred)
+    tag_index.finish_scan("findings", loaded_all_objects(reports) and loaded_all_findings and skipped_objects[3] == num_skipped_findings and no_deferred)
+
+
+def put_finding_tags(finding: FindingRecord, transform: TagTransform) -> bool:
+    """
+    Runs the fetch, update tags, and update object pipeline for a single finding. Safe to run concurrently.
+
+    :return: whether the finding was updated
+    :rtype: bool
+    """
+    # only send updated tags if the finding update endpoint supports it, saves fetching the full finding
+    try:
+        if partial_tag_update("findings", finding.tag_ids,
+                              lambda: api._v1.findings.get_finding(auth.base_url, auth.get_auth_headers(), finding.client_id, finding.report_id, finding.flaw_id).json,
+                              lambda payload: api._v1.findings.update_finding(auth.base_url, auth.get_auth_headers(), finding.client_id, finding.report_id, finding.flaw_id, payload),
+                              transform):
+            log.success(f'Refactored all tags in {finding.title}')
+            return True
+    except Exception as e:
+        log.exception(f'Could not update finding. Skipping...')
+        return False
+
+    # get full finding object - this shouldn't be needed but the response from the bulk vs single get is slightly different
+    try:
+        response = api._v1.findings.get_finding(auth.base_url, auth.get_auth_headers(), finding.client_id, finding.report_id, finding.flaw_id)
+        finding_update_payload = response.json
+    except Exception as e:
+        log.exception(f'Could not load finding. Skipping...')
+        return False
+
+    # refactor tags on finding
+    finding_update_payload['tags'], _ = transform.apply(finding_update_payload.get('tags', []))
+
+    # update finding
+    try:
+        response = api._v1.findings.update_finding(auth.base_url, auth.get_auth_headers(), finding.client_id, finding.report_id, finding.flaw_id, finding_update_payload)
+    except Exception as e:
+        log.exception(f'Could not update finding. Skipping...')
+        return False
+
+    log.success(f'Refactored all tags in {finding.title}')
+    return True
+
+
+def send_bulk_finding_tags(findings: List[Tuple[FindingRecord, List[str]]], group = None) -> None:
+    """
+    Updates the tags of a chunk of findings from the same report with a single request to the bulk update findings endpoint
+
+    :param findings: list of findings to update, each paired with its updated list of tags
+    :type findings: List[Tuple[FindingRecord, List[str]]]
+    """
+    client_id = findings[0][0].client_id
+    report_id = findings[0][0].report_id
+    payload = {
+        "findings": [{"flaw_id": finding.flaw_id, "tags": tags} for finding, tags in findings]
+    }
+    api._v2.findings.bulk_update_findings(auth.base_url, auth.get_auth_headers(), client_id, report_id, payload)
 
 
-def handle_finding_tag_updates(skipped_objects: list, findings: list, action: Callable[[client_action_params], None], params: action_params) -> None:
+def verify_bulk_finding_tags(finding_tags: Tuple[FindingRecord, List[str]]) -> bool:
+    """
+    Re-reads a finding sent to the bulk update findings endpoint, and checks that it has the updated tags
+
+    :param finding_tags: finding that was sent, paired with its updated list of tags
+    :type finding_tags: Tuple[FindingRecord, List[str]]
+    :return: whether the finding has the updated tags
+    :rtype: bool
+    """
+    finding, tags = finding_tags
+    try:
+        response = api._v1.findings.get_finding(auth.base_url, auth.get_auth_headers(), finding.client_id, finding.report_id, finding.flaw_id)
+    except Exception as e:
+        log.exception(f'Could not load finding to check the bulk tag update')
+        return False
+    return set(tags) == set(response.json.get('tags') or [])
+
+
+def update_finding_tags(finding: FindingRecord, transform: TagTransform) -> Tuple[bool | None, List[str] | None]:
+    """
+    Runs the update tags pipeline for a single finding. Safe to run concurrently.
+
+    If bulk tag updates are enabled in settings.py, the finding is not updated here. The updated tags are calculated
+    from the tags returned when the findings on the report were listed, and returned so the finding can be sent to the
+    bulk update findings endpoint with other findings from the same report.
+
+    :return: tuple of
+     - whether the finding was updated (True if updated, False if it could not be updated, None if no update was needed or it was deferred to a bulk update)
+     - the updated tags if the update was deferred to a bulk update, else None
+    :rtype: Tuple[bool | None, List[str] | None]
+    """
+    log.info(f'Processing tags in finding \'{finding.title}\'...')
+
+    # check if the finding tags need to be update, the check here saves an api call if not required
+    if not transform.matches(finding.tag_ids):
+        log.info(f'Contains no tags to refactor')
+        return None, None
+
+    # refactor tags on finding
+    new_tags, changed = transform.apply_ids(finding.tag_ids)
+    if not changed:
+        log.info(f'Contains no tags to refactor')
+        return None, None
+
+    if not settings.bulk_tag_updates:
+        return put_finding_tags(finding, transform), None
+    return None, new_tags
+
+
+def handle_finding_tag_updates(skipped_objects: list, findings: PagedObjects | list, transform: TagTransform) -> None:
     findings_metrics = IterationMetrics(len(findings))
+    # findings are from a single report, updated findings are sent to the bulk update endpoint for the report in chunks
+    bulk_writer = BulkTagWriter(send_bulk_finding_tags, lambda finding_tags: put_finding_tags(finding_tags[0], transform), settings.bulk_chunk_size, "Bulk Update Findings", verify_bulk_finding_tags)
+    retry = lambda deferred: handle_finding_tag_updates(skipped_objects, deferred, transform)
+    retry_bulk = lambda deferred: handle_finding_tag_updates(skipped_objects, [finding for finding, _ in deferred], transform)
+    for finding, (updated, new_tags) in run_deferring_open_circuits(findings, lambda finding: update_finding_tags(finding, transform), settings.concurrency, "findings", lambda result: result[0] == False, retry):
+        if updated == False:
+            skipped_objects[3] += 1
+        if new_tags is not None:
+            skipped_objects[3] += index_bulk_results("findings", defer_failed_items(bulk_writer.add((finding, new_tags)), "findings", retry_bulk), transform)
+        else:
+            index_object("findings", finding, transform, updated)
+        log.info(findings_metrics.print_iter_metrics())
+    skipped_objects[3] += index_bulk_results("findings", defer_failed_items(bulk_writer.flush(), "findings", retry_bulk), transform)
+    skipped_objects[3] += count_unloaded_objects(findings, "findings")
+
+
+def handle_indexed_finding_tag_updates(skipped_objects: list, findings: list, transform: TagTransform) -> None:
+    """
+    Updates findings found with the tag index. The findings are grouped by report, since updated findings are sent to
+    the bulk update endpoint of their report
+    """
+    report_findings = {}
     for finding in findings:
-        log.info(f'Processing tags in finding \'{finding["title"]}\'...')
+        report_findings.setdefault((finding.client_id, finding.report_id), []).append(finding)
+    for findings_on_report in report_findings.values():
+        handle_finding_tag_updates(skipped_objects, findings_on_report, transform)
 
-        # check if the finding tags need to be update, the check here saves an api call if not required
-        if not need_tag_updates(finding.get('tags', []), params['tags_to_find']):
-            log.info(f'Contains no tags to refactor')
-            log.info(findings_metrics.print_iter_metrics())
-            continue
 
-        # get full finding object - this shouldn't be needed but the response from the bulk vs single get is slightly different
-        try:
-            response = api._v1.findings.get_finding(auth.base_url, auth.get_auth_headers(), finding['client_id'], finding['report_id'], finding['flaw_id'])
-            finding_update_payload = response.json
-        except Exception as e:
-            log.exception(f'Could not load finding. Skipping...')
-            skipped_objects[1] += 1
-            log.info(findings_metrics.print_iter_metrics())
-            continue
+def put_writeup_tags(writeup: WriteupRecord, tags: List[str]) -> bool:
+    """
+    Updates the tags on a single writeup by fetching the entire writeup and sending it back with the updated tags
 
-        # refactor tags on finding
-        finding_params = {
-            "obj_tags": finding_update_payload.get('tags', []),
-            "tags_to_find": params['tags_to_find'],
-            "tags_to_act": params['tags_to_act']
-        }
-        action(finding_params)
+    :return: whether the writeup was updated
+    :rtype: bool
+    """
+    # get full writeup object, only the tags of writeups are kept when they are loaded
+    try:
+        response = api._v1._content_library.writeups.get_writeups(auth.base_url, auth.get_auth_headers(), writeup.doc_id)
+        writeup_update_payload = response.json
+    except Exception as e:
+        log.exception(f'Could not load writeup. Skipping...')
+        return False
 
-        # update finding
-        try:
-            response = api._v1.findings.update_finding(auth.base_url, auth.get_auth_headers(), finding['client_id'], finding['report_id'], finding['flaw_id'], finding_update_payload)
-        except Exception as e:
-            log.exception(f'Could not update finding. Skipping...')
-            skipped_objects[3] += 1
-            log.info(findings_metrics.print_iter_metrics())
-            continue
+    writeup_update_payload['tags'] = tags
+    try:
+        response = api._v1._content_library.writeups.update_writeups(auth.base_url, auth.get_auth_headers(), writeup.doc_id, writeup_update_payload)
+    except Exception as e:
+        log.exception(f'Could not update writeup. Skipping...')
+        return False
+    log.success(f'Refactored all tags in {writeup.title}')
+    return True
 
-        log.success(f'Refactored all tags in {finding["title"]}')
-        log.info(findings_metrics.print_iter_metrics())
 
+def send_bulk_writeup_tags(writeups: List[Tuple[WriteupRecord, List[str]]], tags_to_add: Tuple[str]) -> None:
+    """
+    Adds tags to a chunk of writeups with a single request to the WriteupsDB bulk tags endpoint
 
-def handle_writeup_tag_updates(skipped_objects: list, writeups: list, action: Callable[[client_action_params], None], params: action_params) -> None:
-    metrics = IterationMetrics(len(writeups))
-    for writeup in writeups:
-        log.info(f'Processing tags in writeup \'{writeup["title"]}\'...')
+    :param writeups: list of writeups to update, each paired with its updated list of tags
+    :type writeups: List[Tuple[WriteupRecord, List[str]]]
+    :param tags_to_add: tags to add to each writeup
+    :type tags_to_add: Tuple[str]
+    """
+    payload = {
+        "writeupIds": [writeup.doc_id for writeup, tags in writeups],
+        "tags": list(tags_to_add)
+    }
+    api._v2._content_library._writeupsdb.writeups.bulk_add_tags_to_writeups(auth.base_url, auth.get_auth_headers(), payload)
 
-        # check if the writeup tags need to be update
-        if not need_tag_updates(writeup.get('tags', []), params['tags_to_find']):
-            log.info(f'Contains no tags to refactor')
-            log.info(metrics.print_iter_metrics())
-            continue
 
-        # refactor tags on writeup
-        writeup_params = {
-            "obj_tags": writeup.get('tags', []),
-            "tags_to_find": params['tags_to_find'],
-            "tags_to_act": params['tags_to_act']
-        }
-        action(writeup_params)
+def verify_bulk_writeup_tags(writeup_tags: Tuple[WriteupRecord, List[str]]) -> bool:
+    """
+    Re-reads a writeup sent to the WriteupsDB bulk tags endpoint, and checks that the tags were added
 
-        # update writeup
-        try:
-            response = api._v1._content_library.writeups.update_writeups(auth.base_url, auth.get_auth_headers(), writeup['doc_id'], writeup)
-        except Exception as e:
-            log.exception(f'Could not update writeup. Skipping...')
-            skipped_objects[4] += 1
-            log.info(metrics.print_iter_metrics())
-            continue
+    :param writeup_tags: writeup that was sent, paired with its updated list of tags
+    :type writeup_tags: Tuple[WriteupRecord, List[str]]
+    :return: whether the writeup has the updated tags
+    :rtype: bool
+    """
+    writeup, tags = writeup_tags
+    try:
+        response = api._v1._content_library.writeups.get_writeups(auth.base_url, auth.get_auth_headers(), writeup.doc_id)
+    except Exception as e:
+        log.exception(f'Could not load writeup to check the bulk tag update')
+        return False
+    return set(tags) <= set(response.json.get('tags') or [])
 
-        log.success(f'Refactored all tags in {writeup["title"]}')
-        log.info(metrics.print_iter_metrics())
 
+def update_writeup_tags(writeup: WriteupRecord, transform: TagTransform) -> Tuple[bool | None, Tuple[List[str], Tuple[str]] | None]:
+    """
+    Runs the update tags and update object pipeline for a single writeup. Safe to run concurrently.
 
+    If bulk tag updates are enabled in settings.py and the only change to the writeup is adding tags, the writeup is not
+    updated here. Instead the updated tags are returned, so the writeup can be sent to the WriteupsDB bulk tags endpoint
+    with other writeups getting the same tags.
 
-def handle_refactor_tags():
-    tl = TagLocations()
-    # tl.set_all(True)
-    tl = get_tag_locations_from_user(tl)
-    if len(tl.get_selected()) == 0:
-        log.info(f'No locations selected to refractor tags. Exiting...')
-        exit()
+    :return: tuple of
+     - whether the writeup was updated (True if updated, False if it could not be updated, None if no update was needed or it was deferred to a bulk update)
+     - the updated tags and the tags added, if the update was deferred to a bulk update, else None
+    :rtype: Tuple[bool | None, Tuple[List[str], Tuple[str]] | None]
+    """
+    log.info(f'Processing tags in writeup \'{writeup.title}\'...')
+
+    # check if the writeup tags need to be update
+    if not transform.matches(writeup.tag_ids):
+        log.info(f'Contains no tags to refactor')
+        return None, None
+
+    # refactor tags on writeup
+    new_tags, changed = transform.apply_ids(writeup.tag_ids)
+    if not changed:
+        log.info(f'Contains no tags to refactor')
+        return None, None
+
+    # update writeup
+    tags_to_add = get_added_tags(writeup.tags, new_tags)
+    if settings.bulk_tag_updates and tags_to_add is not None:
+        return None, (new_tags, tags_to_add)
+    return put_writeup_tags(writeup, new_tags), None
+
+
+def handle_writeup_tag_updates(skipped_objects: list, writeups: StreamedObjects | list, transform: TagTransform) -> None:
+    num_skipped = skipped_objects[4]
+    num_deferred = len(deferred_queue)
+    metrics = IterationMetrics(None if isinstance(writeups, StreamedObjects) else len(writeups))
+    # writeups that only need tags added are grouped by the tags to add and sent to the bulk endpoint in chunks
+    bulk_writer = BulkTagWriter(send_bulk_writeup_tags, lambda writeup_tags: put_writeup_tags(*writeup_tags), settings.bulk_chunk_size, "Bulk Add Tags to Writeups", verify_bulk_writeup_tags)
+    retry = lambda deferred: handle_writeup_tag_updates(skipped_objects, deferred, transform)
+    retry_bulk = lambda deferred: handle_writeup_tag_updates(skipped_objects, [writeup for writeup, _ in deferred], transform)
+    for writeup, (updated, bulk_update) in run_deferring_open_circuits(writeups, lambda writeup: update_writeup_tags(writeup, transform), settings.concurrency, "writeups", lambda result: result[0] == False, retry):
+        if updated == False:
+            skipped_objects[4] += 1
+        if bulk_update is not None:
+            new_tags, tags_to_add = bulk_update
+            skipped_objects[4] += index_bulk_results("writeups", defer_failed_items(bulk_writer.add((writeup, new_tags), tags_to_add), "writeups", retry_bulk), transform)
+        else:
+            index_object("writeups", writeup, transform, updated)
+        log.info(metrics.print_iter_metrics())
+    skipped_objects[4] += index_bulk_results("writeups", defer_failed_items(bulk_writer.flush(), "writeups", retry_bulk), transform)
+    skipped_objects[4] += count_unloaded_objects(writeups, "writeups")
+    tag_index.finish_scan("writeups", loaded_all_objects(writeups) and skipped_objects[4] == num_skipped and len(deferred_queue) == num_deferred)
 
-    # get tag replacements from user
-    # ------------------------------
-    log.info(f'Since this operation affects many objects in the Plextrac DB it is better to make all tag refactions at once.')
-    log.info(f'First enter each tag that needs to be refactored. Afterwards you will enter the replacement for each entered tag.')
-    tags = []
-    replacements = []
-    to_string_repacements = ""
-    get_multiple_tags_from_user(tags)
-    for tag in tags:
-        replacement = get_tag_from_user(f'Enter a replacement tag for {tag}')
-        replacements.append(replacement)
-        to_string_repacements += f"'{tag}' -> '{replacement}' | "
-    to_string_repacements = to_string_repacements[:-3]
 
-    log.info(f'Selected following refactions: {to_string_repacements}')
-    if not input.continue_prompt("Make selected refactions"):
-        exit()
 
-    # load objects from PT
-    # --------------------
+def load_objects(tl: TagLocations) -> Tuple[PagedObjects | list, PagedObjects | list, PagedObjects | list, StreamedObjects | list]:
+    """
+    Loads the objects from the selected tag locations. If streaming objects is enabled in settings.py only the first page
+    of each type of object is loaded here, and the rest are loaded as objects are updated.
+
+    :param tl: selected tag locations
+    :type tl: TagLocations
+    :raises Exception: could not retrieve the objects of a selected type
+    :return: tuple of clients, assets, reports, and writeups
+    :rtype: Tuple[PagedObjects | list, PagedObjects | list, PagedObjects | list, StreamedObjects | list]
+    """
     log.info(f'Loading objects from from Plextrac instance...')
+    # every object of each selected type is loaded, so objects missing from the tag index after the update were deleted
+    for obj_type in tl.get_selected():
+        tag_index.start_scan(obj_type)
+    if "findings" in tl.get_selected():
+        tag_index.start_scan("reports")
 
     # get list of all clients in instance
     clients = []
     if "clients" in tl.get_selected():
-        get_page_of_clients(0, clients=clients)
+        clients = load_paged_objects(get_clients(), "clients")
         log.debug(f'num of clients founds: {len(clients)}')
 
     # get list of all assets in instance
     assets = []
     if "assets" in tl.get_selected():
-        get_page_of_assets(0, assets=assets)
+        assets = load_paged_objects(get_assets(), "assets")
         log.debug(f'num of assets founds: {len(assets)}')
 
     # get list of all report in instance - findings will be later called from reports
     reports = []
     if "reports" in tl.get_selected() or "findings" in tl.get_selected():
-        get_page_of_reports(0, reports=reports)
+        reports = load_paged_objects(get_reports(), "reports")
         log.debug(f'num of reports founds: {len(reports)}')
 
     # get list of all writeups in instance
     writeups = []
     if "writeups" in tl.get_selected():
-        get_writeups(writeups)
-        log.debug(f'num of writeups founds: {len(writeups)}')
+        writeups = get_writeups()
 
-    # refactor tags
-    # --------------
-    log.info(f'Loaded {len(clients)} client(s), {len(assets)} asset(s), {len(reports)} report(s), and {len(writeups)} writeup(s) from your Plextrac instance.')
-    if not input.continue_prompt(f'This will make requests to all objects that need to be refactored. This make take awhile'):
-        exit()
+    if settings.stream_objects:
+        num_writeups = "the" if isinstance(writeups, StreamedObjects) else len(writeups) # the number of writeups isn't known until they have all been read
+        log.info(f'Found {len(clients)} client(s), {len(assets)} asset(s), {len(reports)} report(s), and {num_writeups} writeup(s) in your Plextrac instance. Objects will be loaded as they are updated.')
+    else:
+        log.info(f'Loaded {len(clients)} client(s), {len(assets)} asset(s), {len(reports)} report(s), and {len(writeups)} writeup(s) from your Plextrac instance.')
+    return clients, assets, reports, writeups
 
-    skipped_objects = [0,0,0,0,0] # count of client, asset, report, finding, writeups that could not be refactored
 
-    # add new tags to tenant
-    # ----------------------
-    add_tags_to_tenant(replacements)
-        
-    # refactor client tags
-    refractor_params = {
-        "tags_to_find": tags,
-        "tags_to_act": replacements
-    }
-    handle_client_tag_updates(skipped_objects, clients, refractor_tags, refractor_params)
+def refresh_indexed_objects(obj_type: str, records: list, get_obj: Callable[[TagRecord], dict], transform: TagTransform) -> Tuple[list, int]:
+    """
+    Re-reads the current tags on objects found with the tag index. The index has the tags on each object as of the last
+    time it was indexed, and updates made from those tags would undo any tag changes made outside the script since then.
+    Objects that no longer have tags to change are dropped, and indexed with their current tags.
+
+    :param obj_type: type of object, one of clients, assets, reports, findings, or writeups
+    :type obj_type: str
+    :param records: records of the objects found with the tag index
+    :type records: list
+    :param get_obj: function that fetches the object of a record
+    :type get_obj: Callable[[TagRecord], dict]
+    :param transform: compiled tag changes
+    :type transform: TagTransform
+    :return: tuple of the records with their current tags that have tags to change, and the number of objects that could not be loaded
+    :rtype: Tuple[list, int]
+    """
+    def get_tags(record: TagRecord) -> List[str] | None:
+        try:
+            return get_obj(record).get('tags') or []
+        except Exception as e:
+            log.exception(f'Could not load {obj_type} \'{record.index_key}\' found with the tag index. Skipping...')
+            return None
 
-    # refactor asset tags
-    refractor_params = {
-        "tags_to_find": tags,
-        "tags_to_act": replacements
-    }
-    handle_asset_tag_updates(skipped_objects, assets, refractor_tags, refractor_params)
+    refreshed = []
+    num_failed = 0
+    for record, tags in run_concurrently(records, get_tags, settings.concurrency):
+        if tags is None:
+            num_failed += 1
+            continue
+        record.tag_ids = tag_dictionary.encode(tags)
+        if transform.matches(record.tag_ids):
+            refreshed.append(record)
+        else:
+            tag_index.add(obj_type, record, record.tags)
+    return refreshed, num_failed
 
-    # refactor report tags
-    refractor_params = {
-        "tags_to_find": tags,
-        "tags_to_act": replacements
-    }
-    handle_report_tag_updates(skipped_objects, reports, tl, refractor_tags, refractor_params)
 
-    # refactor writeup tags
-    refractor_params = {
-        "tags_to_find": tags,
-        "tags_to_act": replacements
-    }
-    handle_writeup_tag_updates(skipped_objects, writeups, refractor_tags, refractor_params)
-    
-    # completion messaging
-    #---------------------
-    log.info(f'\n\nFinished refactoring tags on objects.\n')
-    if sum(skipped_objects) > 0:
-        log.warning(f'Could not refactor {skipped_objects[0]} client(s), {skipped_objects[1]} asset(s), {skipped_objects[2]} report(s), {skipped_objects[3]} finding(s), and {skipped_objects[4]} writeup(s). See log file for details')
-        log.info(f'Skipping removing tag from tenant since all references of tags were not removed from objects')
-        log.info(f'Completed. See log file for details')
+def load_indexed_objects(tl: TagLocations, transform: TagTransform) -> Tuple[list, list, list, list, list, List[int]]:
+    """
+    Finds the objects from the selected tag locations that have tags to change in the tag index, instead of loading every
+    object from the instance. Each object found is re-read, so tags are changed from the tags currently on the object.
+    Findings are returned on their own, since the reports they are on may not have tags to change.
+
+    :param tl: selected tag locations
+    :type tl: TagLocations
+    :param transform: compiled tag changes
+    :type transform: TagTransform
+    :return: tuple of clients, assets, reports, writeups, findings, and the count of client, asset, report, finding, and writeups found that could not be loaded
+    :rtype: Tuple[list, list, list, list, list, List[int]]
+    """
+    log.info(f'Finding objects with tags to change in tag index...')
+    selected = tl.get_selected()
+    clients = tag_index.find_matching_objects("clients", transform, ClientRecord.from_json) if "clients" in selected else []
+    assets = tag_index.find_matching_objects("assets", transform, AssetRecord.from_json) if "assets" in selected else []
+    reports = tag_index.find_matching_objects("reports", transform, ReportRecord.from_json) if "reports" in selected else []
+    findings = tag_index.find_matching_objects("findings", transform, FindingRecord.from_json) if "findings" in selected else []
+    writeups = tag_index.find_matching_objects("writeups", transform, WriteupRecord.from_json) if "writeups" in selected else []
+    log.info(f'Found {len(clients)} client(s), {len(assets)} asset(s), {len(reports)} report(s), {len(findings)} finding(s), and {len(writeups)} writeup(s) with tags to change in the tag index.')
+
+    # the index may be out of date, so the current tags are loaded from the instance
+    log.info(f'Loading current tags on objects found in tag index...')
+    skipped_objects = [0,0,0,0,0] # count of client, asset, report, finding, writeups that could not be loaded
+    clients, skipped_objects[0] = refresh_indexed_objects("clients", clients, lambda client: api._v1.clients.get_client(auth.base_url, auth.get_auth_headers(), client.client_id).json, transform)
+    assets, skipped_objects[1] = refresh_indexed_objects("assets", assets, lambda asset: api._v1.assets.get_asset(auth.base_url, auth.get_auth_headers(), asset.client_id, asset.id).json, transform)
+    reports, skipped_objects[2] = refresh_indexed_objects("reports", reports, lambda report: api._v1.reports.get_report(auth.base_url, auth.get_auth_headers(), report.client_id, report.id).json, transform)
+    findings, skipped_objects[3] = refresh_indexed_objects("findings", findings, lambda finding: api._v1.findings.get_finding(auth.base_url, auth.get_auth_headers(), finding.client_id, finding.report_id, finding.flaw_id).json, transform)
+    writeups, skipped_objects[4] = refresh_indexed_objects("writeups", writeups, lambda writeup: api._v1._content_library.writeups.get_writeups(auth.base_url, auth.get_auth_headers(), writeup.doc_id).json, transform)
+    tag_index.flush()
+    log.info(f'{len(clients)} client(s), {len(assets)} asset(s), {len(reports)} report(s), {len(findings)} finding(s), and {len(writeups)} writeup(s) still have tags to change.')
+    return clients, assets, reports, writeups, findings, skipped_objects
+
+
+def handle_refactor_tags():
+    tl = TagLocations()
+    # tl.set_all(True)
+    tl = get_tag_locations_from_user(tl)
+    if len(tl.get_selected()) == 0:
+        log.info(f'No locations selected to refractor tags. Exiting...')
         exit()
 
-    # remove tags from tenant
-    # ----------------------
-    if not tl.is_all_selected():
-        log.info(f'Skipping removing tag from tenant since not all objects were selected to make refractions on')
+    # get tag replacements from user
+    # ------------------------------
+    log.info(f'Since this operation affects many objects in the Plextrac DB it is better to make all tag refactions at once.')
+    log.info(f'First enter each tag that needs to be refactored. Afterwards you will enter the replacement for each entered tag.')
+    log.info(f'Tags can be patterns. \'client:*\' matches all tags starting with \'client:\', \'scan_20??_*\' is a glob pattern, and \'re:^scan_2023_\' is a regular expression. A replacement ending in * keeps the rest of a tag matched by a prefix, i.e. \'client:*\' -> \'customer:*\'')
+    tags = []
+    replacements = []
+    to_string_repacements = ""
+    get_multiple_tags_from_user(tags)
+    for tag in tags:
+        replacement = get_tag_from_user(f'Enter a replacement tag for {tag}')
+        replacements.append(replacement)
+        to_string_repacements += f"'{tag}' -> '{replacement}' | "
+    to_string_repacements = to_string_repacements[:-3]
+
+    log.info(f'Selected following refactions: {to_string_repacements}')
+    if not input.continue_prompt("Make selected refactions"):
         exit()
-    remove_tags_from_tenant(tags)
-    log.info(f'Completed. See log file for details')
+
+    handle_tag_rules(tl, [TagRuleSet.refactor(tags, replacements)])
 
 
 def handle_remove_tags():
@@ -762,6 +1225,7 @@ def handle_remove_tags():
     # get tags to remove from user
     # ------------------------------
     log.info(f'Enter each tag that needs to be removed.')
+    log.info(f'Tags can be patterns. \'client:*\' matches all tags starting with \'client:\', \'scan_20??_*\' is a glob pattern, and \'re:^scan_2023_\' is a regular expression')
     tags = []
     get_multiple_tags_from_user(tags)
     to_string_removals = ""
@@ -773,86 +1237,7 @@ def handle_remove_tags():
     if not input.continue_prompt("Remove selected tags"):
         exit()
 
-    # load objects from PT
-    # --------------------
-    log.info(f'Loading objects from from Plextrac instance...')
-
-    # get list of all clients in instance
-    clients = []
-    if "clients" in tl.get_selected():
-        get_page_of_clients(0, clients=clients)
-        log.debug(f'num of clients founds: {len(clients)}')
-
-    # get list of all assets in instance
-    assets = []
-    if "assets" in tl.get_selected():
-        get_page_of_assets(0, assets=assets)
-        log.debug(f'num of assets founds: {len(assets)}')
-
-    # get list of all report in instance - findings will be later called from reports
-    reports = []
-    if "reports" in tl.get_selected() or "findings" in tl.get_selected():
-        get_page_of_reports(0, reports=reports)
-        log.debug(f'num of reports founds: {len(reports)}')
-
-    # get list of all writeups in instance
-    writeups = []
-    if "writeups" in tl.get_selected():
-        get_writeups(writeups)
-        log.debug(f'num of writeups founds: {len(writeups)}')
-
-    # remove tags
-    # --------------
-    log.info(f'Loaded {len(clients)} client(s), {len(assets)} asset(s), {len(reports)} report(s), and {len(writeups)} writeup(s) from your Plextrac instance.')
-    if not input.continue_prompt(f'This will make requests to all objects that have tags to be removed. This make take awhile'):
-        exit()
-
-    skipped_objects = [0,0,0,0,0] # count of client, asset, report, finding, writeups that could not have tags removed
-        
-    # remove client tags
-    remove_params = {
-        "tags_to_find": tags,
-        "tags_to_act": []
-    }
-    handle_client_tag_updates(skipped_objects, clients, remove_tags, remove_params)
-
-    # remove asset tags
-    remove_params = {
-        "tags_to_find": tags,
-        "tags_to_act": []
-    }
-    handle_asset_tag_updates(skipped_objects, assets, remove_tags, remove_params)
-
-    # remove report tags
-    remove_params = {
-        "tags_to_find": tags,
-        "tags_to_act": []
-    }
-    handle_report_tag_updates(skipped_objects, reports, tl, remove_tags, remove_params)
-
-    # remove writeup tags
-    remove_params = {
-        "tags_to_find": tags,
-        "tags_to_act": []
-    }
-    handle_writeup_tag_updates(skipped_objects, writeups, remove_tags, remove_params)
-
-    # completion messaging
-    #---------------------
-    log.info(f'\n\nFinished removing tags on objects.\n')
-    if sum(skipped_objects) > 0:
-        log.warning(f'Could not remove tags on {skipped_objects[0]} client(s), {skipped_objects[1]} asset(s), {skipped_objects[2]} report(s), {skipped_objects[3]} finding(s), and {skipped_objects[4]} writeup(s). See log file for details')
-        log.info(f'Skipping removing tag from tenant since all references of tags were not removed from objects')
-        log.info(f'Completed. See log file for details')
-        exit()
-
-    # remove tags from tenant
-    # ----------------------
-    if not tl.is_all_selected():
-        log.info(f'Skipping removing tag from tenant since not all objects were selected to make refractions on')
-        exit()
-    remove_tags_from_tenant(tags)
-    log.info(f'Completed. See log file for details')
+    handle_tag_rules(tl, [TagRuleSet.remove(tags)])
 
 
 def handle_add_tags():
@@ -866,6 +1251,7 @@ def handle_add_tags():
     # get tag replacements from user
     # ------------------------------
     log.info(f'First enter each tag that needs to be found. Afterwards you will be prompted for each tag entered, to enter another tag that should be added wherever the first was found.')
+    log.info(f'Tags can be patterns. \'client:*\' matches all tags starting with \'client:\', \'scan_20??_*\' is a glob pattern, and \'re:^scan_2023_\' is a regular expression')
     tags = []
     additions = []
     to_string_additions = ""
@@ -880,97 +1266,412 @@ def handle_add_tags():
     if not input.continue_prompt("Make selected additions"):
         exit()
 
-    # load objects from PT
-    # --------------------
-    log.info(f'Loading objects from from Plextrac instance...')
+    handle_tag_rules(tl, [TagRuleSet.add(tags, additions)])
 
-    # get list of all clients in instance
-    clients = []
-    if "clients" in tl.get_selected():
-        get_page_of_clients(0, clients=clients)
-        log.debug(f'num of clients founds: {len(clients)}')
 
-    # get list of all assets in instance
-    assets = []
-    if "assets" in tl.get_selected():
-        get_page_of_assets(0, assets=assets)
-        log.debug(f'num of assets founds: {len(assets)}')
+def handle_tag_job():
+    tl = TagLocations()
+    # tl.set_all(True)
+    tl = get_tag_locations_from_user(tl)
+    if len(tl.get_selected()) == 0:
+        log.info(f'No locations selected to update tags. Exiting...')
+        exit()
 
-    # get list of all report in instance - findings will be later called from reports
-    reports = []
-    if "reports" in tl.get_selected() or "findings" in tl.get_selected():
-        get_page_of_reports(0, reports=reports)
-        log.debug(f'num of reports founds: {len(reports)}')
+    # get tag changes from user
+    # ------------------------------
+    log.info(f'Enter each change to make to tags, in the order they should be made. Each change applies to the tags left by the changes before it, and every object is only loaded and updated once.')
+    log.info(f'Tags can be patterns. \'client:*\' matches all tags starting with \'client:\', \'scan_20??_*\' is a glob pattern, and \'re:^scan_2023_\' is a regular expression')
+    rule_sets = []
+    to_string_changes = ""
+    while True:
+        change = input.user_options(f'Select a change to add to the job. Enter file to load changes from a CSV, JSON, or YAML rules file. Enter done to continue', "Invalid option", ["refractor", "remove", "add", "file", "done"])
+        if change == "done":
+            break
+        if change == "file":
+            try:
+                loaded_rules = load_tag_rules()
+            except ValueError as e:
+                log.error(e)
+                continue
+            rule_sets.extend(loaded_rules.rule_sets)
+            to_string_changes += f"{loaded_rules.num_rules} rule(s) from '{loaded_rules.file_path}' | "
+            continue
+        tags = []
+        get_multiple_tags_from_user(tags)
+        if change == "refractor":
+            replacements = [get_tag_from_user(f'Enter a replacement tag for {tag}') for tag in tags]
+            rule_sets.append(TagRuleSet.refactor(tags, replacements))
+            to_string_changes += " | ".join(f"'{tag}' -> '{replacement}'" for tag, replacement in zip(tags, replacements)) + " | "
+        elif change == "remove":
+            rule_sets.append(TagRuleSet.remove(tags))
+            to_string_changes += " | ".join(f"-'{tag}'" for tag in tags) + " | "
+        elif change == "add":
+            additions = [get_tag_from_user(f'Enter a tag to be added wherever \'{tag}\' is found') for tag in tags]
+            rule_sets.append(TagRuleSet.add(tags, additions))
+            to_string_changes += " | ".join(f"'{tag}' + '{addition}'" for tag, addition in zip(tags, additions)) + " | "
+    to_string_changes = to_string_changes[:-3]
+    if len(rule_sets) == 0:
+        log.info(f'No changes entered. Exiting...')
+        exit()
 
-    # get list of all writeups in instance
-    writeups = []
-    if "writeups" in tl.get_selected():
-        get_writeups(writeups)
-        log.debug(f'num of writeups founds: {len(writeups)}')
+    log.info(f'Selected following changes: {to_string_changes}')
+    if not input.continue_prompt("Make selected changes"):
+        exit()
 
-    # add tags
-    # --------------
-    log.info(f'Loaded {len(clients)} client(s), {len(assets)} asset(s), {len(reports)} report(s), and {len(writeups)} writeup(s) from your Plextrac instance.')
-    if not input.continue_prompt(f'This will make requests to all objects that have tags to be added. This make take awhile'):
+    handle_tag_rules(tl, rule_sets)
+
+
+def handle_tag_rules(tl: TagLocations, rule_sets: List[TagRuleSet]) -> None:
+    """
+    Compiles the tag changes entered by the user and runs them as a tag job, prompting before objects are updated.
+    Exits if the changes can't be compiled or the objects can't be loaded.
+
+    :param tl: selected tag locations
+    :type tl: TagLocations
+    :param rule_sets: tag changes entered by the user, in the order they should be made
+    :type rule_sets: List[TagRuleSet]
+    """
+    # compile the tag changes once, shared by every object updated
+    try:
+        transform = TagTransform(rule_sets)
+    except ValueError as e:
+        log.error(e)
         exit()
 
-    skipped_objects = [0,0,0,0,0] # count of client, asset, report, finding, writeups that could not be added
+    try:
+        run_tag_job(tl, transform, input.continue_prompt)
+    except Exception as e:
+        log.critical(f'{e} Exiting...')
+        exit()
 
-    # add new tags to tenant
-    # ----------------------
-    add_tags_to_tenant(additions)
-        
-    # add client tags
-    addition_params = {
-        "tags_to_find": tags,
-        "tags_to_act": additions
-    }
-    handle_client_tag_updates(skipped_objects, clients, add_tags, addition_params)
 
-    # add asset tags
-    addition_params = {
-        "tags_to_find": tags,
-        "tags_to_act": additions
-    }
-    handle_asset_tag_updates(skipped_objects, assets, add_tags, addition_params)
+def log_run_metrics(transform: TagTransform) -> dict:
+    """
+    Logs the metrics collected while updating tags on objects
 
-    # add report tags
-    addition_params = {
-        "tags_to_find": tags,
-        "tags_to_act": additions
+    :param transform: compiled tag changes used for the run
+    :type transform: TagTransform
+    :return: metrics of the run, included in the summary of a batch run
+    :rtype: dict
+    """
+    metrics = {
+        "connections": str(request_handler.connection_stats),
+        "rate_limits": rate_limit_handler.get_rate_limit_metrics(),
+        "retries": str(retry_handler.retry_stats),
+        "circuit_breakers": circuit_breaker_handler.get_circuit_breaker_metrics(),
+        "hedges": str(hedge_handler.hedge_stats),
+        "tag_transform_cache": transform.get_cache_metrics(),
+        "tag_index": tag_index.get_index_metrics()
     }
-    handle_report_tag_updates(skipped_objects, reports, tl, add_tags, addition_params)
+    log.info(f'Connection metrics: {metrics["connections"]}')
+    log.info(f'Rate limits: {metrics["rate_limits"]}')
+    log.info(f'Retry metrics: {metrics["retries"]}')
+    log.info(f'Circuit breakers: {metrics["circuit_breakers"]}')
+    log.info(f'Hedge metrics: {metrics["hedges"]}')
+    log.info(f'Tag transform cache: {metrics["tag_transform_cache"]}')
+    log.info(f'Tag index: {metrics["tag_index"]}')
+    return metrics
+
 
-    # add writeup tags
-    addition_params = {
-        "tags_to_find": tags,
-        "tags_to_act": additions
+def run_tag_job(tl: TagLocations, transform: TagTransform, confirm: Callable[[str], bool]) -> dict:
+    """
+    Loads the objects from the selected tag locations and makes the tag changes in the transform with a single update
+    per object, then updates the tenant level tags.
+
+    :param tl: selected tag locations
+    :type tl: TagLocations
+    :param transform: compiled tag changes
+    :type transform: TagTransform
+    :param confirm: function called with a message before objects are updated, returns whether to continue
+    :type confirm: Callable[[str], bool]
+    :raises Exception: could not retrieve the objects of a selected type
+    :return: summary of the run, with the keys status ("completed", "completed_with_errors", or "cancelled"), skipped, tenant_tags_added, tenant_tags_removed, and metrics
+    :rtype: dict
+    """
+    summary = {
+        "status": "cancelled",
+        "locations": tl.get_selected(),
+        "skipped": {},
+        "tenant_tags_added": [],
+        "tenant_tags_removed": [],
+        "metrics": {}
     }
-    handle_writeup_tag_updates(skipped_objects, writeups, add_tags, addition_params)
-    
+
+    # load objects from PT, or find the objects with tags to change in the tag index
+    # --------------------
+    findings = None
+    skipped_objects = [0,0,0,0,0] # count of client, asset, report, finding, writeups that could not be updated
+    use_index = settings.use_tag_index and tag_index.can_find(tl.get_selected())
+    if use_index:
+        clients, assets, reports, writeups, findings, skipped_objects = load_indexed_objects(tl, transform)
+    else:
+        if settings.use_tag_index:
+            log.info(f'Could not use tag index to find objects with tags to change. Loading all objects instead')
+        clients, assets, reports, writeups = load_objects(tl)
+    summary['used_tag_index'] = use_index
+
+    # update tags
+    # --------------
+    if not confirm(f'This will make requests to all objects that need tags updated. This make take awhile'):
+        return summary
+
+    # add new tags to tenant
+    # ----------------------
+    added_tags = transform.get_new_tags()
+    add_tags_to_tenant(added_tags)
+
+    # update client tags
+    handle_client_tag_updates(skipped_objects, clients, transform)
+
+    # update asset tags
+    handle_asset_tag_updates(skipped_objects, assets, transform)
+
+    # update report tags
+    if findings is None:
+        handle_report_tag_updates(skipped_objects, reports, tl, transform)
+    else:
+        # findings from the tag index are updated on their own, instead of loading the findings on each report
+        report_tl = TagLocations()
+        report_tl.reports = tl.reports
+        handle_report_tag_updates(skipped_objects, reports, report_tl, transform)
+        handle_indexed_finding_tag_updates(skipped_objects, findings, transform)
+
+    # update writeup tags
+    handle_writeup_tag_updates(skipped_objects, writeups, transform)
+
+    # retry objects deferred while an endpoint was unavailable, now that every other object has been updated
+    deferred_queue.run()
+    tag_index.flush()
+
+    # add tags created from patterns to tenant, these are only known once the objects with matching tags are updated
+    created_tags = [tag for tag in transform.get_new_tags() if tag not in added_tags]
+    if len(created_tags) > 0:
+        add_tags_to_tenant(created_tags)
+    summary['tenant_tags_added'] = added_tags + created_tags
+    summary['skipped'] = dict(zip(["clients", "assets", "reports", "findings", "writeups"], skipped_objects))
+
     # completion messaging
     #---------------------
-    log.info(f'\n\nFinished adding tags on objects.\n')
+    log.info(f'\n\nFinished updating tags on objects.\n')
+    summary['metrics'] = log_run_metrics(transform)
     if sum(skipped_objects) > 0:
-        log.warning(f'Could not add tags to {skipped_objects[0]} client(s), {skipped_objects[1]} asset(s), {skipped_objects[2]} report(s), {skipped_objects[3]} finding(s), and {skipped_objects[4]} writeup(s). See log file for details')
+        summary['status'] = "completed_with_errors"
+        log.warning(f'Could not update tags on {skipped_objects[0]} client(s), {skipped_objects[1]} asset(s), {skipped_objects[2]} report(s), {skipped_objects[3]} finding(s), and {skipped_objects[4]} writeup(s). See log file for details')
+        log.info(f'Skipping removing tags from tenant since all references of tags were not removed from objects')
         log.info(f'Completed. See log file for details')
-        exit()
+        return summary
 
+    # remove replaced and removed tags from tenant
+    # ----------------------
+    summary['status'] = "completed"
+    if not tl.is_all_selected():
+        log.info(f'Skipping removing tags from tenant since not all objects were selected to make changes on')
+        return summary
+    if use_index:
+        log.info(f'Skipping removing tags from tenant since objects were found with the tag index, and objects tagged since it was built may still have the tags')
+        return summary
+    removed_tags = transform.get_removed_tags()
+    if remove_tags_from_tenant(removed_tags):
+        summary['tenant_tags_removed'] = removed_tags
     log.info(f'Completed. See log file for details')
+    return summary
 
 
+# keys that can be set in a job file, see `load_job_file`
+JOB_FILE_KEYS = ["locations", "rules", "changes", "concurrency", "assume_yes", "summary", "use_index"]
+# exit codes of batch runs
+EXIT_COMPLETED = 0
+EXIT_COMPLETED_WITH_ERRORS = 1
+EXIT_FAILED = 2
 
-if __name__ == '__main__':
-    for i in settings.script_info:
-        print(i)
+def load_job_file(file_path: str) -> dict:
+    """
+    Loads a YAML or JSON job file, describing a batch run. Values from the command line take precedence over the job file.
+
+    job file : {
+        "locations": "all" or list of tag locations, i.e. ["findings", "assets"]
+        "rules": path to a CSV, JSON, or YAML rules file, relative to the job file
+        "changes": list of changes, in the same format as a JSON or YAML rules file. used instead of "rules"
+        "concurrency": number of objects to update at the same time
+        "assume_yes": true to make changes without confirmation prompts
+        "summary": path to write the JSON summary of the run to
+        "use_index": true to only load objects the tag index shows have tags to change
+    }
 
-    with open("config.yaml", 'r') as f:
+    :param file_path: path to the job file
+    :type file_path: str
+    :raises ValueError: file doesn't exist or isn't a valid job file
+    :return: loaded job
+    :rtype: dict
+    """
+    if not os.path.exists(file_path):
+        raise ValueError(f'Job file \'{file_path}\' does not exist')
+    try:
+        with open(file_path, 'r', encoding="utf8") as f:
+            job = yaml.safe_load(f) # JSON is valid YAML, so this loads either
+    except Exception as e:
+        raise ValueError(f'Could not load job file \'{file_path}\': {e}') from e
+    if not isinstance(job, dict):
+        raise ValueError(f'Job file \'{file_path}\' should contain an object with the keys {JOB_FILE_KEYS}')
+    unknown = [key for key in job if key not in JOB_FILE_KEYS]
+    if len(unknown) > 0:
+        raise ValueError(f'Job file \'{file_path}\' has unknown key(s) {unknown}. Valid keys are {JOB_FILE_KEYS}')
+    if job.get('rules') is not None and not os.path.isabs(job['rules']):
+        job['rules'] = os.path.join(os.path.dirname(file_path), job['rules'])
+    return job
+
+
+def get_tag_locations(locations: str | list) -> TagLocations:
+    """
+    Selects tag locations from a comma separated string or list of locations, or "all"
+
+    :raises ValueError: a location is invalid
+    """
+    tl = TagLocations()
+    if isinstance(locations, str):
+        locations = [location.strip() for location in locations.split(",") if location.strip() != ""]
+    for location in locations:
+        if location == "all":
+            tl.set_all(True)
+        elif location in tl.objs:
+            tl.__setattr__(location, True)
+        else:
+            raise ValueError(f'Invalid tag location \'{location}\'. Valid locations are {tl.objs + ["all"]}')
+    if len(tl.get_selected()) == 0:
+        raise ValueError(f'No tag locations selected')
+    return tl
+
+
+def prepare_batch_job(cli_args: argparse.Namespace, job: dict) -> Tuple[TagLocations, TagTransform, dict]:
+    """
+    Selects tag locations and compiles the tag changes for a batch run, from the command line arguments and job file
+
+    :raises ValueError: the job is invalid
+    :return: tuple of selected tag locations, compiled tag changes, and details of the rules for the summary
+    :rtype: Tuple[TagLocations, TagTransform, dict]
+    """
+    tl = get_tag_locations(cli_args.locations or job.get('locations', "all"))
+
+    rules_file = cli_args.rules or job.get('rules')
+    if rules_file is not None:
+        # the file is read without prompting for another file if it can't be loaded
+        loaded_rules = load_tag_rules(rules_file, False)
+    elif job.get('changes') is not None:
+        loaded_rules = build_tag_rules(parse_structured_rules(job['changes']), cli_args.job)
+    else:
+        raise ValueError(f'No tag changes given. Use --rules or set rules or changes in the job file')
+    if len(loaded_rules.rule_sets) == 0:
+        raise ValueError(f'No tag changes found in \'{loaded_rules.file_path}\'')
+
+    transform = TagTransform(loaded_rules.rule_sets)
+    rules = {
+        "source": loaded_rules.file_path,
+        "num_rules": loaded_rules.num_rules,
+        "num_changes": len(loaded_rules.rule_sets),
+        "num_duplicates": loaded_rules.num_duplicates
+    }
+    return tl, transform, rules
+
+
+def finish_batch_job(summary: dict, summary_file: str | None) -> None:
+    """
+    Prints the JSON summary of a batch run, writes it to the summary file if one is set, and exits with a code based on
+    the status of the run. 0 if completed, 1 if completed but some objects couldn't be updated, 2 if the run failed or
+    was cancelled
+    """
+    summary_json = json.dumps(summary, indent=2)
+    print(summary_json)
+    if summary_file is not None:
+        try:
+            with open(summary_file, 'w', encoding="utf8") as f:
+                f.write(summary_json)
+        except Exception as e:
+            log.exception(f'Could not write summary to \'{summary_file}\'')
+    if summary.get('status') == "completed":
+        sys.exit(EXIT_COMPLETED)
+    if summary.get('status') == "completed_with_errors":
+        sys.exit(EXIT_COMPLETED_WITH_ERRORS)
+    sys.exit(EXIT_FAILED)
+
+
+def connect(config_file: str, interactive: bool) -> Auth:
+    """
+    Loads the config, authenticates with the Plextrac instance, and opens the tag index for the instance
+
+    :param config_file: path to the config file with the instance URL and credentials
+    :type config_file: str
+    :param interactive: whether the user can be prompted for missing credentials and to retry authentication
+    :type interactive: bool
+    :raises AuthenticationError: could not authenticate without prompting the user, if not interactive
+    :return: authenticated handler, used for the headers of every request
+    :rtype: Auth
+    """
+    with open(config_file, 'r') as f:
         args = yaml.safe_load(f)
 
-    auth = Auth(args)
+    auth = Auth(args, interactive)
     auth.handle_authentication()
 
-    VALID_TAG_ACTIONS = ["refractor", "remove", "add"]
+    # the index is kept per instance, and opened once the instance is known
+    if settings.tag_index or settings.use_tag_index:
+        tag_index.open(auth.base_url)
+    return auth
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Bulk refractor, remove, or add tags across objects in a Plextrac instance")
+    parser.add_argument("--concurrency", type=int, default=None, help=f'number of objects to update at the same time, defaults to {settings.concurrency}')
+    parser.add_argument("--config", default="config.yaml", help=f'path to the config file with the instance URL and credentials, defaults to config.yaml')
+    # batch runs make the changes from a rules file or job file without prompting for tags
+    parser.add_argument("--job", default=None, help=f'YAML or JSON job file describing a batch run. runs without prompts for tags')
+    parser.add_argument("--rules", default=None, help=f'CSV, JSON, or YAML rules file with the tag changes to make. runs without prompts for tags')
+    parser.add_argument("--locations", default=None, help=f'comma separated tag locations to update in a batch run, or all. defaults to all')
+    parser.add_argument("-y", "--yes", action="store_true", help=f'make changes in a batch run without confirmation prompts')
+    parser.add_argument("--summary", default=None, help=f'path to write the JSON summary of a batch run to')
+    parser.add_argument("--use-index", action="store_true", help=f'only load objects the local tag index shows have tags to change in a job or batch run')
+    cli_args = parser.parse_args()
+
+    batch = cli_args.job is not None or cli_args.rules is not None
+    # stdout of a batch run is only the JSON summary, so it can be parsed
+    if not batch:
+        for i in settings.script_info:
+            print(i)
+
+    job = {}
+    if batch:
+        started = time.monotonic()
+        summary = {"status": "failed"}
+        try:
+            if cli_args.job is not None:
+                job = load_job_file(cli_args.job)
+            tl, transform, summary['rules'] = prepare_batch_job(cli_args, job)
+        except Exception as e:
+            log.error(e)
+            summary['error'] = str(e)
+            finish_batch_job(summary, cli_args.summary or job.get('summary'))
+
+    settings.concurrency = cli_args.concurrency or job.get('concurrency', settings.concurrency)
+    settings.use_tag_index = cli_args.use_index or job.get('use_index', settings.use_tag_index)
+    # findings are updated while the next reports are processed, so up to 2 pools of workers send requests at once
+    settings.pool_maxsize = max(settings.pool_maxsize, settings.concurrency*2)
+
+    if batch:
+        log.info(f'Running batch job. Updating tags on {tl.get_selected()} with {summary["rules"]["num_rules"]} rule(s) from \'{summary["rules"]["source"]}\'')
+        confirm = (lambda msg: True) if cli_args.yes or job.get('assume_yes', False) else input.continue_prompt
+        try:
+            # authentication can't prompt for missing credentials or to retry, and fails the run instead
+            auth = connect(cli_args.config, False)
+            summary.update(run_tag_job(tl, transform, confirm))
+        except Exception as e:
+            log.exception(f'Batch job failed')
+            summary['status'] = "failed"
+            summary['error'] = str(e)
+        summary['duration_seconds'] = round(time.monotonic() - started, 1)
+        finish_batch_job(summary, cli_args.summary or job.get('summary'))
+
+    auth = connect(cli_args.config, True)
+
+    VALID_TAG_ACTIONS = ["refractor", "remove", "add", "job"]
     tag_action = input.user_options(f'Select an action for bulk tag updates', "Invalid option", VALID_TAG_ACTIONS)
     if tag_action == "refractor":
         log.info(f'Selected refractor mode. This will allow you to replace tags with other tags.')
@@ -981,3 +1682,6 @@ if __name__ == '__main__':
     elif tag_action == "add":
         log.info(f'Selected addition mode. This will allow you to add a tags to objects with existing tags.')
         handle_add_tags()
+    elif tag_action == "job":
+        log.info(f'Selected job mode. This will allow you to combine replacing, removing, and adding tags, and make every change with a single pass over your objects.')
+        handle_tag_job()
@@ -13,6 +13,149 @@ verify_ssl = True
 # number of times to rety a request before throwing an error. will only throw the last error encountered if
 # number of retries is exceeded. set to 0 to disable retrying requests
 retries = 0
+# seconds to wait before the first retry. the wait doubles with each retry, up to `retry_max_delay`
+retry_base_delay = 1
+retry_max_delay = 30
+# randomize the wait before each retry, so requests that failed at the same time don't all retry at the same time
+retry_jitter = True
+# failed requests are only retried if the response has one of these status codes. other errors, like a 400 for an
+# invalid payload, won't succeed by sending the same request again
+retryable_status_codes = [408, 425, 429, 500, 502, 503, 504]
+# POST requests that only read data and can safely be sent more than once. other POST requests, like creating an
+# object, are only retried if they never reached the instance or were rate limited
+idempotent_endpoints = ["List Clients", "Get Tenant Assets", "Get Report List", "Get Findings by Report"]
+# overrides of the retry settings above for specific endpoints, by endpoint name. accepts the keys `max_retries`,
+# `base_delay`, `max_delay`, `jitter`, `retryable_status_codes`, and `idempotent`
+# i.e. {"Get Finding": {"max_retries": 5}}
+retry_policies = {}
+
+# number of objects to update at the same time. each object is fetched, has its tags updated, and is sent back to
+# Plextrac independently of the others. can be overridden with the --concurrency argument. set to 1 to update one object at a time
+concurrency = 1
+# number of pages to request at the same time when loading clients, assets, reports, and findings
+page_concurrency = 4
+# when True, clients, assets, reports, and findings are updated page by page as they are loaded, and writeups are
+# updated as the list of writeups is downloaded, instead of loading all objects before starting updates. keeps memory
+# usage low and updates start right away on large instances
+stream_objects = True
+# when True, objects are updated with bulk endpoints where possible, instead of a request per object.
+# findings are sent to the bulk update findings endpoint of their report. reports and writeups that only need tags
+# added are grouped by the tags being added. reports and writeups that need tags removed or replaced are always
+# updated individually. the first bulk request to each endpoint is checked by re-reading one of the objects sent, and
+# if the tags weren't updated, objects are updated individually instead
+bulk_tag_updates = True
+# max number of objects updated in a single bulk request
+bulk_chunk_size = 100
+# when True, assets and findings are updated by sending only their updated tags, instead of fetching the full object
+# and sending it back. the first update of each type checks that the endpoint supports this, by sending only the tags
+# to a live object and checking nothing else on it changed. if something did, the full object is sent back to restore
+# it and full objects are sent for the rest of the updates. off by default since the check modifies a real object
+partial_updates = False
+
+# RATE LIMITING
+# requests are limited per family of endpoints. the rate of each family starts at `rate` requests per second and is
+# adjusted between `min_rate` and `max_rate` based on the responses from the Plextrac instance. set to False to disable
+rate_limiting = True
+rate_limits = {
+    "default": {"rate": 10, "min_rate": 1, "max_rate": 100},
+    "findings": {"rate": 10, "min_rate": 1, "max_rate": 100},
+    "assets": {"rate": 10, "min_rate": 1, "max_rate": 100},
+    "reports": {"rate": 10, "min_rate": 1, "max_rate": 100},
+    "writeups": {"rate": 10, "min_rate": 1, "max_rate": 100}
+}
+# names of the endpoints in each family. endpoints not listed use the default family
+rate_limit_families = {
+    "findings": ["Get Findings by Report", "Get Finding", "Update Finding", "Bulk Update Findings"],
+    "assets": ["Get Tenant Assets", "Get Asset", "Update Asset"],
+    "reports": ["Get Report List", "Update Report", "Bulk Add Tags to Report"],
+    "writeups": ["List Writeups", "Get Writeups", "Update Writeups", "Bulk Add Tags to Writeups"]
+}
+# responses slower than this many seconds are treated as the instance being overloaded, and lower the rate
+rate_limit_latency_threshold = 2
+# each second of good responses raises the rate by about this many requests per second
+rate_limit_additive_increase = 1
+# the rate is multiplied by this whenever the instance is overloaded
+rate_limit_decrease_factor = 0.5
+# number of times to retry a request that was rate limited (429 or 503), after waiting the time in the Retry-After header.
+# these retries are separate from `retries`
+rate_limit_max_retries = 5
+# seconds to wait after being rate limited if the response doesn't have a Retry-After header
+rate_limit_default_pause = 5
+
+# CIRCUIT BREAKER
+# stops sending requests to an endpoint that keeps failing, giving the instance time to recover. objects that would be
+# updated with the endpoint are deferred, and retried once every other object has been updated
+circuit_breaker = True
+# number of failed requests in a row, connection errors or 5xx responses, before requests to the endpoint are stopped
+circuit_breaker_failure_threshold = 5
+# seconds to wait before letting a single request through to check if the endpoint has recovered
+circuit_breaker_recovery_timeout = 30
+# number of times objects can be deferred. after that they are updated a final time, even if the circuit is still open
+circuit_breaker_max_deferrals = 3
+
+# CONNECTION POOLING
+# all requests are sent through a shared session that keeps connections to the Plextrac instance open between requests
+# number of hosts to keep a connection pool for
+pool_connections = 10
+# max number of connections kept open per host. should be at least the number of requests sent at the same time
+pool_maxsize = 10
+# if all connections to a host are in use, wait for one to free up instead of opening an extra connection that is discarded after use
+pool_block = False
+# set to False to close the connection after every request
+keep_alive = True
+
+# JSON
+# library used to deserialize responses and serialize request payloads. "orjson" is much faster on large responses, and
+# is installed with the other requirements by `pipenv install`. "auto" uses orjson if it's installed, otherwise the
+# standard library "json" module, i.e. if requirements were installed without the Pipfile. see benchmarks/bench_json_backend.py
+json_backend = "auto"
+# bytes read at a time from responses that are parsed as they are downloaded
+stream_chunk_size = 65536
+
+# TIMEOUTS
+# seconds to wait for a connection to the instance, and seconds to wait for the instance to send data once connected,
+# before a request fails. failed requests are retried based on the retry settings
+connect_timeout = 10
+read_timeout = 120
+# overrides of the timeouts above for specific endpoints, by endpoint name, as a tuple of (connect timeout, read timeout)
+# i.e. {"Get Finding": (5, 30)}
+timeouts = {}
+# send a GET request a second time if it takes longer than most requests to the same endpoint, and use whichever
+# response comes back first. only used for endpoints listed in `hedged_endpoints`
+hedged_requests = True
+hedged_endpoints = ["Get Finding", "Get Asset"]
+# the second request is sent once the first takes longer than this percentile of recent requests to the endpoint
+hedge_percentile = 95
+# number of recent requests to the endpoint used to calculate the percentile, and the number of requests needed
+# before any requests are hedged
+hedge_latency_window = 200
+hedge_min_samples = 20
+
+# TAGS
+# max number of distinct lists of tags to keep the transformed tags of. objects often share the same tags, so each
+# distinct list is only transformed once
+tag_transform_cache_size = 4096
+# replacements are followed to the final tag, i.e. replacing `a` with `b` and `b` with `c` replaces both with `c`.
+# when replacements form a cycle, i.e. replacing `a` with `b` and `b` with `a`, "swap" swaps the tags in the cycle and
+# "reject" stops the script before any objects are loaded. cycles through tags matching a pattern are always swapped
+tag_rename_cycles = "swap"
+
+# TAG INDEX
+# keep a local index of the tags on every object loaded or updated. the index is only used to find objects when
+# `use_tag_index` is True, or the --use-index flag is passed. the index stores the names and tags of clients, assets,
+# reports, findings, and writeups in a local file, so it's off by default
+tag_index = False
+# path to the SQLite file of the index, relative to the directory the script is run from
+tag_index_path = "tag_index.sqlite"
+# when running a tag job or batch run, only load the objects the index shows have tags to change, instead of every object
+# in the instance. the current tags on each object found are loaded before it's updated, but objects tagged since the
+# index was last built aren't found, so only use when all tagging goes through this script, or the index is rebuilt
+# often. tags aren't removed from the tenant when objects are found with the index. also opens the index when
+# `tag_index` is False
+use_tag_index = False
+# max hours since all objects of a type were loaded for the index to be used to find objects of that type. if the index
+# is older, or any objects of the type failed to load in the last full run, every object is loaded instead
+tag_index_max_age = 24
 
 # description of script that will be print line by line when the script is run
 script_info = ["====================================================================",
@@ -0,0 +1,48 @@
+import json
+import pytest
+
+from utils.json_utils import iter_json_array
+
+
+DOCUMENTS = [
+    '[]',
+    '[1.5]',
+    '[1, 22, 333, 4444]',
+    '[-2e10, 3.25E-4, 0.5, -0, 1e+3, 12345678901234567890]',
+    '[true, false, null, 7]',
+    '["tag", "café ☃", "escaped \\" quote", "\\u00e9"]',
+    ' [ {"id": 1, "tags": ["a", "b"], "score": 9.75}, {"id": 2, "nested": {"list": [1, 2.5e3, {"x": null}]}} ] ',
+]
+
+
+def split(data: bytes, size: int) -> list:
+    return [data[i:i+size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("document", DOCUMENTS)
+def test_every_chunk_size(document):
+    data = document.encode('utf-8')
+    expected = json.loads(document)
+    for size in range(1, len(data) + 1):
+        assert list(iter_json_array(split(data, size))) == expected, f'chunk size {size}'
+
+
+@pytest.mark.parametrize("chunks, expected", [
+    ([b'[1', b'.', b'5]'], [1.5]),
+    ([b'[1e', b'-', b'2, 3', b'0]'], [0.01, 30]),
+    ([b'[12', b'34', b']'], [1234]),
+    ([b'[-', b'7]'], [-7]),
+])
+def test_number_split_at_chunk_boundary(chunks, expected):
+    assert list(iter_json_array(chunks)) == expected
+
+
+@pytest.mark.parametrize("chunks", [
+    [b'{"data": []}'],
+    [b'[1, 2'],
+    [b'[1 2]'],
+    [b'[1,]'],
+])
+def test_invalid_document(chunks):
+    with pytest.raises(ValueError):
+        list(iter_json_array(chunks))
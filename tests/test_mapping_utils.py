@@ -0,0 +1,38 @@
+import pytest
+
+from utils.mapping_utils import load_tag_rules
+
+
+def test_csv_rules(tmp_path):
+    path = tmp_path / "rules.csv"
+    path.write_text("action,tag,value\nrefractor,old,new\nremove,unused,\nadd,critical,needs_review\n")
+    loaded = load_tag_rules(str(path), False)
+    assert loaded.num_rules == 3
+    assert len(loaded.rule_sets) == 3
+
+def test_yaml_rules(tmp_path):
+    path = tmp_path / "rules.yaml"
+    path.write_text("- refractor:\n    old: new\n- remove:\n    - unused\n")
+    loaded = load_tag_rules(str(path), False)
+    assert loaded.num_rules == 2
+    assert len(loaded.rule_sets) == 2
+
+@pytest.mark.parametrize("name, content", [
+    ("rules.yaml", "- refractor: [old: new\n"),
+    ("rules.json", '[{"refractor": {"old": "new"}'),
+    ("rules.csv", ""),
+    ("rules.csv", "tag,value\nold,new\n"),
+    ("rules.yaml", "refractor:\n  old: new\n"),
+    ("rules.txt", "refractor,old,new\n"),
+])
+def test_invalid_file_raises_without_prompting(tmp_path, monkeypatch, name, content):
+    monkeypatch.setattr("builtins.input", lambda *args: pytest.fail("prompted for input"))
+    path = tmp_path / name
+    path.write_text(content)
+    with pytest.raises(ValueError):
+        load_tag_rules(str(path), False)
+
+def test_missing_file_raises_without_prompting(tmp_path, monkeypatch):
+    monkeypatch.setattr("builtins.input", lambda *args: pytest.fail("prompted for input"))
+    with pytest.raises(ValueError, match="does not exist"):
+        load_tag_rules(str(tmp_path / "missing.yaml"), False)
@@ -0,0 +1,144 @@
+import pytest
+
+import settings
+from utils.tag_utils import TagRuleSet, TagTransform, tag_dictionary
+
+
+def apply(rule_sets, tags):
+    return TagTransform(rule_sets).apply(tags)
+
+
+# refactor
+
+def test_refactor_keeps_position():
+    assert apply([TagRuleSet.refactor(["b"], ["x"])], ["a", "b", "c"]) == (["a", "x", "c"], True)
+
+def test_refactor_first_replacement_is_used():
+    assert apply([TagRuleSet.refactor(["a", "a"], ["x", "y"])], ["a"]) == (["x"], True)
+
+def test_chain_goes_to_final_tag():
+    rule_set = TagRuleSet.refactor(["a", "b", "c"], ["b", "c", "d"])
+    assert apply([rule_set], ["a"]) == (["d"], True)
+    assert apply([rule_set], ["b", "z"]) == (["d", "z"], True)
+    assert apply([rule_set], ["a", "b", "c"]) == (["d"], True)
+
+def test_chain_into_removal():
+    rule_set = TagRuleSet(replacements={"a": ["b"], "b": []})
+    assert apply([rule_set], ["a", "z"]) == (["z"], True)
+
+def test_swap(monkeypatch):
+    monkeypatch.setattr(settings, "tag_rename_cycles", "swap")
+    assert apply([TagRuleSet.refactor(["a", "b"], ["b", "a"])], ["a", "b", "c"]) == (["b", "a", "c"], True)
+
+def test_three_tag_rotation(monkeypatch):
+    monkeypatch.setattr(settings, "tag_rename_cycles", "swap")
+    rule_set = TagRuleSet.refactor(["a", "b", "c"], ["b", "c", "a"])
+    assert apply([rule_set], ["a", "b", "c"]) == (["b", "c", "a"], True)
+
+def test_chain_into_cycle(monkeypatch):
+    monkeypatch.setattr(settings, "tag_rename_cycles", "swap")
+    rule_set = TagRuleSet.refactor(["x", "a", "b"], ["a", "b", "a"])
+    assert apply([rule_set], ["x"]) == (["a"], True)
+
+def test_reject_cycle(monkeypatch):
+    monkeypatch.setattr(settings, "tag_rename_cycles", "reject")
+    with pytest.raises(ValueError, match="cycle"):
+        TagRuleSet.refactor(["a", "b"], ["b", "a"])
+
+def test_replacement_already_on_object_is_not_duplicated():
+    assert apply([TagRuleSet.refactor(["a"], ["b"])], ["a", "b"]) == (["b"], True)
+
+
+# remove
+
+def test_remove_consecutive_tags():
+    # removing a tag used to skip the tag after it
+    assert apply([TagRuleSet.remove(["a", "b"])], ["a", "b", "c"]) == (["c"], True)
+
+def test_remove_every_occurrence():
+    assert apply([TagRuleSet.remove(["a"])], ["a", "a", "b", "a"]) == (["b"], True)
+
+def test_remove_all_tags():
+    assert apply([TagRuleSet.remove(["a", "b"])], ["a", "b"]) == ([], True)
+
+def test_remove_missing_tag_is_unchanged():
+    assert apply([TagRuleSet.remove(["x"])], ["a", "b"]) == (["a", "b"], False)
+
+
+# add
+
+def test_add_goes_at_end():
+    assert apply([TagRuleSet.add(["a"], ["x"])], ["a", "b"]) == (["a", "b", "x"], True)
+
+def test_add_several_tags_for_one_tag():
+    assert apply([TagRuleSet.add(["a", "a"], ["x", "y"])], ["a"]) == (["a", "x", "y"], True)
+
+def test_add_tag_to_itself_finishes():
+    # adding a tag where it's found used to loop over the tags being appended
+    assert apply([TagRuleSet.add(["a"], ["a"])], ["a"]) == (["a"], False)
+
+def test_add_tag_already_on_object():
+    assert apply([TagRuleSet.add(["a"], ["b"])], ["a", "b"]) == (["a", "b"], False)
+
+def test_add_without_found_tag_is_unchanged():
+    assert apply([TagRuleSet.add(["a"], ["x"])], ["b"]) == (["b"], False)
+
+
+# jobs with more than one change
+
+def test_changes_apply_in_order():
+    rule_sets = [TagRuleSet.refactor(["a"], ["b"]), TagRuleSet.add(["b"], ["c"]), TagRuleSet.remove(["z"])]
+    assert apply(rule_sets, ["a", "z"]) == (["b", "c"], True)
+
+def test_later_change_acts_on_added_tags():
+    rule_sets = [TagRuleSet.add(["a"], ["b"]), TagRuleSet.refactor(["b"], ["c"])]
+    assert apply(rule_sets, ["a"]) == (["a", "c"], True)
+
+def test_later_change_removes_replacement():
+    rule_sets = [TagRuleSet.refactor(["a"], ["b"]), TagRuleSet.remove(["b"])]
+    assert apply(rule_sets, ["a", "c"]) == (["c"], True)
+
+def test_removed_tags_exclude_new_tags():
+    transform = TagTransform([TagRuleSet.refactor(["a", "b"], ["b", "c"])])
+    assert transform.get_new_tags() == ["c"]
+    assert transform.get_removed_tags() == ["a", "b"]
+
+
+# patterns
+
+def test_prefix_pattern_keeps_suffix():
+    assert apply([TagRuleSet.refactor(["client:*"], ["customer:*"])], ["client:acme", "x"]) == (["customer:acme", "x"], True)
+
+def test_glob_pattern_matches_whole_tag():
+    rule_set = TagRuleSet.remove(["scan_20??"])
+    assert apply([rule_set], ["scan_2023", "scan_2023_q1"]) == (["scan_2023_q1"], True)
+
+def test_regex_pattern_groups():
+    assert apply([TagRuleSet.refactor(["re:^scan_(\\d+)$"], ["audit_\\1"])], ["scan_42"]) == (["audit_42"], True)
+
+
+# ids and cache
+
+def test_matches_by_tag_ids():
+    transform = TagTransform([TagRuleSet.remove(["a"])])
+    assert transform.matches(tag_dictionary.encode(["b", "a"]))
+    assert not transform.matches(tag_dictionary.encode(["b"]))
+
+def test_cached_result_is_not_shared():
+    transform = TagTransform([TagRuleSet.add(["a"], ["x"])])
+    first, _ = transform.apply(["a"])
+    first.append("mutated")
+    assert transform.apply(["a"]) == (["a", "x"], True)
+
+def test_regex_global_flags_are_scoped():
+    rule_set = TagRuleSet.remove(["re:(?i)^foo$", "re:^bar$"])
+    assert apply([rule_set], ["FOO", "BAR", "bar"]) == (["BAR"], True)
+
+def test_regex_verbose_flag_with_comment():
+    rule_set = TagRuleSet.remove(["re:(?x) ^foo$ # comment", "re:^bar$"])
+    assert apply([rule_set], ["foo", "bar", "baz"]) == (["baz"], True)
+
+@pytest.mark.parametrize("pattern", ["re:foo(?i)", "re:(", "re:(a)\\1"])
+def test_invalid_regex(pattern):
+    with pytest.raises(ValueError):
+        TagRuleSet.remove([pattern, "re:bar"])
@@ -1,5 +1,17 @@
 from utils import auth_handler
+from utils import bulk_utils
+from utils import circuit_breaker_handler
+from utils import concurrency_utils
 from utils import general_utils
+from utils import hedge_handler
 from utils import input_utils
+from utils import json_utils
 from utils import log_handler
-from utils import request_handler
\ No newline at end of file
+from utils import mapping_utils
+from utils import pagination_utils
+from utils import rate_limit_handler
+from utils import record_utils
+from utils import request_handler
+from utils import retry_handler
+from utils import tag_utils
+from utils import tag_index_utils
\ No newline at end of file
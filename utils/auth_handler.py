@@ -1,23 +1,41 @@
 from getpass import getpass
 import json
+import threading
 import time
+from typing import Any, Callable
 
 import utils.log_handler as logger
 log = logger.log
 import api
 import utils.input_utils as input
 
+
+class AuthenticationError(Exception):
+    """
+    Authentication failed and the user can't be prompted to retry or enter missing values
+    """
+
+
 class Auth():
     
-    def __init__(self, args):
+    def __init__(self, args, interactive: bool = True):
+        """
+        :param args: loaded config, with the instance_url, cf_token, username, and password to use
+        :type args: dict
+        :param interactive: whether the user can be prompted for missing values and to retry when authentication fails.
+        if False, an AuthenticationError is raised instead of prompting, i.e. in batch runs, defaults to True
+        :type interactive: bool, optional
+        """
         self.base_url = args.get('instance_url')
         self.cf_token = args.get('cf_token')
         self.username = args.get('username')
         self.password = args.get('password')
         self.tenant_id = None
         self.auth_headers = {}
+        self.interactive = interactive
 
         self.time_since_last_auth = None
+        self.auth_lock = threading.Lock() # objects are updated from multiple threads, only one should re-authenticate
 
 
     def add_auth_header(self, authorization_token):
@@ -28,6 +46,19 @@ class Auth():
         self.auth_headers["cf-access-token"] = cf_token
 
 
+    def prompt(self, msg: str, prompt: Callable[[], Any]) -> Any:
+        """
+        Prompts the user, or raises an AuthenticationError with the message if the user can't be prompted
+        """
+        if not self.interactive:
+            raise AuthenticationError(msg)
+        return prompt()
+
+
+    def retry(self, msg: str) -> bool:
+        return self.prompt(msg, lambda: input.retry(msg))
+
+
     def get_auth_headers(self):
         """
         checks is authorization is current and returns headers, otherwise tries to re-authenticate and return new auth headers
@@ -35,13 +66,14 @@ class Auth():
         to prevent the auth from timing out after it was checked, but before it can be received by the API,
         checks whether we are in the last minute of the 15 min auth window
         """
-        if self.time_since_last_auth == None:
-            self.handle_authentication()
+        with self.auth_lock:
+            if self.time_since_last_auth == None:
+                self.handle_authentication()
 
-        if time.time() - self.time_since_last_auth > 840:
-            self.handle_authentication()
-        
-        return self.auth_headers
+            if time.time() - self.time_since_last_auth > 840:
+                self.handle_authentication()
+            
+            return self.auth_headers
 
 
     def handle_instance_url(self):
@@ -49,7 +81,7 @@ class Auth():
         prompts user for their plextrac url, checks that the API is up and running, then sets the url
         """
         if self.base_url == None:
-            self.base_url = input.prompt_user("Please enter the full URL of your PlexTrac instance (with protocol)")
+            self.base_url = self.prompt("No instance_url in config", lambda: input.prompt_user("Please enter the full URL of your PlexTrac instance (with protocol)"))
         else:
             log.info(f'Using instance_url from config...')
 
@@ -58,7 +90,7 @@ class Auth():
             response = api._v1.authentication.root_request(self.base_url, {}) # non authenticated endpoint - does not require any headers - used to see if we can connect to the api
             log.debug(response)
             if not response.has_json_response: # if the base_url is not valid, the response will not contain any JSON
-                if input.retry("Could not validate URL. Either the API is offline or it was entered incorrectly\nExample: https://company.plextrac.com"):
+                if self.retry("Could not validate URL. Either the API is offline or it was entered incorrectly\nExample: https://company.plextrac.com"):
                     self.cf_token = None
                     self.base_url = None
                     return self.handle_instance_url()
@@ -69,19 +101,21 @@ class Auth():
                     
             except Exception as e: # potential plextrac internal instance running behind Cloudflare
                 if self.cf_token == None:
-                    option = input.user_options("That URL points to a running verson of Plextrac. However, the API did not respond.\nThere might be an additional layer of security. Try adding Cloudflare auth token?", "Do you want to try adding a Cloudflare token?", ['y', 'n'])    
+                    option = self.prompt("Instance did not respond to API requests. A Cloudflare token may be needed, add cf_token to config", lambda: input.user_options("That URL points to a running verson of Plextrac. However, the API did not respond.\nThere might be an additional layer of security. Try adding Cloudflare auth token?", "Do you want to try adding a Cloudflare token?", ['y', 'n']))
                     if option == 'y':
                         return self.handle_cf_instance_url()
                 else:
                     return self.handle_cf_instance_url()
             
-                if input.retry("Could not validate instance URL."):
+                if self.retry("Could not validate instance URL."):
                     self.cf_token = None
                     return self.handle_instance_url()
 
+        except AuthenticationError:
+            raise
         except Exception as e:
             log.exception(e)
-            if input.retry("Could not validate URL. Either the API is offline or it was entered incorrectly\nExample: https://company.plextrac.com"):
+            if self.retry("Could not validate URL. Either the API is offline or it was entered incorrectly\nExample: https://company.plextrac.com"):
                 self.base_url = None
                 return self.handle_instance_url()
 
@@ -92,14 +126,14 @@ class Auth():
         plextrac test instances are hosted behind a Cloudflare wall that requires another layer of authorization
         """
         if self.cf_token == None:
-            self.cf_token = input.prompt_user("Please enter your active 'CF_Authorization' token")
+            self.cf_token = self.prompt("No cf_token in config", lambda: input.prompt_user("Please enter your active 'CF_Authorization' token"))
         else:
             log.info(f'Using cf_token from config...')
 
         response = api._v1.authentication.root_request(self.base_url, headers={"cf-access-token": self.cf_token})
             
         if response.json.get('text') != "Authenticate at /authenticate":
-            if input.retry("Could not validate instance URL."):
+            if self.retry("Could not validate instance URL."):
                 self.cf_token = None
                 return self.handle_instance_url()
 
@@ -113,11 +147,11 @@ class Auth():
         self.handle_instance_url()
 
         if self.username == None:
-            self.username = input.prompt_user("Please enter your PlexTrac username")
+            self.username = self.prompt("No username in config", lambda: input.prompt_user("Please enter your PlexTrac username"))
         else:
             log.info(f'Using username from config...')
         if self.password == None:
-            self.password = getpass(prompt="Password: ")
+            self.password = self.prompt("No password in config", lambda: getpass(prompt="Password: "))
         else:
             log.info(f'Using password from config...')
         
@@ -134,7 +168,7 @@ class Auth():
         # - other
         # the api response is purposely non-descript to prevent gaining information about the authentication process
         if response.json.get('status') != "success":
-            if input.retry("Could not authenticate with entered credentials."):
+            if self.retry("Could not authenticate with entered credentials."):
                 self.username = None
                 self.password = None
                 self.tenant_id = None
@@ -147,12 +181,12 @@ class Auth():
 
             mfa_auth_data = {
                 "code": response.json.get('code'),
-                "token": input.prompt_user("Please enter your 6 digit MFA code")
+                "token": self.prompt("MFA is enabled for user, and an MFA code can't be entered", lambda: input.prompt_user("Please enter your 6 digit MFA code"))
             }
             
             response = api._v1.authentication.multi_factor_authentication(self.base_url, self.auth_headers, mfa_auth_data)
             if response.json.get('status') != "success":
-                if input.retry("Invalid MFA Code."):
+                if self.retry("Invalid MFA Code."):
                     return self.handle_authentication()
 
         self.add_auth_header(response.json.get('token'))
@@ -0,0 +1,127 @@
+import threading
+from typing import Callable, Dict, Generic, Hashable, List, Sequence, Tuple, TypeVar
+
+import utils.log_handler as logger
+log = logger.log
+
+T = TypeVar("T")
+
+
+def get_added_tags(old_tags: Sequence[str], new_tags: Sequence[str]) -> Tuple[str] | None:
+    """
+    Checks whether a tag change only adds tags to the end of the existing tags. Bulk add tag endpoints can only
+    express this type of change. Removing, replacing, or reordering tags needs the full list of tags sent to the object.
+
+    :param old_tags: tags on the object before the change
+    :type old_tags: Sequence[str]
+    :param new_tags: tags on the object after the change
+    :type new_tags: Sequence[str]
+    :return: tuple of the tags added, or None if the change does anything other than add tags
+    :rtype: Tuple[str] | None
+    """
+    if len(new_tags) <= len(old_tags) or tuple(new_tags[:len(old_tags)]) != tuple(old_tags):
+        return None
+    return tuple(new_tags[len(old_tags):])
+
+
+class BulkEndpointStatus():
+    """
+    Thread safe record of whether updates sent to a bulk endpoint were confirmed to change the objects. A bulk endpoint
+    can respond successfully without applying the update, i.e. if the payload isn't in the format it expects
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.supported: bool | None = None # None until the first update is checked
+
+    def set_supported(self, supported: bool) -> None:
+        with self.lock:
+            self.supported = supported
+
+_statuses: Dict[str, BulkEndpointStatus] = {}
+_statuses_lock = threading.Lock()
+
+def get_endpoint_status(name: str) -> BulkEndpointStatus:
+    status = _statuses.get(name)
+    if status is None:
+        with _statuses_lock:
+            status = _statuses.setdefault(name, BulkEndpointStatus())
+    return status
+
+
+class BulkTagWriter(Generic[T]):
+    """
+    Buffers objects needing tag updates and sends them to a bulk endpoint in chunks, instead of sending a request per
+    object. Objects are buffered in groups, and only objects in the same group are sent together. i.e. when using a
+    bulk add tags endpoint, objects are grouped by the tags to add.
+
+    If a chunk fails, each object in the chunk is updated individually with the fallback function, so failures are
+    attributed to the objects that actually couldn't be updated.
+
+    The first chunk sent to an endpoint is checked by re-reading one of its objects. If the update wasn't applied, the
+    chunk and every later chunk for the endpoint are updated individually with the fallback function instead.
+    """
+    def __init__(self, send_chunk: Callable[[List[T], Hashable], None], fallback: Callable[[T], bool], chunk_size: int, name: str = "", verify: Callable[[T], bool] = None):
+        """
+        :param send_chunk: function that sends the bulk request for all objects in the chunk, given the chunk and its group. should raise an exception if the request fails
+        :type send_chunk: Callable[[List[T], Hashable], None]
+        :param fallback: function that updates a single object with a regular update request, returns whether the update was successful
+        :type fallback: Callable[[T], bool]
+        :param chunk_size: max number of objects sent in a single bulk request
+        :type chunk_size: int
+        :param name: name of the bulk endpoint, writers for the same endpoint share whether updates were confirmed, defaults to ""
+        :type name: str, optional
+        :param verify: function that re-reads an object after it was sent in a bulk request, returns whether it was updated. if not given, bulk updates aren't checked, defaults to None
+        :type verify: Callable[[T], bool], optional
+        """
+        self.send_chunk = send_chunk
+        self.fallback = fallback
+        self.chunk_size = chunk_size
+        self.name = name
+        self.verify = verify
+        self.buffers: Dict[Hashable, List[T]] = {}
+
+    def add(self, obj: T, group: Hashable = None) -> List[Tuple[T, bool]]:
+        """
+        Adds an object to the buffer for its group. If the buffer is full it is sent.
+
+        :return: list of each object sent and whether it was updated. empty if nothing was sent
+        :rtype: List[Tuple[T, bool]]
+        """
+        buffer = self.buffers.setdefault(group, [])
+        buffer.append(obj)
+        if len(buffer) < self.chunk_size:
+            return []
+        del self.buffers[group]
+        return self._write(buffer, group)
+
+    def flush(self) -> List[Tuple[T, bool]]:
+        """
+        Sends all buffered objects
+
+        :return: list of each object sent and whether it was updated
+        :rtype: List[Tuple[T, bool]]
+        """
+        results = []
+        buffers, self.buffers = self.buffers, {}
+        for group, buffer in buffers.items():
+            results += self._write(buffer, group)
+        return results
+
+    def _write(self, objs: List[T], group: Hashable) -> List[Tuple[T, bool]]:
+        status = get_endpoint_status(self.name) if self.verify is not None else None
+        if status is not None and status.supported == False:
+            return [(obj, self.fallback(obj)) for obj in objs]
+        try:
+            self.send_chunk(objs, group)
+        except Exception as e:
+            log.exception(f'Could not bulk update tags on {len(objs)} object(s). Updating individually...')
+            return [(obj, self.fallback(obj)) for obj in objs]
+
+        if status is not None and status.supported is None:
+            if not self.verify(objs[0]):
+                status.set_supported(False)
+                log.error(f'{self.name} responded successfully, but the tags were not updated. Updating these and all following objects individually...')
+                return [(obj, self.fallback(obj)) for obj in objs]
+            status.set_supported(True)
+        log.success(f'Updated tags on {len(objs)} object(s) with a bulk request')
+        return [(obj, True) for obj in objs]
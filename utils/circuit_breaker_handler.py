@@ -0,0 +1,252 @@
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple, TypeVar
+
+import settings
+import utils.log_handler as logger
+from utils.concurrency_utils import run_concurrently
+from utils.rate_limit_handler import get_family
+log = logger.log
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class CircuitBreaker():
+    """
+    Thread safe circuit breaker for a single endpoint.
+
+    The circuit starts closed and requests are sent as normal. After `failure_threshold` failures in a row the circuit
+    opens, and requests fail right away without being sent. Once `recovery_timeout` seconds have passed the circuit is
+    half-open, and a single request is let through to check whether the endpoint has recovered. If it succeeds the
+    circuit closes, if it fails the circuit opens again.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, name: str, failure_threshold: int, recovery_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.probe_in_flight = False
+        self.lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """
+        Checks whether a request can be sent to the endpoint. When half-open, only one request is allowed until its
+        result is recorded.
+
+        :return: whether the request can be sent
+        :rtype: bool
+        """
+        with self.lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.recovery_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self.probe_in_flight = False
+            if self.state == self.HALF_OPEN:
+                if self.probe_in_flight:
+                    return False
+                self.probe_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self.lock:
+            if self.state != self.CLOSED:
+                log.info(f'{self.name} endpoint recovered. Closing circuit')
+            self.state = self.CLOSED
+            self.failures = 0
+            self.probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self.lock:
+            self.failures += 1
+            self.probe_in_flight = False
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                log.warning(f'{self.name} endpoint is failing. Opening circuit, requests will not be sent for {self.recovery_timeout} sec(s)')
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self.times_opened += 1
+
+    def is_open(self) -> bool:
+        """
+        Whether the circuit is open and still waiting for the recovery timeout to pass
+        """
+        with self.lock:
+            return self.state == self.OPEN and time.monotonic() - self.opened_at < self.recovery_timeout
+
+    def seconds_until_half_open(self) -> float:
+        with self.lock:
+            if self.state != self.OPEN:
+                return 0
+            return max(self.recovery_timeout - (time.monotonic() - self.opened_at), 0)
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """
+    Returns the circuit breaker for an endpoint, creating it on first use
+
+    :param name: name of API endpoint
+    :type name: str
+    :return: circuit breaker for the endpoint
+    :rtype: CircuitBreaker
+    """
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(name)
+            if breaker is None:
+                breaker = CircuitBreaker(name, settings.circuit_breaker_failure_threshold, settings.circuit_breaker_recovery_timeout)
+                _breakers[name] = breaker
+    return breaker
+
+def _get_family_breakers(family: str) -> list:
+    return [breaker for name, breaker in list(_breakers.items()) if get_family(name) == family]
+
+def is_family_open(family: str) -> bool:
+    """
+    Checks whether the circuit for any endpoint in an endpoint family is open. Endpoint families are defined by
+    `rate_limit_families` in settings.py
+    """
+    return any(breaker.is_open() for breaker in _get_family_breakers(family))
+
+def is_family_closed(family: str) -> bool:
+    return all(breaker.state == CircuitBreaker.CLOSED for breaker in _get_family_breakers(family))
+
+def seconds_until_family_half_open(family: str) -> float:
+    return max((breaker.seconds_until_half_open() for breaker in _get_family_breakers(family)), default=0)
+
+def get_circuit_breaker_metrics() -> str:
+    opened = [f'{breaker.name}: opened {breaker.times_opened} time(s)' for breaker in list(_breakers.values()) if breaker.times_opened > 0]
+    if len(opened) < 1:
+        return 'No circuits opened'
+    return ' - '.join(opened)
+
+
+class DeferredQueue():
+    """
+    Objects deferred while the circuit for an endpoint they are updated with was open. Deferred objects are retried
+    once every other object has been processed, so an open circuit doesn't hold up objects updated with other endpoints.
+    Only used from the thread the objects are processed in.
+    """
+    def __init__(self):
+        self.batches: List[Tuple[str, list, Callable[[list], None], int]] = []
+        self.attempt = 0 # number of times the objects currently being retried have been deferred
+
+    def __len__(self) -> int:
+        return sum(len(items) for _, items, _, _ in self.batches)
+
+    def add(self, family: str, items: list, retry: Callable[[list], None]) -> None:
+        """
+        :param family: endpoint family the items are updated with
+        :type family: str
+        :param items: deferred items
+        :type items: list
+        :param retry: function that processes the items again, the same way they were processed the first time
+        :type retry: Callable[[list], None]
+        """
+        self.batches.append((family, items, retry, self.attempt+1))
+
+    def can_defer(self) -> bool:
+        return self.attempt < settings.circuit_breaker_max_deferrals
+
+    def run(self) -> None:
+        """
+        Retries deferred items, starting with the endpoint family that can be probed soonest. Only waits on a circuit
+        when there is nothing else left to process. Items deferred again while being retried are added back to the queue,
+        until they have been deferred `circuit_breaker_max_deferrals` times.
+        """
+        while len(self.batches) > 0:
+            batches, self.batches = self.batches, []
+            batches.sort(key=lambda batch: seconds_until_family_half_open(batch[0]))
+            for family, items, retry, attempt in batches:
+                wait = seconds_until_family_half_open(family)
+                log.warning(f'Retrying {len(items)} object(s) deferred while {family} endpoints were unavailable{f" in {round(wait, 1)} sec(s)" if wait > 0 else ""}... ({attempt}/{settings.circuit_breaker_max_deferrals})')
+                time.sleep(wait)
+                self.attempt = attempt
+                try:
+                    retry(items)
+                finally:
+                    self.attempt = 0
+
+deferred_queue = DeferredQueue()
+
+
+def run_deferring_open_circuits(items: Iterable[T], worker: Callable[[T], R], concurrency: int, family: str, failed: Callable[[R], bool], retry: Callable[[List[T]], None]) -> Iterator[Tuple[T, R]]:
+    """
+    Wraps `run_concurrently`, deferring items while the circuit for an endpoint in the endpoint family the items are
+    updated with is open. Items picked up while a circuit is open aren't run, and items that fail while a circuit isn't
+    closed are added to the `deferred_queue` instead of being yielded. They are retried with `retry` when the queue is
+    run, after every other object has been processed.
+
+    Once items have been deferred `circuit_breaker_max_deferrals` times, they are run a final time and yielded with
+    whatever result they get.
+
+    :param items: items to process
+    :type items: Iterable[T]
+    :param worker: function called with each item. can be called more than once for the same item, so it shouldn't modify the item
+    :type worker: Callable[[T], R]
+    :param concurrency: max number of items processed at the same time
+    :type concurrency: int
+    :param family: endpoint family used when processing the items, a key in `rate_limit_families` in settings.py or "default"
+    :type family: str
+    :param failed: function that checks whether a result returned by `worker` means the item failed
+    :type failed: Callable[[R], bool]
+    :param retry: function that processes deferred items again, i.e. by calling the function that called this with the deferred items
+    :type retry: Callable[[List[T]], None]
+    :yield: tuple of the processed item and the value returned by `worker`
+    :rtype: Iterator[Tuple[T, R]]
+    """
+    if not settings.circuit_breaker or not deferred_queue.can_defer():
+        yield from run_concurrently(items, worker, concurrency)
+        return
+
+    not_run = object()
+    def run(item: T) -> R:
+        if is_family_open(family):
+            return not_run
+        return worker(item)
+
+    deferred = []
+    for item, result in run_concurrently(items, run, concurrency):
+        if result is not_run or (failed(result) and not is_family_closed(family)):
+            deferred.append(item)
+        else:
+            yield item, result
+    if len(deferred) > 0:
+        log.warning(f'Deferred {len(deferred)} object(s) while {family} endpoints were unavailable. They will be retried after the other objects are updated')
+        deferred_queue.add(family, deferred, retry)
+
+
+def defer_failed_items(results: List[Tuple[T, bool]], family: str, retry: Callable[[List[T]], None]) -> List[Tuple[T, bool]]:
+    """
+    Defers items that failed while the circuit for an endpoint in the endpoint family wasn't closed, for items updated
+    outside of `run_deferring_open_circuits`. i.e. objects sent by a `BulkTagWriter`, which are written after the worker
+    that processed them has finished. Deferred items are retried with `retry` when the `deferred_queue` is run.
+
+    :param results: list of each item and whether it was updated
+    :type results: List[Tuple[T, bool]]
+    :param family: endpoint family used when updating the items, a key in `rate_limit_families` in settings.py or "default"
+    :type family: str
+    :param retry: function that processes deferred items again
+    :type retry: Callable[[List[T]], None]
+    :return: results of the items that weren't deferred
+    :rtype: List[Tuple[T, bool]]
+    """
+    if not settings.circuit_breaker or not deferred_queue.can_defer() or is_family_closed(family):
+        return results
+    deferred = [item for item, updated in results if not updated]
+    if len(deferred) < 1:
+        return results
+    log.warning(f'Deferred {len(deferred)} object(s) while {family} endpoints were unavailable. They will be retried after the other objects are updated')
+    deferred_queue.add(family, deferred, retry)
+    return [(item, updated) for item, updated in results if updated]
@@ -0,0 +1,43 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
+from typing import Callable, Iterable, Iterator, Tuple, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def run_concurrently(items: Iterable[T], worker: Callable[[T], R], concurrency: int) -> Iterator[Tuple[T, R]]:
+    """
+    Runs `worker` on each item using a pool of `concurrency` threads and yields each item with its result as soon as it
+    finishes. Results are yielded in the calling thread, so anything done with them (counters, metrics, logging
+    summaries) doesn't need to be thread safe.
+
+    Items are pulled from `items` as workers free up, so at most a couple items per worker are ever waiting in the pool.
+    This allows `items` to be a generator over a very large number of objects.
+
+    If `concurrency` is 1 or less, items are processed one at a time in the calling thread, in order.
+
+    :param items: items to process
+    :type items: Iterable[T]
+    :param worker: function called with each item. should handle its own exceptions, any exception raised is re-raised when the item's result is yielded
+    :type worker: Callable[[T], R]
+    :param concurrency: max number of items processed at the same time
+    :type concurrency: int
+    :yield: tuple of the processed item and the value returned by `worker`, in order of completion
+    :rtype: Iterator[Tuple[T, R]]
+    """
+    if concurrency <= 1:
+        for item in items:
+            yield item, worker(item)
+        return
+
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        in_flight = {executor.submit(worker, item): item for item in islice(items, concurrency*2)}
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = in_flight.pop(future)
+                for next_item in islice(items, 1):
+                    in_flight[executor.submit(worker, next_item)] = next_item
+                yield item, future.result()
@@ -0,0 +1,143 @@
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, Tuple, TypeVar
+
+import settings
+import utils.log_handler as logger
+log = logger.log
+
+R = TypeVar("R")
+
+
+class LatencyTracker():
+    """
+    Thread safe record of the latest request latencies for an endpoint, used to find how long a slow request takes
+    """
+    def __init__(self, window: int):
+        self.latencies = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def record(self, latency: float) -> None:
+        with self.lock:
+            self.latencies.append(latency)
+
+    def percentile(self, percentile: float) -> float | None:
+        """
+        :param percentile: percentile of latencies to return, 0-100
+        :type percentile: float
+        :return: the latency at the percentile, or None if not enough requests have been recorded
+        :rtype: float | None
+        """
+        with self.lock:
+            if len(self.latencies) < settings.hedge_min_samples:
+                return None
+            latencies = sorted(self.latencies)
+        return latencies[min(int(len(latencies) * percentile / 100), len(latencies)-1)]
+
+
+class HedgeStats():
+    """
+    Thread safe counters for the number of hedged requests sent and how many answered before the original request
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def increment_hedges(self) -> None:
+        with self.lock:
+            self.hedges += 1
+
+    def increment_hedge_wins(self) -> None:
+        with self.lock:
+            self.hedge_wins += 1
+
+    def __str__(self):
+        return f'Hedged requests: {self.hedges} - Answered before the original request: {self.hedge_wins}'
+
+hedge_stats = HedgeStats()
+
+
+_trackers: Dict[str, LatencyTracker] = {}
+_trackers_lock = threading.Lock()
+
+def get_tracker(name: str) -> LatencyTracker:
+    tracker = _trackers.get(name)
+    if tracker is None:
+        with _trackers_lock:
+            tracker = _trackers.get(name)
+            if tracker is None:
+                tracker = LatencyTracker(settings.hedge_latency_window)
+                _trackers[name] = tracker
+    return tracker
+
+def get_timeout(name: str) -> Tuple[float, float]:
+    """
+    Returns the connect and read timeouts for an endpoint, from `timeouts` in settings.py or the default timeouts
+
+    :param name: name of API endpoint
+    :type name: str
+    :return: tuple of connect timeout and read timeout in seconds
+    :rtype: Tuple[float, float]
+    """
+    return settings.timeouts.get(name, (settings.connect_timeout, settings.read_timeout))
+
+def can_hedge(name: str, http_method: str) -> bool:
+    return settings.hedged_requests and http_method == "GET" and name in settings.hedged_endpoints
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=settings.pool_maxsize, thread_name_prefix="hedge")
+    return _executor
+
+def send_hedged(name: str, send: Callable[[], R], before_hedge: Callable[[], None] = None) -> R:
+    """
+    Sends a request, and if it takes longer than most requests to the endpoint, sends the same request again and
+    returns whichever response comes back first. Only use with idempotent requests.
+
+    The wait before sending the second request is the latency at `hedge_percentile` of recent requests to the endpoint.
+    Until `hedge_min_samples` requests have been recorded the request is sent once. The slower request isn't cancelled,
+    its response is discarded when it comes back.
+
+    :param name: name of API endpoint
+    :type name: str
+    :param send: function that sends the request and returns the response, raising an exception if it fails
+    :type send: Callable[[], R]
+    :param before_hedge: function called before the second request is sent, i.e. to wait on a rate limiter, defaults to None
+    :type before_hedge: Callable[[], None], optional
+    :raises Exception: exception raised by the first request, if both requests fail
+    :return: response of the first request to succeed
+    :rtype: R
+    """
+    delay = get_tracker(name).percentile(settings.hedge_percentile)
+    if delay is None:
+        return send()
+
+    executor = _get_executor()
+    first = executor.submit(send)
+    done, _ = wait([first], timeout=delay)
+    if done:
+        return first.result()
+
+    if before_hedge is not None:
+        before_hedge()
+    log.debug(f'{name} request taking longer than {round(delay, 2)} sec(s). Sending hedged request')
+    hedge_stats.increment_hedges()
+    hedge = executor.submit(send)
+    pending = {first, hedge}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                if future is hedge:
+                    hedge_stats.increment_hedge_wins()
+                return future.result()
+    return first.result()
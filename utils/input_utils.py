@@ -1,6 +1,7 @@
 import os
 import json
 import csv
+import yaml
 from typing import List
 
 prompt_prefix = "\n[Prompt] "
@@ -168,6 +169,44 @@ def load_json_data(msg: str, json_file_path: str = "") -> LoadedJSONData:
     return LoadedJSONData(file_path=json_file_path, data=json_data)
 
 
+class LoadedYAMLData():
+    def __init__(self, file_path: str, data: dict):
+        self.file_path = file_path
+        self.data = data
+
+def load_yaml_data(msg: str, yaml_file_path: str = "") -> LoadedYAMLData:
+    """
+    Returns a LoadedYAMLData with the loaded YAML data. If unsuccessful loading file, continues prompting user until successful or exits the script.
+
+    LoadedYAMLData : {
+        "file_path": yaml_file_path,
+        "data": data loaded from YAML file
+    }
+
+    :param msg: custom message to tell the user which file they should enter the file path of
+    :type msg: str
+    :param yaml_file_path: file path to YAML file to load, defaults to ""
+    :type yaml_file_path: str, optional
+    :return: object with loaded YAML data and the file path the data was loaded from
+    :rtype: LoadedYAMLData
+    """    
+    if yaml_file_path == "":
+        yaml_file_path = prompt_user(msg + " (relative file path, including file extention)")
+
+    if not os.path.exists(yaml_file_path):
+        if retry(f'Specified YAML file at \'{yaml_file_path}\' does not exist.'):
+            return load_yaml_data(msg)
+    
+    try:
+        with open(yaml_file_path, 'r', encoding="utf8") as file:
+            yaml_data = yaml.safe_load(file)
+    except Exception as e:
+        if retry(f'Error loading file: {e}'):
+            return load_yaml_data(msg)
+    
+    return LoadedYAMLData(file_path=yaml_file_path, data=yaml_data)
+
+
 class LoadedCSVData():
     def __init__(self, file_path: str, csv: List[List[str]], headers: List[str], data: List[str] | List[List[str]]):
         self.file_path = file_path
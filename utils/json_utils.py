@@ -0,0 +1,133 @@
+import codecs
+import json
+from typing import Any, Iterable, Iterator
+
+import settings
+
+try:
+    import orjson
+except ImportError: # orjson is in the Pipfile, but the standard library json module is used if it isn't installed
+    orjson = None
+
+
+def use_orjson() -> bool:
+    """
+    Whether orjson is used to decode and encode JSON, based on `json_backend` in settings.py and if orjson is installed
+    """
+    if settings.json_backend == "json":
+        return False
+    if orjson is None:
+        if settings.json_backend == "orjson":
+            raise ImportError("json_backend is set to 'orjson' in settings.py, but orjson is not installed. Run 'pip install orjson' or set json_backend to 'auto'")
+        return False
+    return True
+
+def loads(data: bytes | str) -> Any:
+    """
+    Decodes JSON
+
+    :param data: JSON document
+    :type data: bytes | str
+    :raises ValueError: data isn't valid JSON
+    :return: decoded Python object
+    :rtype: Any
+    """
+    if use_orjson():
+        return orjson.loads(data)
+    return json.loads(data)
+
+def dumps(obj: Any) -> bytes:
+    """
+    Encodes an object as compact UTF-8 JSON, ready to be sent as a request body
+
+    :param obj: object to encode
+    :type obj: Any
+    :raises TypeError: object can't be encoded as JSON
+    :return: encoded JSON
+    :rtype: bytes
+    """
+    if use_orjson():
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False, allow_nan=False).encode('utf-8')
+
+# characters that can continue a JSON number
+NUMBER_CHARS = frozenset("0123456789.eE+-")
+
+def is_number(item: Any) -> bool:
+    return isinstance(item, (int, float)) and not isinstance(item, bool)
+
+def iter_json_array(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """
+    Incrementally parses a JSON document that is an array, yielding each item as soon as it has been downloaded instead
+    of waiting for the entire document. Only the current item and the undecoded part of the last chunk are kept in
+    memory, so memory stays flat regardless of the size of the array.
+
+    :param chunks: raw bytes of the JSON document, in order, i.e. from `requests.Response.iter_content`
+    :type chunks: Iterable[bytes]
+    :raises ValueError: document isn't a valid JSON array, or it ended before the array was closed
+    :yield: each item in the array
+    :rtype: Iterator[Any]
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    chunks = iter(chunks)
+    buffer = ""
+    pos = 0
+    exhausted = False
+
+    def read_more() -> bool:
+        nonlocal buffer, pos, exhausted
+        if exhausted:
+            return False
+        chunk = next(chunks, None)
+        if chunk is None:
+            exhausted = True
+            buffer = buffer[pos:] + text_decoder.decode(b'', final=True)
+        else:
+            buffer = buffer[pos:] + text_decoder.decode(chunk)
+        pos = 0
+        return True
+
+    def skip_whitespace() -> str | None:
+        """
+        Moves past whitespace and returns the next character, or None if the document ended
+        """
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\n\r":
+                pos += 1
+            if pos < len(buffer):
+                return buffer[pos]
+            if not read_more():
+                return None
+
+    if skip_whitespace() != "[":
+        raise ValueError("JSON document is not an array")
+    pos += 1
+    if skip_whitespace() == "]":
+        return
+
+    while True:
+        if skip_whitespace() is None:
+            raise ValueError("JSON document ended before the array was closed")
+        # an item that was cut off at the end of the buffer fails to decode, so keep reading until it decodes
+        while True:
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+                # numbers can decode early if they are split across chunks, i.e. 12|34 or 1.|5, so a number followed by
+                # nothing but characters that can continue it is decoded again once the next chunk is read
+                if not exhausted and is_number(item) and all(char in NUMBER_CHARS for char in buffer[end:]):
+                    raise json.JSONDecodeError("Item may continue in the next chunk", buffer, end)
+                break
+            except json.JSONDecodeError:
+                if not read_more():
+                    raise
+        pos = end
+        yield item
+
+        separator = skip_whitespace()
+        if separator == "]":
+            return
+        if separator != ",":
+            raise ValueError(f'Expected \',\' or \']\' in JSON array, found {separator!r}')
+        pos += 1
@@ -16,12 +16,12 @@ class IterationMetrics:
     """
     A class to handle printing time based metric logs when doing iterative operations.
     """
-    def __init__(self, iterations: int):
+    def __init__(self, iterations: int | None):
         """
         Create an IterationMetrics object to track elapsed time for an interation operation
 
-        :param iterations: number of iteration that will be preformed. Used to calculate an estimated time remaining
-        :type iterations: int
+        :param iterations: number of iteration that will be preformed. Used to calculate an estimated time remaining. None if the number of iterations isn't known ahead of time
+        :type iterations: int | None
         """
         self.max_iterations = iterations
         self.curr_iteration = 0
@@ -29,14 +29,15 @@ class IterationMetrics:
         self.last_time = self.start_time
         self.total_time = 0
         self.avg_time = 0
-        self.time_remaining = self.avg_time * (self.max_iterations - (self.curr_iteration+1))
+        self.time_remaining = 0
 
     def step_iter_without_display(self) -> None:
         curr_time = time.time()
         iter_time = curr_time - self.last_time
         self.total_time += iter_time
         self.avg_time = self.total_time/(self.curr_iteration+1)
-        self.time_remaining = self.avg_time * (self.max_iterations - (self.curr_iteration+1))
+        if self.max_iterations is not None:
+            self.time_remaining = self.avg_time * (self.max_iterations - (self.curr_iteration+1))
 
         self.curr_iteration += 1
         self.last_time = curr_time
@@ -46,10 +47,13 @@ class IterationMetrics:
         iter_time = curr_time - self.last_time
         self.total_time += iter_time
         self.avg_time = self.total_time/(self.curr_iteration+1)
-        self.time_remaining = self.avg_time * (self.max_iterations - (self.curr_iteration+1))
+        if self.max_iterations is not None:
+            self.time_remaining = self.avg_time * (self.max_iterations - (self.curr_iteration+1))
 
         self.curr_iteration += 1
         self.last_time = curr_time
+        if self.max_iterations is None:
+            return f'METRICS: ({self.curr_iteration}) Completed in {round(iter_time, 1)} sec(s) - Total time: {round(self.total_time/60, 1)} min(s)'
         return f'METRICS: ({self.curr_iteration}/{self.max_iterations}) Completed in {round(iter_time, 1)} sec(s) - Total time: {round(self.total_time/60, 1)} min(s) - Est. Time Remaining: {round(self.time_remaining/60, 1)} min(s)'        
 
 
@@ -0,0 +1,291 @@
+import csv
+import json
+import os
+from typing import Dict, List, Tuple
+
+import yaml
+
+import utils.input_utils as input
+from utils.general_utils import format_tag
+from utils.tag_utils import TagRuleSet, is_tag_pattern, compile_tag_pattern
+import utils.log_handler as logger
+log = logger.log
+
+VALID_RULE_ACTIONS = ["refractor", "remove", "add"]
+# number of errors listed when a rules file is invalid, the rest are only counted
+MAX_LISTED_ERRORS = 20
+
+
+# Tag rules can be loaded from a CSV, JSON, or YAML file.
+#
+# CSV files have a header row with the columns `action`, `tag`, and `value`. Each row is a single rule, where `action` is
+# refractor, remove, or add, `tag` is the tag or pattern to find, and `value` is the replacement or the tag to add. The
+# value is left empty for removals. Consecutive rows with the same action are made at the same time, and each time the
+# action changes the rows after it apply to the tags left by the rows before it.
+#
+# JSON and YAML files are a list of changes made in order. Each change has a single key, the action, mapped to its rules
+# - refractor:
+#     old_tag: new_tag
+#     client:*: customer:*
+# - remove:
+#     - scan_2023_*
+# - add:
+#     critical: [needs_review, p1]
+
+class LoadedTagRules():
+    def __init__(self, file_path: str, rule_sets: List[TagRuleSet], num_rules: int, num_duplicates: int):
+        self.file_path = file_path
+        self.rule_sets = rule_sets
+        self.num_rules = num_rules
+        self.num_duplicates = num_duplicates
+
+
+def parse_csv_rules(headers: List[str], rows: List[List[str]]) -> List[Tuple[str, str, str, str]]:
+    """
+    Reads the rules from the rows of a CSV file
+
+    :param headers: header row of the CSV file
+    :type headers: List[str]
+    :param rows: rows of the CSV file, excluding the header row
+    :type rows: List[List[str]]
+    :raises ValueError: CSV file is missing a required column
+    :return: list of rules, each a tuple of where the rule is in the file, the action, the tag to find, and the value
+    :rtype: List[Tuple[str, str, str, str]]
+    """
+    columns = [header.strip().lower() for header in headers]
+    missing = [column for column in ["action", "tag", "value"] if column not in columns]
+    if len(missing) > 0:
+        raise ValueError(f'Tag rules CSV file is missing the column(s) {missing}. Expected a header row with the columns action, tag, and value')
+    action_index = columns.index("action")
+    tag_index = columns.index("tag")
+    value_index = columns.index("value")
+
+    rules = []
+    for i, row in enumerate(rows):
+        if len(row) < 1 or all(val.strip() == "" for val in row):
+            continue
+        row = row + [""] * (len(columns) - len(row))
+        rules.append((f'row {i+2}', row[action_index].strip().lower(), row[tag_index].strip(), row[value_index].strip()))
+    return rules
+
+
+def parse_structured_rules(data: list) -> List[Tuple[str, str, str, str]]:
+    """
+    Reads the rules from the list of changes loaded from a JSON or YAML file
+
+    :param data: loaded list of changes
+    :type data: list
+    :raises ValueError: data isn't shaped like a list of changes
+    :return: list of rules, each a tuple of where the rule is in the file, the action, the tag to find, and the value
+    :rtype: List[Tuple[str, str, str, str]]
+    """
+    if not isinstance(data, list):
+        raise ValueError(f'Tag rules file should contain a list of changes, i.e. [{{"refractor": {{"old_tag": "new_tag"}}}}]')
+
+    rules = []
+    for i, change in enumerate(data):
+        location = f'change {i+1}'
+        if not isinstance(change, dict) or len(change) != 1:
+            raise ValueError(f'{location} in tag rules file should have a single key, one of {VALID_RULE_ACTIONS}')
+        action, change_rules = next(iter(change.items()))
+        action = str(action).strip().lower()
+        if action == "remove" and isinstance(change_rules, list):
+            rules.extend((location, action, str(tag).strip(), "") for tag in change_rules)
+        elif isinstance(change_rules, dict):
+            for tag, values in change_rules.items():
+                for value in (values if isinstance(values, list) else [values]):
+                    rules.append((location, action, str(tag).strip(), "" if value is None else str(value).strip()))
+        else:
+            raise ValueError(f'{location} in tag rules file should map each tag to find to its value, or list the tags to find for removals')
+    return rules
+
+
+def is_valid_value(value: str) -> bool:
+    """
+    Checks if a replacement or added tag is formatted as a Plextrac tag. Templates filled in from a pattern, ending in `*`
+    or using regular expression groups, are checked without the template parts
+    """
+    if "\\" in value:
+        return True
+    if value.endswith("*"):
+        value = value[:-1]
+    return value == format_tag(value)
+
+
+def compile_tag_rules(rules: List[Tuple[str, str, str, str]]) -> Tuple[List[TagRuleSet], int, List[str], List[str]]:
+    """
+    Validates and deduplicates rules, and compiles them into a `TagRuleSet` per change. Consecutive rules with the same
+    action are a single change, unless they were listed as separate changes in the file.
+
+    :param rules: list of rules, each a tuple of where the rule is in the file, the action, the tag to find, and the value
+    :type rules: List[Tuple[str, str, str, str]]
+    :raises ValueError: a rule set is invalid, i.e. it has replacements that form a cycle and cycles are rejected in settings.py
+    :return: tuple of
+     - compiled rule sets, in the order the changes are made
+     - number of duplicate rules that were skipped
+     - errors found in the rules
+     - tags to find that aren't formatted as Plextrac tags, these are allowed since they may be on existing objects
+    :rtype: Tuple[List[TagRuleSet], int, List[str], List[str]]
+    """
+    rule_sets = []
+    errors = []
+    unformatted = []
+    num_duplicates = 0
+
+    group = None
+    replacements: Dict[str, List[str]] = {}
+    additions: Dict[str, List[str]] = {}
+    def close_group():
+        if len(replacements) > 0 or len(additions) > 0:
+            rule_sets.append(TagRuleSet(replacements=dict(replacements), additions=dict(additions)))
+        replacements.clear()
+        additions.clear()
+
+    for location, action, tag, value in rules:
+        # rules from a different change or with a different action start a new change
+        change = location if location.startswith("change") else action
+        if change != group:
+            close_group()
+            group = change
+
+        if action not in VALID_RULE_ACTIONS:
+            errors.append(f'{location}: invalid action \'{action}\'. Should be one of {VALID_RULE_ACTIONS}')
+            continue
+        if tag == "":
+            errors.append(f'{location}: missing tag to find')
+            continue
+        if is_tag_pattern(tag):
+            try:
+                compile_tag_pattern(tag)
+            except ValueError as e:
+                errors.append(f'{location}: {e}')
+                continue
+        elif tag != format_tag(tag):
+            unformatted.append(tag)
+        if action != "remove":
+            if value == "":
+                errors.append(f'{location}: missing {"replacement" if action == "refractor" else "tag to add"} for \'{tag}\'')
+                continue
+            if not is_valid_value(value):
+                errors.append(f'{location}: \'{value}\' is not a valid tag. It is ideally formatted \'{format_tag(value)}\'')
+                continue
+
+        if action == "refractor":
+            if tag in replacements:
+                if replacements[tag] != [value]:
+                    errors.append(f'{location}: \'{tag}\' is replaced with both \'{replacements[tag][0]}\' and \'{value}\'')
+                else:
+                    num_duplicates += 1
+                continue
+            replacements[tag] = [value]
+        elif action == "remove":
+            if tag in replacements:
+                num_duplicates += 1
+                continue
+            replacements[tag] = []
+        elif action == "add":
+            tag_additions = additions.setdefault(tag, [])
+            if value in tag_additions:
+                num_duplicates += 1
+                continue
+            tag_additions.append(value)
+    close_group()
+
+    return rule_sets, num_duplicates, errors, unformatted
+
+
+def read_tag_rules_file(file_path: str) -> List[Tuple[str, str, str, str]]:
+    """
+    Reads the rules from a CSV, JSON, or YAML file without prompting the user, i.e. in batch runs
+
+    :param file_path: path to the rules file
+    :type file_path: str
+    :raises ValueError: file doesn't exist, type isn't supported, or the file can't be read or parsed
+    :return: list of rules, each a tuple of where the rule is in the file, the action, the tag to find, and the value
+    :rtype: List[Tuple[str, str, str, str]]
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension not in [".csv", ".json", ".yaml", ".yml"]:
+        raise ValueError(f'Tag rules file should be a .csv, .json, .yaml, or .yml file. Got \'{file_path}\'')
+    if not os.path.exists(file_path):
+        raise ValueError(f'Tag rules file \'{file_path}\' does not exist')
+    try:
+        with open(file_path, 'r', newline='', encoding="utf-8") as f:
+            if extension == ".csv":
+                data = list(csv.reader(f))
+            elif extension == ".json":
+                data = json.load(f)
+            else:
+                data = yaml.safe_load(f)
+    except Exception as e:
+        raise ValueError(f'Could not load tag rules file \'{file_path}\': {e}') from e
+
+    if extension != ".csv":
+        return parse_structured_rules(data)
+    if len(data) < 1:
+        raise ValueError(f'Tag rules CSV file \'{file_path}\' is empty. Expected a header row with the columns action, tag, and value')
+    return parse_csv_rules(data[0], data[1:])
+
+
+def load_tag_rules(file_path: str = "", interactive: bool = True) -> LoadedTagRules:
+    """
+    Loads tag rules from a CSV, JSON, or YAML file, and compiles them into the changes to make. Prompts the user for the
+    file path if one isn't given
+
+    :param file_path: path to the rules file, defaults to ""
+    :type file_path: str, optional
+    :param interactive: whether the user can be prompted for the file again if it can't be loaded. if False, a
+    ValueError is raised instead, defaults to True
+    :type interactive: bool, optional
+    :raises ValueError: file type isn't supported, or the rules in the file are invalid
+    :return: object with the compiled rule sets and the file path they were loaded from
+    :rtype: LoadedTagRules
+    """
+    if not interactive:
+        return build_tag_rules(read_tag_rules_file(file_path), file_path)
+
+    if file_path == "":
+        file_path = input.prompt_user("Enter the tag rules file (relative file path, including file extention)")
+
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension == ".csv":
+        loaded = input.load_csv_data("Enter the tag rules CSV file", file_path)
+        file_path = loaded.file_path
+        rules = parse_csv_rules(loaded.headers, loaded.data)
+    elif extension == ".json":
+        loaded = input.load_json_data("Enter the tag rules JSON file", file_path)
+        file_path = loaded.file_path
+        rules = parse_structured_rules(loaded.data)
+    elif extension in [".yaml", ".yml"]:
+        loaded = input.load_yaml_data("Enter the tag rules YAML file", file_path)
+        file_path = loaded.file_path
+        rules = parse_structured_rules(loaded.data)
+    else:
+        raise ValueError(f'Tag rules file should be a .csv, .json, .yaml, or .yml file. Got \'{file_path}\'')
+
+    return build_tag_rules(rules, file_path)
+
+
+def build_tag_rules(rules: List[Tuple[str, str, str, str]], source: str) -> LoadedTagRules:
+    """
+    Compiles parsed rules into the changes to make, raising an exception listing every invalid rule
+
+    :param rules: list of rules, each a tuple of where the rule is in the file, the action, the tag to find, and the value
+    :type rules: List[Tuple[str, str, str, str]]
+    :param source: file the rules were loaded from, used in messages
+    :type source: str
+    :raises ValueError: the rules are invalid
+    :return: object with the compiled rule sets and the file path they were loaded from
+    :rtype: LoadedTagRules
+    """
+    rule_sets, num_duplicates, errors, unformatted = compile_tag_rules(rules)
+    if len(errors) > 0:
+        listed = "\n".join(errors[:MAX_LISTED_ERRORS])
+        more = f'\n...and {len(errors) - MAX_LISTED_ERRORS} more' if len(errors) > MAX_LISTED_ERRORS else ""
+        raise ValueError(f'Found {len(errors)} invalid rule(s) in \'{source}\':\n{listed}{more}')
+    if len(unformatted) > 0:
+        log.warning(f'{len(unformatted)} tag(s) to find are not formatted as Plextrac tags, i.e. \'{unformatted[0]}\'. These will only match tags on objects exactly as entered')
+
+    num_rules = len(rules) - num_duplicates
+    log.info(f'Loaded {num_rules} rule(s) in {len(rule_sets)} change(s) from \'{source}\'{f". Skipped {num_duplicates} duplicate rule(s)" if num_duplicates > 0 else ""}')
+    return LoadedTagRules(source, rule_sets, num_rules, num_duplicates)
@@ -0,0 +1,146 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterator
+
+import utils.log_handler as logger
+log = logger.log
+
+
+def get_all_pages(request_page: Callable[[int, int], dict], limit: int, concurrency: int = 1) -> Iterator[dict]:
+    """
+    Handles traversing pagination results for endpoints that return `meta.pagination.total`, yielding the JSON of each
+    page in order.
+
+    The first page is requested on its own to get the total number of items. The remaining pages are then requested
+    `concurrency` at a time, and yielded in order as they come back.
+
+    The request for the first page is expected to succeed and return pagination data. If a later page returns JSON
+    without pagination data it is still yielded, so the caller can check the `status` of each page.
+
+    :param request_page: function that sends the request for a single page, given the offset and limit, and returns the response JSON
+    :type request_page: Callable[[int, int], dict]
+    :param limit: number of items per page
+    :type limit: int
+    :param concurrency: number of pages to request at the same time, defaults to 1
+    :type concurrency: int, optional
+    :yield: JSON of each page, in order of offset
+    :rtype: Iterator[dict]
+    """
+    first_page = request_page(0, limit)
+    yield first_page
+    if first_page.get('status') != "success":
+        return
+
+    total = int(first_page['meta']['pagination']['total'])
+    offsets = range(limit, total, limit)
+
+    if concurrency <= 1:
+        for offset in offsets:
+            yield request_page(offset, limit)
+        return
+
+    offsets = iter(offsets)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = deque(executor.submit(request_page, offset, limit) for offset, _ in zip(offsets, range(concurrency)))
+        while pending:
+            page = pending.popleft().result()
+            next_offset = next(offsets, None)
+            if next_offset is not None:
+                pending.append(executor.submit(request_page, next_offset, limit))
+            yield page
+
+
+class PagedObjects():
+    """
+    Iterable over all objects returned by a paginated endpoint, that requests pages as the objects are iterated over,
+    instead of loading every page before any object can be used. Memory used is bounded by the page size.
+
+    The first page is requested when created, so the total number of objects is known up front and `len()` can be used.
+    Can only be iterated over once.
+
+    If a page fails to load partway through, iteration stops and `failed` is set. `num_missing` is the number of
+    objects that were never yielded.
+    """
+    def __init__(self, request_page: Callable[[int, int], dict], limit: int, data_key: str, concurrency: int = 1, to_record: Callable[[dict], Any] = None):
+        """
+        :param request_page: function that sends the request for a single page, given the offset and limit, and returns the response JSON
+        :type request_page: Callable[[int, int], dict]
+        :param limit: number of objects per page
+        :type limit: int
+        :param data_key: key in the response JSON that the list of objects is under
+        :type data_key: str
+        :param concurrency: number of pages to request at the same time, defaults to 1
+        :type concurrency: int, optional
+        :param to_record: function that converts each object to the record that is yielded, so only the record is kept after the page is done. None to yield the objects as is, defaults to None
+        :type to_record: Callable[[dict], Any], optional
+        """
+        self.data_key = data_key
+        self.to_record = to_record
+        self.pages = get_all_pages(request_page, limit, concurrency)
+        self.first_page = next(self.pages)
+        self.failed = self.first_page.get('status') != "success"
+        self.total = 0 if self.failed else int(self.first_page['meta']['pagination']['total'])
+        self.num_yielded = 0
+
+    def __len__(self) -> int:
+        return self.total
+
+    def __iter__(self) -> Iterator[Any]:
+        if self.failed:
+            return
+        page = self.first_page
+        self.first_page = None # only hold on to the current page
+        while page is not None:
+            if page.get('status') != "success":
+                log.error(f'Could not retrieve page of objects. Stopping after {self.num_yielded} of {self.total} objects')
+                self.failed = True
+                return
+            for obj in page[self.data_key]:
+                self.num_yielded += 1
+                yield obj if self.to_record is None else self.to_record(obj)
+            try:
+                page = next(self.pages, None)
+            except Exception as e:
+                log.exception(f'Could not retrieve page of objects. Stopping after {self.num_yielded} of {self.total} objects')
+                self.failed = True
+                return
+
+    @property
+    def num_missing(self) -> int:
+        if not self.failed:
+            return 0
+        return max(self.total - self.num_yielded, 0)
+
+
+class StreamedObjects():
+    """
+    Iterable over all objects returned by an endpoint that returns every object in a single JSON array, that parses
+    objects as the response is downloaded instead of loading the entire response. Memory used doesn't grow with the
+    number of objects, and objects can be used before the download finishes.
+
+    The request isn't sent until iteration starts, so the connection isn't held open while other objects are updated.
+    The number of objects isn't known until the response has been read, so `len()` can't be used. Can only be iterated
+    over once.
+
+    If the request fails, or the response fails partway through, iteration stops and `failed` is set.
+    """
+    def __init__(self, request_items: Callable[[], Iterator[dict]], to_record: Callable[[dict], Any] = None):
+        """
+        :param request_items: function that sends the request and returns an iterator over the objects in the response, i.e. from `PTWrapperLibraryResponse.iter_json_array`
+        :type request_items: Callable[[], Iterator[dict]]
+        :param to_record: function that converts each object to the record that is yielded. None to yield the objects as is, defaults to None
+        :type to_record: Callable[[dict], Any], optional
+        """
+        self.request_items = request_items
+        self.to_record = to_record
+        self.failed = False
+        self.num_yielded = 0
+
+    def __iter__(self) -> Iterator[Any]:
+        try:
+            for obj in self.request_items():
+                self.num_yielded += 1
+                yield obj if self.to_record is None else self.to_record(obj)
+        except Exception as e:
+            log.exception(f'Could not load objects. Stopping after {self.num_yielded} objects')
+            self.failed = True
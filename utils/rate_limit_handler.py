@@ -0,0 +1,168 @@
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict
+
+import settings
+import utils.log_handler as logger
+log = logger.log
+
+
+class TokenBucket():
+    """
+    Thread safe token bucket limiting how many requests per second can be sent. Each request takes a token, and tokens
+    refill at `rate` per second up to `burst`. The bucket can also be paused, i.e. when the server responds with a
+    `Retry-After` header.
+    """
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.last_refill = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """
+        Blocks until a token is available and takes it
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+                if self.paused_until > now:
+                    wait = self.paused_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                else:
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """
+        Stops tokens from being given out for `seconds`
+        """
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+
+class AdaptiveRateLimiter():
+    """
+    Rate limiter for a family of endpoints. Requests wait on a token bucket, and the rate of the bucket is adjusted
+    with an AIMD (additive increase, multiplicative decrease) controller based on each response.
+
+    Each response under the latency threshold raises the rate a little, so the rate increases by about
+    `additive_increase` requests per second, every second. A rate limited or server error response, or one over the
+    latency threshold, cuts the rate by `decrease_factor`. The rate is only cut once per second, so a batch of
+    concurrent requests failing together doesn't collapse the rate.
+    """
+    def __init__(self, family: str, rate: float, min_rate: float, max_rate: float):
+        self.family = family
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.bucket = TokenBucket(rate, max(rate, 1))
+        self.last_decrease = 0.0
+        self.lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        return self.bucket.rate
+
+    def acquire(self) -> None:
+        self.bucket.acquire()
+
+    def pause(self, seconds: float) -> None:
+        log.warning(f'Rate limited on {self.family} endpoints. Pausing requests for {round(seconds, 1)} sec(s)')
+        self.bucket.pause(seconds)
+
+    def on_response(self, latency: float, status_code: int | None) -> None:
+        """
+        Adjusts the rate based on the response to a request
+
+        :param latency: time in seconds the request took
+        :type latency: float
+        :param status_code: status code of the response, None if no response was received
+        :type status_code: int | None
+        """
+        degraded = status_code is None or status_code == 429 or status_code >= 500 or latency > settings.rate_limit_latency_threshold
+        with self.lock:
+            rate = self.bucket.rate
+            if degraded:
+                now = time.monotonic()
+                if now - self.last_decrease < 1:
+                    return
+                self.last_decrease = now
+                rate = max(self.min_rate, rate * settings.rate_limit_decrease_factor)
+                log.debug(f'Decreased rate limit for {self.family} endpoints to {round(rate, 2)} requests/sec')
+            else:
+                rate = min(self.max_rate, rate + settings.rate_limit_additive_increase / rate)
+            self.bucket.rate = rate
+            self.bucket.burst = max(rate, 1)
+
+
+_limiters: Dict[str, AdaptiveRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+def get_family(name: str) -> str:
+    """
+    Returns the endpoint family an endpoint belongs to, based on the `rate_limit_families` in settings.py
+
+    :param name: name of API endpoint
+    :type name: str
+    :return: name of the endpoint family, "default" if the endpoint isn't listed in a family
+    :rtype: str
+    """
+    for family, names in settings.rate_limit_families.items():
+        if name in names:
+            return family
+    return "default"
+
+def get_limiter(name: str) -> AdaptiveRateLimiter:
+    """
+    Returns the rate limiter for the endpoint family of the endpoint, creating it on first use
+
+    :param name: name of API endpoint
+    :type name: str
+    :return: rate limiter shared by all endpoints in the family
+    :rtype: AdaptiveRateLimiter
+    """
+    family = get_family(name)
+    limiter = _limiters.get(family)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(family)
+            if limiter is None:
+                limits = settings.rate_limits.get(family, settings.rate_limits["default"])
+                limiter = AdaptiveRateLimiter(family, limits['rate'], limits['min_rate'], limits['max_rate'])
+                _limiters[family] = limiter
+    return limiter
+
+def parse_retry_after(value: str | None) -> float | None:
+    """
+    Parses the value of a `Retry-After` header, which can either be a number of seconds or an HTTP date
+
+    :param value: header value
+    :type value: str | None
+    :return: number of seconds to wait, or None if the header is missing or invalid
+    :rtype: float | None
+    """
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0)
+
+def get_rate_limit_metrics() -> str:
+    return ' - '.join(f'{family}: {round(limiter.rate, 2)} requests/sec' for family, limiter in _limiters.items())
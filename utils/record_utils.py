@@ -0,0 +1,138 @@
+from abc import ABC, abstractmethod
+from typing import List, Tuple
+
+from utils.tag_utils import tag_dictionary
+
+
+# The records below hold only what's needed to match the tags on an object and address it when sending an update.
+# Objects from list endpoints are converted to records as each page is loaded, so the rest of the object (descriptions,
+# custom fields, asset findings, known IPs, etc.) isn't held in memory. `__slots__` keeps each record to a handful of
+# references instead of a full dict, and tags are stored as the interned tuple of their IDs in the `tag_dictionary`.
+
+class TagRecord(ABC):
+    __slots__ = ("tag_ids",)
+
+    @property
+    def tags(self) -> List[str]:
+        """
+        Tags on the object, decoded from the tag dictionary
+        """
+        return tag_dictionary.decode(self.tag_ids)
+
+    @property
+    @abstractmethod
+    def index_key(self) -> str:
+        """
+        Key that identifies the object among objects of the same type in the tag index
+        """
+
+    @abstractmethod
+    def to_json(self) -> dict:
+        """
+        Returns the fields of the record keyed as they are in the API response, so the record can be rebuilt with `from_json`
+        """
+
+
+class ClientRecord(TagRecord):
+    __slots__ = ("client_id", "name")
+
+    def __init__(self, client_id: int, name: str, tag_ids: Tuple[int]):
+        self.client_id = client_id
+        self.name = name
+        self.tag_ids = tag_ids
+
+    @classmethod
+    def from_json(cls, client: dict) -> "ClientRecord":
+        return cls(client['client_id'], client.get('name', ''), tag_dictionary.encode(client.get('tags')))
+
+    @property
+    def index_key(self) -> str:
+        return str(self.client_id)
+
+    def to_json(self) -> dict:
+        return {'client_id': self.client_id, 'name': self.name, 'tags': self.tags}
+
+
+class AssetRecord(TagRecord):
+    __slots__ = ("id", "client_id", "asset")
+
+    def __init__(self, id: str, client_id: int, asset: str, tag_ids: Tuple[int]):
+        self.id = id
+        self.client_id = client_id
+        self.asset = asset
+        self.tag_ids = tag_ids
+
+    @classmethod
+    def from_json(cls, asset: dict) -> "AssetRecord":
+        return cls(asset['id'], asset['client_id'], asset.get('asset', ''), tag_dictionary.encode(asset.get('tags')))
+
+    @property
+    def index_key(self) -> str:
+        return str(self.id)
+
+    def to_json(self) -> dict:
+        return {'id': self.id, 'client_id': self.client_id, 'asset': self.asset, 'tags': self.tags}
+
+
+class ReportRecord(TagRecord):
+    __slots__ = ("id", "client_id", "name", "num_findings")
+
+    def __init__(self, id: int, client_id: int, name: str, num_findings: int, tag_ids: Tuple[int]):
+        self.id = id
+        self.client_id = client_id
+        self.name = name
+        self.num_findings = num_findings
+        self.tag_ids = tag_ids
+
+    @classmethod
+    def from_json(cls, report: dict) -> "ReportRecord":
+        return cls(report['id'], report['client_id'], report.get('name', ''), report.get('findings', 0), tag_dictionary.encode(report.get('tags')))
+
+    @property
+    def index_key(self) -> str:
+        return str(self.id)
+
+    def to_json(self) -> dict:
+        return {'id': self.id, 'client_id': self.client_id, 'name': self.name, 'findings': self.num_findings, 'tags': self.tags}
+
+
+class FindingRecord(TagRecord):
+    __slots__ = ("flaw_id", "client_id", "report_id", "title")
+
+    def __init__(self, flaw_id: int, client_id: int, report_id: int, title: str, tag_ids: Tuple[int]):
+        self.flaw_id = flaw_id
+        self.client_id = client_id
+        self.report_id = report_id
+        self.title = title
+        self.tag_ids = tag_ids
+
+    @classmethod
+    def from_json(cls, finding: dict) -> "FindingRecord":
+        return cls(finding['flaw_id'], finding['client_id'], finding['report_id'], finding.get('title', ''), tag_dictionary.encode(finding.get('tags')))
+
+    @property
+    def index_key(self) -> str:
+        return f'{self.report_id}:{self.flaw_id}'
+
+    def to_json(self) -> dict:
+        return {'flaw_id': self.flaw_id, 'client_id': self.client_id, 'report_id': self.report_id, 'title': self.title, 'tags': self.tags}
+
+
+class WriteupRecord(TagRecord):
+    __slots__ = ("doc_id", "title")
+
+    def __init__(self, doc_id: int, title: str, tag_ids: Tuple[int]):
+        self.doc_id = doc_id
+        self.title = title
+        self.tag_ids = tag_ids
+
+    @classmethod
+    def from_json(cls, writeup: dict) -> "WriteupRecord":
+        return cls(writeup['doc_id'], writeup.get('title', ''), tag_dictionary.encode(writeup.get('tags')))
+
+    @property
+    def index_key(self) -> str:
+        return str(self.doc_id)
+
+    def to_json(self) -> dict:
+        return {'doc_id': self.doc_id, 'title': self.title, 'tags': self.tags}
@@ -1,30 +1,193 @@
 import requests
 import requests.packages
-from typing import Dict
-from json import JSONDecodeError
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from typing import Dict, Callable, Iterator, Any
+import contextvars
+import threading
 import time
 
 import settings
 import utils.log_handler as logger
+import utils.json_utils as json_utils
+import utils.rate_limit_handler as rate_limit_handler
+import utils.circuit_breaker_handler as circuit_breaker_handler
+import utils.hedge_handler as hedge_handler
+import utils.retry_handler as retry_handler
 log = logger.log
 
-from api.exceptions import PTWrapperLibraryException, PTWrapperLibraryJSONResponse, PTWrapperLibraryFailed
+from api.exceptions import PTWrapperLibraryException, PTWrapperLibraryCircuitOpen, PTWrapperLibraryJSONResponse, PTWrapperLibraryFailed
 
 
 
 class PTWrapperLibraryResponse():
-    def __init__(self, response: requests.Response, status_code: int, message: str = '', json: dict = None):
+    """
+    Wrapper for a successful response. Keeps the raw response body and only deserializes the JSON data the first time
+    `json` or `has_json_response` is used, so responses that are never read aren't parsed.
+    """
+    def __init__(self, response: requests.Response, status_code: int, message: str = '', json: dict = None, name: str = ''):
         self.response = response
         self.status_code = int(status_code)
         self.message = str(message)
+        self.name = name
+
+        self._json = json
+
+    @property
+    def json(self) -> dict:
+        """
+        :raises PTWrapperLibraryJSONResponse: response doesn't contain JSON data
+        """
+        if self._json is None:
+            try:
+                self._json = json_utils.loads(self.response.content) if self.response.content else {}
+            except ValueError as e:
+                raise PTWrapperLibraryJSONResponse(f'Bad JSON response - {self.name}') from e
+            if not self._json:
+                self._json = {}
+        return self._json
 
-        self.has_json_response = True if json else False
-        self.json = json if json else {}
+    @property
+    def has_json_response(self) -> bool:
+        return True if self.json else False
+
+    def iter_json_array(self) -> Iterator[Any]:
+        """
+        Yields each item of a response that is a JSON array as it is downloaded, instead of loading the entire response.
+        Only streams if the request was sent with `call_streaming`, otherwise the response has already been downloaded.
+        The response is closed once iteration finishes.
+
+        :raises PTWrapperLibraryJSONResponse: response isn't a valid JSON array
+        :yield: each item in the array
+        :rtype: Iterator[Any]
+        """
+        try:
+            yield from json_utils.iter_json_array(self.response.iter_content(chunk_size=settings.stream_chunk_size))
+        except (ValueError, requests.exceptions.RequestException) as e:
+            raise PTWrapperLibraryJSONResponse(f'Bad JSON response - {self.name}') from e
+        finally:
+            self.response.close()
+
+def get_response_message(response: requests.Response) -> str | None:
+    """
+    Returns the `message` PT sends in the JSON of a failed response, or None if the response doesn't have one
+    """
+    try:
+        return json_utils.loads(response.content).get("message")
+    except (ValueError, AttributeError):
+        return None
 
 if not settings.verify_ssl:
     # noinspection PyUnresolvedReferences
     requests.packages.urllib3.disable_warnings()
 
+
+class ConnectionStats():
+    """
+    Thread safe counters for the connections opened by the shared session vs the number of requests sent through it.
+    Any request that didn't need a new connection reused a kept-alive connection from the pool.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connections_opened = 0
+        self.requests_sent = 0
+
+    def increment_connections(self) -> None:
+        with self.lock:
+            self.connections_opened += 1
+
+    def increment_requests(self) -> None:
+        with self.lock:
+            self.requests_sent += 1
+
+    @property
+    def connections_reused(self) -> int:
+        return max(self.requests_sent - self.connections_opened, 0)
+
+    def __str__(self):
+        return f'Connections opened: {self.connections_opened} - Connections reused: {self.connections_reused} - Requests sent: {self.requests_sent}'
+
+connection_stats = ConnectionStats()
+
+
+class CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        connection_stats.increment_connections()
+        return super()._new_conn()
+
+class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        connection_stats.increment_connections()
+        return super()._new_conn()
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that creates connection pools which report new connections to `connection_stats`
+    """
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": CountingHTTPConnectionPool, "https": CountingHTTPSConnectionPool}
+
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session() -> requests.Session:
+    """
+    Returns the shared session all requests are sent through, creating it on first use. The session keeps connections
+    to the Plextrac instance alive between requests, instead of doing a new TCP and TLS handshake for every request.
+
+    Pool sizes and keep alive behavior are set in settings.py
+
+    :return: shared requests session
+    :rtype: requests.Session
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = PooledHTTPAdapter(pool_connections=settings.pool_connections, pool_maxsize=settings.pool_maxsize, pool_block=settings.pool_block)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.verify = settings.verify_ssl
+                if not settings.keep_alive:
+                    session.headers["Connection"] = "close"
+                _session = session
+    return _session
+
+def close_session() -> None:
+    """
+    Closes all pooled connections of the shared session. A new session will be created on the next request
+    """
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+_stream_mode = contextvars.ContextVar("_stream_mode", default=False)
+
+def call_streaming(endpoint_function: Callable[..., PTWrapperLibraryResponse], *args, **kwargs) -> PTWrapperLibraryResponse:
+    """
+    Calls an endpoint function from api._v1/api._v2 so that only the headers of the response are downloaded before it
+    returns. The body is downloaded as it is read, i.e. with `PTWrapperLibraryResponse.iter_json_array`, so endpoints
+    that return a very large list don't have to be held in memory.
+
+    ex. `for writeup in call_streaming(api._v1._content_library.writeups.list_writeups, base_url, headers).iter_json_array():`
+
+    :param endpoint_function: any endpoint function from api._v1/api._v2
+    :type endpoint_function: Callable[..., PTWrapperLibraryResponse]
+    :return: response with the body not yet downloaded
+    :rtype: PTWrapperLibraryResponse
+    """
+    token = _stream_mode.set(True)
+    try:
+        return endpoint_function(*args, **kwargs)
+    finally:
+        _stream_mode.reset(token)
+
 def _do(http_method: str, base_url: str, headers: dict, endpoint: str, name: str, data: Dict = None, files = None, retry:bool=True) -> PTWrapperLibraryResponse:
     """
     :param http_method: HTTP method, GET, POST, PUT, DELETE
@@ -44,7 +207,7 @@ def _do(http_method: str, base_url: str, headers: dict, endpoint: str, name: str
     :param retry: retries are globally enabled in settings.py this allows for disabling retries for a specific endpoint, defaults to True
     :type retry: bool, optional
     :raises PTWrapperLibraryException: general request failure
-    :raises PTWrapperLibraryJSONResponse: request doesn't return JSON data
+    :raises PTWrapperLibraryCircuitOpen: circuit for the endpoint is open, the request was not sent
     :raises PTWrapperLibraryFailed: non 200 response
     :return: custom wrapper for Python requests.Response object
     :rtype: PTWrapperLibraryResponse
@@ -53,47 +216,91 @@ def _do(http_method: str, base_url: str, headers: dict, endpoint: str, name: str
     log_line_pre = f"method={http_method}, url={full_url}"
     log_line_post = ', '.join((log_line_pre, "success={}, status_code={}, message={}"))
     
+    # requests wait on the rate limiter for the endpoint's family, which adapts its rate to how the instance responds
+    limiter = rate_limit_handler.get_limiter(name) if settings.rate_limiting else None
+    rate_limited_retries = 0
+
+    # the retry policy for the endpoint decides which failures are retried and how long to wait between retries
+    policy = retry_handler.get_policy(name)
+    idempotent = policy.is_idempotent(http_method)
+
+    # requests fail right away while the circuit for the endpoint is open, instead of waiting on a failing endpoint
+    breaker = circuit_breaker_handler.get_breaker(name) if settings.circuit_breaker else None
+
+    timeout = hedge_handler.get_timeout(name)
+    stream = _stream_mode.get()
+    # the payload is serialized once with the configured JSON backend, instead of on every attempt
+    if data is not None and files is None:
+        body = json_utils.dumps(data)
+        headers = {**headers, "Content-Type": "application/json"}
+    else:
+        body = None
+    send = lambda: get_session().request(method=http_method, url=full_url, verify=settings.verify_ssl, headers=headers, data=body, files=files, timeout=timeout, stream=stream)
+    # slow GETs to some endpoints are sent a second time, so one stuck connection doesn't hold up the request
+    hedge = hedge_handler.can_hedge(name, http_method) and not stream
+    latency_tracker = hedge_handler.get_tracker(name)
+
     retries = 0
-    max_retries = settings.retries
+    max_retries = policy.max_retries
     if not retry:
         max_retries = 0
     while retries <= max_retries:
+        if breaker is not None and not breaker.allow_request():
+            raise PTWrapperLibraryCircuitOpen(f'Circuit open - {name}')
         # Log HTTP params and perform an HTTP request, catching and re-raising any exceptions
         try:
+            if limiter is not None:
+                limiter.acquire()
             log.debug(log_line_pre)
-            response = requests.request(method=http_method, url=full_url, verify=settings.verify_ssl, headers=headers, json=data, files=files)
+            connection_stats.increment_requests()
+            request_start = time.monotonic()
+            if hedge:
+                response = hedge_handler.send_hedged(name, send, limiter.acquire if limiter is not None else None)
+            else:
+                response = send()
         except requests.exceptions.RequestException as e:
-            if retries < max_retries:
+            if limiter is not None:
+                limiter.on_response(time.monotonic() - request_start, None)
+            if breaker is not None:
+                breaker.record_failure()
+            if retries < max_retries and policy.can_retry_exception(e, idempotent):
                 retries += 1
                 log.exception(f'Request failed - {name}. Retrying... ({retries}/{max_retries})\nException: {str(e)}')
-                time.sleep(5)
+                policy.sleep(retries)
                 continue # if this part doesn't succeed you can't continue. prevents incrementing `retries` more than once in a single attempt
             else:
                 raise PTWrapperLibraryException(f'Request failed - {name}') from e
-        # Deserialize JSON output to Python object, or return failed PTWrapperLibraryResponse on exception
-        try:
-            data_out = response.json()
-        except (ValueError, JSONDecodeError) as e:
-            if retries < max_retries:
-                retries += 1
-                log.exception(log_line_post.format(False, None, e))
-                time.sleep(5)
-                continue # if this part doesn't succeed you can't continue. prevents incrementing `retries` more than once in a single attempt
+        if response.status_code < 500:
+            latency_tracker.record(time.monotonic() - request_start)
+        if breaker is not None:
+            if response.status_code >= 500:
+                breaker.record_failure()
             else:
-                raise PTWrapperLibraryJSONResponse(f'Bad JSON response - {name}') from e
-        # If status_code in 200-299 range, return success PTWrapperLibraryResponse with data, otherwise raise exception
+                breaker.record_success()
+        # If rate limited, pause all requests to the endpoint family for as long as the server asked, then retry
+        if limiter is not None:
+            limiter.on_response(time.monotonic() - request_start, response.status_code)
+            if response.status_code in [429, 503] and rate_limited_retries < settings.rate_limit_max_retries:
+                rate_limited_retries += 1
+                retry_after = rate_limit_handler.parse_retry_after(response.headers.get('Retry-After'))
+                limiter.pause(retry_after if retry_after is not None else settings.rate_limit_default_pause)
+                response.close()
+                log.warning(f'{log_line_post.format(False, response.status_code, response.reason)}. Retrying... ({rate_limited_retries}/{settings.rate_limit_max_retries})')
+                continue
+        # If status_code in 200-299 range, return success PTWrapperLibraryResponse, otherwise raise exception. the JSON
+        # data is only deserialized when the caller uses it, many callers only need the status
         is_success = 299 >= response.status_code >= 200
         log_line = log_line_post.format(is_success, response.status_code, response.reason)
         if is_success:
             log.debug(log_line)
-            return PTWrapperLibraryResponse(response, response.status_code, message=response.reason, json=data_out)
-        if retries < max_retries:
+            return PTWrapperLibraryResponse(response, response.status_code, message=response.reason, name=name)
+        if retries < max_retries and policy.can_retry_status(response.status_code, idempotent):
             retries += 1
             log.exception(log_line)
-            time.sleep(5)
+            policy.sleep(retries)
             continue # if this part doesn't succeed you can't continue. prevents incrementing `retries` more than once in a single attempt
         else:
-            log.exception(f'{log_line}, pt_message={data_out.get("message")}')
+            log.exception(f'{log_line}, pt_message={get_response_message(response)}')
             raise PTWrapperLibraryFailed(f'{name} - {response.status_code}: {response.reason}', response=response)
     
 def get(base_url: str, headers: dict, endpoint: str, name: str, retry:bool=True) -> PTWrapperLibraryResponse:
@@ -113,7 +320,7 @@ def get(base_url: str, headers: dict, endpoint: str, name: str, retry:bool=True)
     :return: custom wrapper for Python requests.Response object
     :rtype: PTWrapperLibraryResponse
     """    
-    return _do(http_method='GET', base_url=base_url, headers=headers, endpoint=endpoint, name=name)
+    return _do(http_method='GET', base_url=base_url, headers=headers, endpoint=endpoint, name=name, retry=retry)
 
 # sending image file in POST Upload Image to Tenant requires the following files data
 # {
@@ -142,7 +349,7 @@ def post(base_url: str, headers: dict, endpoint: str, name: str, data: Dict = No
     :return: custom wrapper for Python requests.Response object
     :rtype: PTWrapperLibraryResponse
     """  
-    return _do(http_method='POST', base_url=base_url, headers=headers, endpoint=endpoint, name=name, data=data, files=files)
+    return _do(http_method='POST', base_url=base_url, headers=headers, endpoint=endpoint, name=name, data=data, files=files, retry=retry)
     
 def put(base_url: str, headers: dict, endpoint: str, name: str, data: Dict = None, retry:bool=True) -> PTWrapperLibraryResponse:
     """
@@ -163,7 +370,7 @@ def put(base_url: str, headers: dict, endpoint: str, name: str, data: Dict = Non
     :return: custom wrapper for Python requests.Response object
     :rtype: PTWrapperLibraryResponse
     """  
-    return _do(http_method='PUT', base_url=base_url, headers=headers, endpoint=endpoint, name=name, data=data)
+    return _do(http_method='PUT', base_url=base_url, headers=headers, endpoint=endpoint, name=name, data=data, retry=retry)
     
 def delete(base_url: str, headers: dict, endpoint: str, name: str, data: Dict = None, retry:bool=True) -> PTWrapperLibraryResponse:
     """
@@ -184,4 +391,4 @@ def delete(base_url: str, headers: dict, endpoint: str, name: str, data: Dict =
     :return: custom wrapper for Python requests.Response object
     :rtype: PTWrapperLibraryResponse
     """  
-    return _do(http_method='DELETE', base_url=base_url, headers=headers, endpoint=endpoint, name=name, data=data)
\ No newline at end of file
+    return _do(http_method='DELETE', base_url=base_url, headers=headers, endpoint=endpoint, name=name, data=data, retry=retry)
\ No newline at end of file
@@ -0,0 +1,130 @@
+import random
+import threading
+import time
+from typing import Dict
+
+import requests
+
+import settings
+
+
+class RetryStats():
+    """
+    Thread safe counters for the number of retries and the time spent waiting between them
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.retries = 0
+        self.time_slept = 0.0
+
+    def record(self, delay: float) -> None:
+        with self.lock:
+            self.retries += 1
+            self.time_slept += delay
+
+    def __str__(self):
+        return f'Retries: {self.retries} - Time spent waiting to retry: {round(self.time_slept, 1)} sec(s)'
+
+retry_stats = RetryStats()
+
+
+class RetryPolicy():
+    """
+    Decides whether a failed request should be retried and how long to wait before retrying.
+
+    Waits grow exponentially with each retry, starting at `base_delay` and capped at `max_delay`. With jitter, the wait
+    is a random time up to that value, so requests that failed together don't all retry at the same time.
+
+    Only failures that might succeed if sent again are retried. Status codes not in `retryable_status_codes`, such as a
+    400 for an invalid payload, fail right away. Requests that aren't idempotent, like a POST creating an object, are
+    only retried if the request never reached the server or the server rate limited it, so objects aren't created twice.
+    """
+    def __init__(self, max_retries: int, base_delay: float, max_delay: float, jitter: bool, retryable_status_codes: list, idempotent: bool | None = None):
+        """
+        :param max_retries: max number of times to retry a request
+        :type max_retries: int
+        :param base_delay: seconds to wait before the first retry
+        :type base_delay: float
+        :param max_delay: max seconds to wait before any retry
+        :type max_delay: float
+        :param jitter: whether to randomize the wait
+        :type jitter: bool
+        :param retryable_status_codes: status codes that are worth retrying
+        :type retryable_status_codes: list
+        :param idempotent: whether sending the request more than once has the same effect as sending it once. None to decide based on the HTTP method, defaults to None
+        :type idempotent: bool | None, optional
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.retryable_status_codes = retryable_status_codes
+        self.idempotent = idempotent
+
+    def is_idempotent(self, http_method: str) -> bool:
+        if self.idempotent is not None:
+            return self.idempotent
+        return http_method.upper() in ["GET", "HEAD", "OPTIONS", "PUT", "DELETE"]
+
+    def can_retry_exception(self, e: Exception, idempotent: bool) -> bool:
+        """
+        Connection errors can be retried, but a non idempotent request is only retried if it could not connect to the server
+        """
+        if idempotent:
+            return True
+        return isinstance(e, requests.exceptions.ConnectTimeout)
+
+    def can_retry_status(self, status_code: int, idempotent: bool) -> bool:
+        """
+        Retryable status codes can be retried, but a non idempotent request is only retried if it was rate limited
+        """
+        if status_code not in self.retryable_status_codes:
+            return False
+        return idempotent or status_code == 429
+
+    def get_delay(self, attempt: int) -> float:
+        """
+        Returns the seconds to wait before a retry, and records it in `retry_stats`
+
+        :param attempt: the number of the retry about to be made, starting at 1
+        :type attempt: int
+        :return: seconds to wait
+        :rtype: float
+        """
+        delay = min(self.max_delay, self.base_delay * 2**(attempt-1))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        retry_stats.record(delay)
+        return delay
+
+    def sleep(self, attempt: int) -> None:
+        time.sleep(self.get_delay(attempt))
+
+
+_policies: Dict[str, RetryPolicy] = {}
+_policies_lock = threading.Lock()
+
+def get_policy(name: str) -> RetryPolicy:
+    """
+    Returns the retry policy for an endpoint, built from the retry settings in settings.py and any overrides for the
+    endpoint in `retry_policies`
+
+    :param name: name of API endpoint
+    :type name: str
+    :return: retry policy for the endpoint
+    :rtype: RetryPolicy
+    """
+    policy = _policies.get(name)
+    if policy is None:
+        with _policies_lock:
+            overrides = settings.retry_policies.get(name, {})
+            policy = RetryPolicy(
+                max_retries=overrides.get('max_retries', settings.retries),
+                base_delay=overrides.get('base_delay', settings.retry_base_delay),
+                max_delay=overrides.get('max_delay', settings.retry_max_delay),
+                jitter=overrides.get('jitter', settings.retry_jitter),
+                retryable_status_codes=overrides.get('retryable_status_codes', settings.retryable_status_codes),
+                idempotent=overrides.get('idempotent', True if name in settings.idempotent_endpoints else None)
+            )
+            _policies[name] = policy
+    return policy
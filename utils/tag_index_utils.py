@@ -0,0 +1,282 @@
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Tuple, TypeVar
+
+import settings
+import utils.json_utils as json_utils
+from utils.record_utils import TagRecord
+from utils.tag_utils import TagTransform
+import utils.log_handler as logger
+log = logger.log
+
+R = TypeVar("R", bound=TagRecord)
+
+# number of indexed objects buffered before they are written to the index in a single transaction
+WRITE_BATCH_SIZE = 1000
+
+
+# The tag index is a local SQLite database of the tags on each object, as of the last time the object was loaded or
+# updated by this script. It keeps the record of each object, so objects carrying a tag can be updated without loading
+# every object from the instance.
+#
+# objects      one row per object, the JSON of its record and when it was indexed
+# object_tags  one row per tag on an object, keyed by tag so the objects carrying a tag are found without a scan
+# scans        when all objects of a type were last loaded without any failures, objects that weren't loaded during
+#              that scan were deleted from the instance and are dropped from the index
+# instance     the instance the index was built from, the index is cleared if the script is run against another one
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    obj_type TEXT NOT NULL,
+    obj_key TEXT NOT NULL,
+    record BLOB NOT NULL,
+    indexed_at REAL NOT NULL,
+    PRIMARY KEY (obj_type, obj_key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS object_tags (
+    obj_type TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    obj_key TEXT NOT NULL,
+    PRIMARY KEY (obj_type, tag, obj_key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS object_tags_by_object ON object_tags (obj_type, obj_key);
+CREATE TABLE IF NOT EXISTS scans (
+    obj_type TEXT PRIMARY KEY,
+    completed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS instance (
+    base_url TEXT NOT NULL
+);
+"""
+
+
+class TagIndex():
+    """
+    Thread safe handle to the tag index. Objects are only indexed once the index has been opened for an instance, until
+    then every method that writes to the index does nothing
+    """
+    def __init__(self):
+        self.conn: sqlite3.Connection | None = None
+        self.path = ""
+        self.lock = threading.Lock()
+        self.pending: List[Tuple[str, str, bytes, List[str]]] = []
+        self.scan_started: Dict[str, float] = {}
+        self.num_indexed = 0
+
+    def open(self, base_url: str, path: str = None) -> bool:
+        """
+        Opens the index, creating it if it doesn't exist. If the index was built from a different instance it's cleared
+
+        :param base_url: base url of the instance objects are loaded from
+        :type base_url: str
+        :param path: path to the index file, defaults to `tag_index_path` in settings.py
+        :type path: str, optional
+        :return: whether the index was opened
+        :rtype: bool
+        """
+        path = settings.tag_index_path if path is None else path
+        try:
+            conn = sqlite3.connect(path, check_same_thread=False)
+            conn.executescript(SCHEMA)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            row = conn.execute("SELECT base_url FROM instance").fetchone()
+            if row is None or row[0] != base_url:
+                if row is not None:
+                    log.warning(f'Tag index \'{path}\' was built from {row[0]}. Clearing it to index objects from {base_url}')
+                with conn:
+                    for table in ["objects", "object_tags", "scans", "instance"]:
+                        conn.execute(f'DELETE FROM {table}')
+                    conn.execute("INSERT INTO instance (base_url) VALUES (?)", (base_url,))
+        except sqlite3.Error as e:
+            log.exception(f'Could not open tag index \'{path}\'. Objects will not be indexed')
+            return False
+        with self.lock:
+            self.conn = conn
+            self.path = path
+        log.debug(f'Opened tag index \'{path}\'')
+        return True
+
+    def is_open(self) -> bool:
+        return self.conn is not None
+
+    def close(self) -> None:
+        with self.lock:
+            if self.conn is None:
+                return
+            self._flush()
+            self.conn.close()
+            self.conn = None
+
+    def add(self, obj_type: str, record: TagRecord, tags: List[str]) -> None:
+        """
+        Indexes the tags on an object. The write is buffered and made with other objects in a single transaction
+
+        :param obj_type: type of object, one of clients, assets, reports, findings, or writeups
+        :type obj_type: str
+        :param record: record of the object
+        :type record: TagRecord
+        :param tags: tags on the object, which may differ from the tags on the record if the object was just updated
+        :type tags: List[str]
+        """
+        if self.conn is None:
+            return
+        obj = record.to_json()
+        obj['tags'] = tags
+        with self.lock:
+            self.pending.append((obj_type, record.index_key, json_utils.dumps(obj), tags))
+            if len(self.pending) >= WRITE_BATCH_SIZE:
+                self._flush()
+
+    def flush(self) -> None:
+        with self.lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        """
+        Writes the buffered objects to the index. Must be called holding the lock
+        """
+        if self.conn is None or len(self.pending) < 1:
+            return
+        now = time.time()
+        keys = [(obj_type, key) for obj_type, key, _, _ in self.pending]
+        try:
+            with self.conn:
+                self.conn.executemany("INSERT OR REPLACE INTO objects (obj_type, obj_key, record, indexed_at) VALUES (?, ?, ?, ?)", [(obj_type, key, obj, now) for obj_type, key, obj, _ in self.pending])
+                self.conn.executemany("DELETE FROM object_tags WHERE obj_type = ? AND obj_key = ?", keys)
+                self.conn.executemany("INSERT OR IGNORE INTO object_tags (obj_type, tag, obj_key) VALUES (?, ?, ?)", [(obj_type, tag, key) for obj_type, key, _, tags in self.pending for tag in tags])
+            self.num_indexed += len(self.pending)
+        except sqlite3.Error as e:
+            log.exception(f'Could not write {len(self.pending)} object(s) to tag index. Skipping...')
+        self.pending.clear()
+
+    def start_scan(self, obj_type: str) -> None:
+        """
+        Marks the start of loading every object of a type from the instance
+        """
+        if self.conn is None:
+            return
+        with self.lock:
+            self.scan_started[obj_type] = time.time()
+
+    def finish_scan(self, obj_type: str, complete: bool) -> None:
+        """
+        Marks the end of loading every object of a type. If every object was loaded, objects that weren't indexed since
+        the scan started no longer exist and are dropped, and the scan is recorded so the index can be used to find
+        objects of this type. Only writes the buffered objects if a scan wasn't started, i.e. when only the objects in the
+        index were loaded
+
+        :param obj_type: type of object, one of clients, assets, reports, findings, or writeups
+        :type obj_type: str
+        :param complete: whether every object of the type was loaded and processed without failures
+        :type complete: bool
+        """
+        with self.lock:
+            self._flush()
+            started = self.scan_started.pop(obj_type, None)
+            if self.conn is None or started is None:
+                return
+            if not complete:
+                log.info(f'Not all {obj_type} were loaded. The tag index will not be used to find {obj_type} until they are all loaded in a later run')
+                return
+            try:
+                with self.conn:
+                    self.conn.execute("DELETE FROM object_tags WHERE obj_type = ? AND obj_key IN (SELECT obj_key FROM objects WHERE obj_type = ? AND indexed_at < ?)", (obj_type, obj_type, started))
+                    self.conn.execute("DELETE FROM objects WHERE obj_type = ? AND indexed_at < ?", (obj_type, started))
+                    self.conn.execute("INSERT OR REPLACE INTO scans (obj_type, completed_at) VALUES (?, ?)", (obj_type, started))
+            except sqlite3.Error as e:
+                log.exception(f'Could not record the scan of {obj_type} in tag index')
+
+    def get_scan_age(self, obj_type: str) -> float | None:
+        """
+        Returns how many hours ago the last complete scan of a type of object started, or None if there hasn't been one
+        """
+        if self.conn is None:
+            return None
+        with self.lock:
+            row = self.conn.execute("SELECT completed_at FROM scans WHERE obj_type = ?", (obj_type,)).fetchone()
+        return None if row is None else (time.time() - row[0]) / 3600
+
+    def can_find(self, obj_types: List[str]) -> bool:
+        """
+        Checks if the index can be used to find objects of each type, i.e. every object of each type was loaded within
+        `tag_index_max_age` hours
+        """
+        if self.conn is None:
+            return False
+        for obj_type in obj_types:
+            age = self.get_scan_age(obj_type)
+            if age is None:
+                log.info(f'Tag index has no complete scan of {obj_type}')
+                return False
+            if age > settings.tag_index_max_age:
+                log.info(f'Tag index of {obj_type} is {round(age, 1)} hour(s) old, older than the max age of {settings.tag_index_max_age} hour(s) in settings.py')
+                return False
+        return True
+
+    def get_tags(self, obj_type: str) -> List[str]:
+        """
+        Returns the distinct tags on indexed objects of a type
+        """
+        if self.conn is None:
+            return []
+        with self.lock:
+            self._flush()
+            return [row[0] for row in self.conn.execute("SELECT DISTINCT tag FROM object_tags WHERE obj_type = ?", (obj_type,))]
+
+    def find_objects(self, obj_type: str, tags: List[str], to_record: Callable[[dict], R]) -> List[R]:
+        """
+        Returns the indexed objects of a type that carry any of the tags
+
+        :param obj_type: type of object, one of clients, assets, reports, findings, or writeups
+        :type obj_type: str
+        :param tags: tags to find
+        :type tags: List[str]
+        :param to_record: function that converts an indexed object to its record, i.e. `FindingRecord.from_json`
+        :type to_record: Callable[[dict], R]
+        :return: records of the objects carrying the tags, in the order they were indexed
+        :rtype: List[R]
+        """
+        if self.conn is None or len(tags) < 1:
+            return []
+        with self.lock:
+            self._flush()
+            # the tags are joined from a temp table, since the number of tags can exceed the max number of query parameters
+            self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS find_tags (tag TEXT PRIMARY KEY) WITHOUT ROWID")
+            self.conn.execute("DELETE FROM find_tags")
+            self.conn.executemany("INSERT OR IGNORE INTO find_tags (tag) VALUES (?)", [(tag,) for tag in tags])
+            rows = self.conn.execute(
+                "SELECT record FROM objects WHERE obj_type = ? AND obj_key IN (SELECT t.obj_key FROM object_tags t JOIN find_tags f ON t.tag = f.tag WHERE t.obj_type = ?) ORDER BY indexed_at, obj_key",
+                (obj_type, obj_type)
+            ).fetchall()
+            self.conn.execute("DELETE FROM find_tags")
+            self.conn.commit()
+        return [to_record(json_utils.loads(row[0])) for row in rows]
+
+    def find_matching_objects(self, obj_type: str, transform: TagTransform, to_record: Callable[[dict], R]) -> List[R]:
+        """
+        Returns the indexed objects of a type with tags changed by the transform. Patterns in the transform are matched
+        against the distinct tags in the index, instead of the tags on every object
+
+        :param obj_type: type of object, one of clients, assets, reports, findings, or writeups
+        :type obj_type: str
+        :param transform: compiled tag changes
+        :type transform: TagTransform
+        :param to_record: function that converts an indexed object to its record, i.e. `FindingRecord.from_json`
+        :type to_record: Callable[[dict], R]
+        :return: records of the objects with tags to change
+        :rtype: List[R]
+        """
+        tags = [tag for tag in self.get_tags(obj_type) if transform.get_rule(tag) is not None]
+        return self.find_objects(obj_type, tags, to_record)
+
+    def get_index_metrics(self) -> str:
+        if self.conn is None:
+            return "Not used"
+        with self.lock:
+            self._flush()
+            counts = dict(self.conn.execute("SELECT obj_type, COUNT(*) FROM objects GROUP BY obj_type").fetchall())
+        indexed = ", ".join(f'{counts.get(obj_type, 0)} {obj_type}' for obj_type in ["clients", "assets", "reports", "findings", "writeups"])
+        return f'Objects indexed this run: {self.num_indexed} - Objects in index: {indexed} - File: {self.path}'
+
+tag_index = TagIndex()
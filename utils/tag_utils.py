@@ -0,0 +1,531 @@
+import fnmatch
+import re
+import threading
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Sequence, Set, Tuple
+
+import settings
+
+
+class TagDictionary():
+    """
+    Thread safe dictionary mapping each distinct tag to a small integer ID, so tags on loaded objects can be stored and
+    compared as integers instead of strings.
+
+    Lists of tag IDs are also interned, every object with the same tags holds a reference to the same tuple of IDs.
+    Across a tenant the same handful of tag lists repeat on many objects, so this keeps the memory used for tags to
+    one pointer per object. A per-object array of IDs would use more memory than this for the short tag lists most
+    objects have.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ids: Dict[str, int] = {}
+        self.tags: List[str] = []
+        self.tag_lists: Dict[Tuple[int], Tuple[int]] = {}
+
+    def get_id(self, tag: str) -> int:
+        """
+        Returns the ID of a tag, adding the tag to the dictionary if it hasn't been seen before
+        """
+        tag_id = self.ids.get(tag)
+        if tag_id is None:
+            with self.lock:
+                tag_id = self.ids.get(tag)
+                if tag_id is None:
+                    tag_id = len(self.tags)
+                    self.tags.append(tag)
+                    self.ids[tag] = tag_id
+        return tag_id
+
+    def get_tag(self, tag_id: int) -> str:
+        return self.tags[tag_id]
+
+    def encode(self, tags: Iterable[str] | None) -> Tuple[int]:
+        """
+        Converts a list of tags to the interned tuple of their IDs
+
+        :param tags: list of tags from an object
+        :type tags: Iterable[str] | None
+        :return: tuple of tag IDs, shared with every other list of the same tags
+        :rtype: Tuple[int]
+        """
+        if not tags:
+            return ()
+        tag_ids = tuple(self.get_id(tag) for tag in tags)
+        interned = self.tag_lists.get(tag_ids)
+        if interned is None:
+            with self.lock:
+                interned = self.tag_lists.setdefault(tag_ids, tag_ids)
+        return interned
+
+    def decode(self, tag_ids: Iterable[int]) -> List[str]:
+        """
+        Converts a tuple of tag IDs back to the list of tags
+        """
+        return [self.tags[tag_id] for tag_id in tag_ids]
+
+    def get_ids(self, tags: Iterable[str]) -> Set[int]:
+        """
+        Returns the set of IDs of the tags, adding any tags that haven't been seen before. Tags are added so the IDs stay
+        valid for objects that are loaded later
+        """
+        return {self.get_id(tag) for tag in tags}
+
+    def __len__(self) -> int:
+        return len(self.tags)
+
+tag_dictionary = TagDictionary()
+
+
+# Tags being acted on can be patterns instead of exact tags
+#  - `client:*` a tag ending in `*` matches every tag starting with the prefix
+#  - `scan_20??_*` a tag with `*`, `?`, or `[...]` anywhere else is a glob pattern that must match the whole tag
+#  - `re:^scan_2023_` a tag starting with `re:` is a regular expression that can match anywhere in the tag
+REGEX_PATTERN_PREFIX = "re:"
+
+# inline flags at the start of a regular expression, i.e. `(?i)`, apply to the whole expression
+GLOBAL_FLAGS = re.compile(r'\(\?([aiLmsux]+)\)')
+
+def is_tag_pattern(tag: str) -> bool:
+    return tag.startswith(REGEX_PATTERN_PREFIX) or any(char in tag for char in "*?[")
+
+def compile_tag_pattern(pattern: str) -> Tuple[str, str]:
+    """
+    Parses a tag pattern into its type and the prefix or regular expression it matches with
+
+    :param pattern: tag pattern, see `is_tag_pattern`
+    :type pattern: str
+    :raises ValueError: pattern is an invalid regular expression, or uses backreferences which aren't supported
+    :return: tuple of "prefix" and the prefix, or "regex" and the regular expression
+    :rtype: Tuple[str, str]
+    """
+    if pattern.startswith(REGEX_PATTERN_PREFIX):
+        regex = pattern[len(REGEX_PATTERN_PREFIX):]
+    elif pattern.endswith("*") and not any(char in pattern[:-1] for char in "*?["):
+        return "prefix", pattern[:-1]
+    else:
+        regex = r'\A' + fnmatch.translate(pattern) # glob patterns match the whole tag
+    # patterns are combined into a single regular expression, where numbered groups of other patterns shift the group numbers
+    if re.search(r'\\[1-9]|\(\?P=', regex):
+        raise ValueError(f'Backreferences are not supported in tag patterns: \'{pattern}\'')
+    # global flags are only allowed at the start of the combined expression, so they're scoped to the pattern instead
+    flags = ""
+    while (flags_match := GLOBAL_FLAGS.match(regex)) is not None:
+        flags += flags_match.group(1)
+        regex = regex[flags_match.end():]
+    if flags:
+        # a comment in verbose mode runs to the end of the line, so the group is closed on a new line
+        end = "\n" if "x" in flags else ""
+        regex = f'(?{flags}:{regex}{end})'
+    try:
+        re.compile(regex)
+    except re.error as e:
+        raise ValueError(f'Invalid regular expression in tag pattern \'{pattern}\': {e}') from e
+    return "regex", regex
+
+
+class PrefixTrie():
+    """
+    Trie of tag prefixes, finds the longest prefix of a tag in a single pass over the tag
+    """
+    def __init__(self):
+        self.root = {}
+
+    def insert(self, prefix: str, value: int) -> None:
+        node = self.root
+        for char in prefix:
+            node = node.setdefault(char, {})
+        node.setdefault(None, value) # None can't be a character, so it marks the end of a prefix
+
+    def longest_match(self, tag: str) -> int | None:
+        node = self.root
+        value = node.get(None)
+        for char in tag:
+            node = node.get(char)
+            if node is None:
+                break
+            value = node.get(None, value)
+        return value
+
+
+class TagMatcher():
+    """
+    Matches tags against a list of tag patterns. Prefix patterns are stored in a trie and all other patterns are combined
+    into a single regular expression, so each tag is checked against every pattern at once.
+
+    If more than one pattern matches a tag, the longest matching prefix is used. Otherwise the first regular expression
+    or glob pattern matching at the earliest position in the tag is used.
+    """
+    def __init__(self, patterns: List[str]):
+        """
+        :param patterns: tag patterns, see `is_tag_pattern`
+        :type patterns: List[str]
+        :raises ValueError: a pattern is invalid
+        """
+        self.trie = PrefixTrie()
+        self.prefixes: Dict[int, str] = {}
+        self.regexes: Dict[int, re.Pattern] = {}
+        for i, pattern in enumerate(patterns):
+            kind, value = compile_tag_pattern(pattern)
+            if kind == "prefix":
+                self.trie.insert(value, i)
+                self.prefixes[i] = value
+            else:
+                self.regexes[i] = re.compile(value)
+        self.combined = None
+        if len(self.regexes) > 0:
+            try:
+                self.combined = re.compile("|".join(f'(?P<_tag_pattern_{i}>{regex.pattern})' for i, regex in self.regexes.items()))
+            except re.error as e:
+                raise ValueError(f'Tag patterns can\'t be combined into a single regular expression: {e}') from e
+
+    def match(self, tag: str) -> Tuple[int, Callable[[str], str]] | None:
+        """
+        Finds the pattern matching a tag
+
+        :param tag: tag to match
+        :type tag: str
+        :return: tuple of the index of the matching pattern and a function that fills in a template for the new tag from the match, or None if no pattern matches
+        :rtype: Tuple[int, Callable[[str], str]] | None
+        """
+        i = self.trie.longest_match(tag)
+        if i is not None:
+            suffix = tag[len(self.prefixes[i]):]
+            return i, lambda template: template[:-1] + suffix if template.endswith("*") else template
+        if self.combined is None:
+            return None
+        combined_match = self.combined.search(tag)
+        if combined_match is None:
+            return None
+        i = int(combined_match.lastgroup.rsplit("_", 1)[1])
+        match = self.regexes[i].search(tag)
+        return i, match.expand
+
+
+class TagRuleSet():
+    """
+    A single tag change compiled into a dictionary lookup per tag, i.e. the replacements entered in refractor mode.
+
+    Each tag being acted on maps to the tags that replace it and the tags added to the end of the object's tags when
+    it's found. All rules in the set apply to the tags on an object at the same time.
+
+    Tags being acted on can be patterns, see `is_tag_pattern`. Each distinct tag is checked against the patterns once, and
+    the rule it resolves to is cached, so patterns cost the same per object as exact tags. Replacements and additions for
+    prefix patterns can end in `*` to keep the rest of the matched tag, i.e. `client:*` -> `customer:*`, and replacements
+    and additions for regular expressions can use groups from the match, i.e. `\\1`
+
+    Chains of replacements are collapsed, so every tag goes straight to its final replacement and objects reach their
+    final tags in one update, i.e. `a` -> `b` and `b` -> `c` replaces both `a` and `b` with `c`. Replacements that form a
+    cycle, i.e. `a` -> `b` and `b` -> `a`, are handled based on `tag_rename_cycles` in settings.py
+    """
+    def __init__(self, replacements: Dict[str, Sequence[str]] = None, additions: Dict[str, Sequence[str]] = None):
+        """
+        :param replacements: tags mapped to the tags that replace them, where they are on the object. an empty list removes the tag, defaults to None
+        :type replacements: Dict[str, Sequence[str]], optional
+        :param additions: tags mapped to the tags added to the end of the object's tags when they're found, defaults to None
+        :type additions: Dict[str, Sequence[str]], optional
+        """
+        replacements = replacements or {}
+        additions = additions or {}
+        self.removes_found_tags = len(replacements) > 0
+        self.rules: Dict[str, Tuple[Tuple[str], Tuple[str]]] = {}
+        self.patterns: List[str] = []
+        self.pattern_rules: List[Tuple[Tuple[str] | None, Tuple[str]]] = []
+        for tag in dict.fromkeys(list(replacements) + list(additions)):
+            if is_tag_pattern(tag):
+                self.patterns.append(tag)
+                self.pattern_rules.append((tuple(replacements[tag]) if tag in replacements else None, tuple(additions.get(tag, ()))))
+            else:
+                self.rules[tag] = (tuple(replacements.get(tag, (tag,))), tuple(additions.get(tag, ())))
+        self.tag_ids = tag_dictionary.get_ids(self.rules)
+        self.matcher = TagMatcher(self.patterns) if len(self.patterns) > 0 else None
+        self.matched: Dict[str, Tuple[Tuple[str], Tuple[str]] | None] = {}
+        self.resolved: Dict[str, Tuple[Tuple[str], Tuple[str]] | None] = {}
+
+        # collapse chains of exact replacements ahead of time, cycles between exact tags are found here
+        self.direct_rules = dict(self.rules)
+        self.chain_ends: Dict[str, Tuple[str]] = {}
+        if self.removes_found_tags:
+            for tag, (tag_replacements, tag_additions) in self.direct_rules.items():
+                self.rules[tag] = (self._collapse_chain(tag, tag_replacements, settings.tag_rename_cycles == "reject"), tag_additions)
+
+    @classmethod
+    def refactor(cls, tags: List[str], replacements: List[str]) -> "TagRuleSet":
+        """
+        Replaces each tag with the replacement at the same index. If a tag is entered more than once, the first replacement is used
+        """
+        mapping = {}
+        for tag, replacement in zip(tags, replacements):
+            mapping.setdefault(tag, [replacement])
+        return cls(replacements=mapping)
+
+    @classmethod
+    def remove(cls, tags: List[str]) -> "TagRuleSet":
+        return cls(replacements={tag: [] for tag in tags})
+
+    @classmethod
+    def add(cls, tags: List[str], additions: List[str]) -> "TagRuleSet":
+        """
+        Adds the tag at the same index in `additions` wherever each tag is found
+        """
+        mapping = {}
+        for tag, addition in zip(tags, additions):
+            mapping.setdefault(tag, []).append(addition)
+        return cls(additions=mapping)
+
+    def matches(self, tag_ids: Iterable[int]) -> bool:
+        """
+        Checks if an object has any of the tags being acted on, comparing tag IDs from the tag dictionary
+
+        :param tag_ids: IDs of the tags on the object
+        :type tag_ids: Iterable[int]
+        :return: whether the object has any of the tags
+        :rtype: bool
+        """
+        if self.matcher is None:
+            return not self.tag_ids.isdisjoint(tag_ids)
+        return any(self.get_rule(tag_dictionary.get_tag(tag_id)) is not None for tag_id in tag_ids)
+
+    def get_rule(self, tag: str) -> Tuple[Tuple[str], Tuple[str]] | None:
+        """
+        Returns the tags that replace a tag and the tags added when it's found, or None if the tag isn't acted on. Tags
+        matching a pattern are resolved the first time they're seen and cached
+        """
+        rule = self.rules.get(tag)
+        if rule is not None or self.matcher is None:
+            return rule
+        if tag in self.resolved:
+            return self.resolved[tag]
+        rule = self._get_direct_rule(tag)
+        if rule is not None and self.removes_found_tags:
+            # cycles through tags matching a pattern can only be found as objects are updated, so they're always swapped
+            rule = (self._collapse_chain(tag, rule[0], False), rule[1])
+        return self.resolved.setdefault(tag, rule)
+
+    def _get_direct_rule(self, tag: str) -> Tuple[Tuple[str], Tuple[str]] | None:
+        """
+        Returns the rule for a tag as entered, before chains of replacements are collapsed
+        """
+        rule = self.direct_rules.get(tag)
+        if rule is not None or self.matcher is None:
+            return rule
+        if tag in self.matched:
+            return self.matched[tag]
+        match = self.matcher.match(tag)
+        if match is not None:
+            i, expand = match
+            replacements, additions = self.pattern_rules[i]
+            rule = (
+                (tag,) if replacements is None else tuple(expand(template) for template in replacements),
+                tuple(expand(template) for template in additions)
+            )
+        return self.matched.setdefault(tag, rule)
+
+    def _collapse_chain(self, tag: str, replacements: Tuple[str], reject_cycles: bool) -> Tuple[str]:
+        """
+        Follows a tag replaced by a single tag through the tags that replace it in turn, until reaching a tag that isn't
+        replaced, removed, or replaced by more than one tag. The end of the chain is cached for each tag on the way, so
+        every chain is only followed once.
+
+        If the chain comes back to the tag, the tag is part of a cycle and keeps its replacement, so the tags in the
+        cycle are swapped. If the chain runs into a cycle the tag is replaced by the first tag of the cycle reached.
+
+        :param tag: tag being replaced
+        :type tag: str
+        :param replacements: tags replacing the tag, as entered
+        :type replacements: Tuple[str]
+        :param reject_cycles: raise an exception instead of swapping tags in a cycle
+        :type reject_cycles: bool
+        :raises ValueError: replacements form a cycle, if cycles are rejected
+        :return: final tags replacing the tag
+        :rtype: Tuple[str]
+        """
+        if len(replacements) != 1 or replacements[0] == tag:
+            return replacements
+        path = [tag]
+        positions = {tag: 0}
+        target = replacements[0]
+        while True:
+            if target in self.chain_ends:
+                end = self.chain_ends[target]
+                break
+            if target in positions:
+                if reject_cycles:
+                    cycle = path[positions[target]:] + [target]
+                    raise ValueError(f'Tag replacements form a cycle: {" -> ".join(cycle)}. Set tag_rename_cycles to "swap" in settings.py to swap these tags')
+                if positions[target] == 0:
+                    return replacements
+                path = path[:positions[target]]
+                end = (target,)
+                break
+            rule = self._get_direct_rule(target)
+            if rule is None or rule[0] == (target,):
+                end = (target,)
+                break
+            if len(rule[0]) != 1:
+                end = rule[0]
+                break
+            positions[target] = len(path)
+            path.append(target)
+            target = rule[0][0]
+        for node in path:
+            self.chain_ends[node] = end
+        return end
+
+    def get_found_tags(self) -> List[str]:
+        """
+        Returns the exact tags being acted on and every tag that has matched a pattern so far
+        """
+        return list(self.rules) + [tag for tag, rule in list(self.resolved.items()) if rule is not None]
+
+    def get_new_tags(self) -> List[str]:
+        """
+        Returns the tags being added to objects, including tags created from patterns for the tags that have matched a
+        pattern so far
+        """
+        new_tags = {}
+        for tag, rule in list(self.rules.items()) + [(tag, rule) for tag, rule in list(self.resolved.items()) if rule is not None]:
+            for new_tag in rule[0] + rule[1]:
+                if new_tag != tag:
+                    new_tags[new_tag] = None
+        return list(new_tags)
+
+
+class TagTransform():
+    """
+    An ordered list of tag changes, built once per run and shared by every object updated. Each `TagRuleSet` applies to
+    the tags left by the ones before it, so a single job can i.e. replace, remove, and add tags, and each object is only
+    loaded and updated once.
+
+    The rule sets are combined per distinct tag, into the tags that replace it and the tags added when it's found, the
+    first time the tag is seen. Applying the transform is then a single pass over the tags on an object.
+
+    Results are cached by the interned tuple of tag IDs from the `tag_dictionary`, so each distinct list of tags is only
+    transformed once, no matter how many objects have it. The cache is bounded by `tag_transform_cache_size` in settings.py
+    """
+    def __init__(self, rule_sets: List[TagRuleSet]):
+        """
+        :param rule_sets: tag changes, in the order they are made
+        :type rule_sets: List[TagRuleSet]
+        """
+        self.rule_sets = rule_sets
+        self.resolved: Dict[str, Tuple[Tuple[str], Tuple[str]] | None] = {}
+        self._apply_cached = lru_cache(maxsize=settings.tag_transform_cache_size)(self._apply_ids)
+
+    def matches(self, tag_ids: Iterable[int]) -> bool:
+        """
+        Checks if an object has any of the tags being acted on. Tags only created by an earlier rule set come from a tag
+        that was acted on, so only the tags on the object need to be checked
+
+        :param tag_ids: IDs of the tags on the object
+        :type tag_ids: Iterable[int]
+        :return: whether the object has any of the tags
+        :rtype: bool
+        """
+        return any(rule_set.matches(tag_ids) for rule_set in self.rule_sets)
+
+    def get_rule(self, tag: str) -> Tuple[Tuple[str], Tuple[str]] | None:
+        """
+        Returns the tags that replace a tag and the tags added when it's found after every rule set is applied, or None
+        if the tag isn't changed
+        """
+        if len(self.rule_sets) == 1:
+            return self.rule_sets[0].get_rule(tag)
+        if tag in self.resolved:
+            return self.resolved[tag]
+        in_place = [tag]
+        added = []
+        for rule_set in self.rule_sets:
+            next_in_place = []
+            next_added = []
+            new_added = []
+            for current in in_place:
+                rule = rule_set.get_rule(current)
+                if rule is None:
+                    next_in_place.append(current)
+                else:
+                    next_in_place.extend(rule[0])
+                    new_added.extend(rule[1])
+            for current in added:
+                rule = rule_set.get_rule(current)
+                if rule is None:
+                    next_added.append(current)
+                else:
+                    next_added.extend(rule[0])
+                    new_added.extend(rule[1])
+            in_place = next_in_place
+            added = next_added + new_added
+        rule = None if in_place == [tag] and len(added) < 1 else (tuple(in_place), tuple(added))
+        return self.resolved.setdefault(tag, rule)
+
+    def get_new_tags(self) -> List[str]:
+        """
+        Returns the tags being added to objects, including tags created from patterns for the tags that have matched a
+        pattern so far
+        """
+        return list(dict.fromkeys(tag for rule_set in self.rule_sets for tag in rule_set.get_new_tags()))
+
+    def get_removed_tags(self) -> List[str]:
+        """
+        Returns the tags being replaced or removed on objects, including every tag that has matched a pattern so far.
+        Tags that are also added to objects aren't included
+        """
+        new_tags = set(self.get_new_tags())
+        removed_tags = (tag for rule_set in self.rule_sets if rule_set.removes_found_tags for tag in rule_set.get_found_tags())
+        return [tag for tag in dict.fromkeys(removed_tags) if tag not in new_tags]
+
+    def apply(self, tags: Iterable[str]) -> Tuple[List[str], bool]:
+        """
+        Applies the transform to the tags on an object. Tags stay in the same order, added tags go at the end, and a tag
+        is only kept the first time it appears.
+
+        :param tags: tags on the object
+        :type tags: Iterable[str]
+        :return: tuple of the new list of tags and whether it's different from the tags passed in
+        :rtype: Tuple[List[str], bool]
+        """
+        return self.apply_ids(tag_dictionary.encode(tags))
+
+    def apply_ids(self, tag_ids: Tuple[int]) -> Tuple[List[str], bool]:
+        """
+        Applies the transform to the tags on an object, given the IDs of its tags. See `apply`
+
+        :param tag_ids: interned tuple of IDs of the tags on the object, from the tag dictionary
+        :type tag_ids: Tuple[int]
+        :return: tuple of the new list of tags and whether it's different from the tags on the object
+        :rtype: Tuple[List[str], bool]
+        """
+        new_tags, changed = self._apply_cached(tag_ids)
+        return list(new_tags), changed
+
+    def _apply_ids(self, tag_ids: Tuple[int]) -> Tuple[Tuple[str], bool]:
+        new_tags, changed = self._transform(tag_dictionary.decode(tag_ids))
+        return tuple(new_tags), changed
+
+    def _transform(self, tags: List[str]) -> Tuple[List[str], bool]:
+        new_tags = []
+        added = []
+        seen = set()
+        for tag in tags:
+            rule = self.get_rule(tag)
+            if rule is None:
+                if tag not in seen:
+                    seen.add(tag)
+                    new_tags.append(tag)
+                continue
+            for new_tag in rule[0]:
+                if new_tag not in seen:
+                    seen.add(new_tag)
+                    new_tags.append(new_tag)
+            added.extend(rule[1])
+        for new_tag in added:
+            if new_tag not in seen:
+                seen.add(new_tag)
+                new_tags.append(new_tag)
+        return new_tags, new_tags != tags
+
+    def get_cache_metrics(self) -> str:
+        info = self._apply_cached.cache_info()
+        lookups = info.hits + info.misses
+        hit_rate = round(info.hits / lookups * 100, 1) if lookups > 0 else 0
+        return f'Distinct tag lists transformed: {info.misses} - Cache hits: {info.hits} - Hit rate: {hit_rate}%'